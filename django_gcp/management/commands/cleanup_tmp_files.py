@@ -1,8 +1,55 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import json
+import os
 
-from django.core.management.base import BaseCommand
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
 
 from django_gcp.storage import GoogleCloudStorage
+from django_gcp.storage.fields import BlobField
+from django_gcp.storage.operations import COMPOSITE_PARTS_PREFIX, delete_blobs
+
+# A fields mask restricting listings to the properties needed to select and delete temporary files
+LISTING_FIELDS = "items(name,timeCreated,generation),nextPageToken"
+
+
+def get_ingress_prefixes(store_key):
+    """Get the ingress_to paths (as directory prefixes) of the BlobFields using a store, omitting any within another"""
+    return get_outermost_prefixes(
+        normalize_prefix(field.ingress_to)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, BlobField) and field.store_key == store_key
+    )
+
+
+def get_outermost_prefixes(prefixes):
+    """Get the distinct directory prefixes (ending in "/") from those given, omitting any within another"""
+    prefixes = sorted(set(prefixes))
+    return [prefix for index, prefix in enumerate(prefixes) if not any(prefix.startswith(p) for p in prefixes[:index])]
+
+
+def normalize_prefix(prefix):
+    """Get the prefix of the objects in a directory, so that objects whose names merely start with its path (eg
+    "tmp-archive/..." for "tmp") aren't included
+
+    :raises CommandError: For a path that isn't a directory within the bucket, including the bucket itself (which would
+    clean up permanent objects too)
+    """
+    path = prefix.strip()
+    if not path.strip("/"):
+        raise CommandError(
+            f"Refusing to clean up temporary files under '{prefix}', which would include every object in the bucket. "
+            "Give BlobFields an ingress_to path used only for temporary files, or pass --prefix."
+        )
+
+    segments = path.rstrip("/").split("/")
+    if any(segment in ("", ".", "..") for segment in segments):
+        raise CommandError(
+            f"Refusing to clean up temporary files under '{prefix}', which isn't a directory path (like '_tmp/')."
+        )
+
+    return f"{'/'.join(segments)}/"
 
 
 # pylint: disable=missing-class-docstring
@@ -12,30 +59,108 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("store_key", type=str, help="Google Cloud Storage key")
         parser.add_argument("--delete", action="store_true", help="Delete the temporary files")
+        parser.add_argument(
+            "--older-than",
+            type=float,
+            default=24,
+            help="Only clean up files created more than this many hours ago (default 24)",
+        )
+        parser.add_argument(
+            "--prefix",
+            action="append",
+            dest="prefixes",
+            help=f"A directory under which to clean up files (may be given several times). Defaults to the ingress_to path of each BlobField using the store (or '_tmp/' if there are none), and '{COMPOSITE_PARTS_PREFIX}' for the parts of parallel uploads.",
+        )
+        parser.add_argument(
+            "--max-deletes", type=int, default=None, help="Stop once this many files have been cleaned up"
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default=None,
+            help="A file in which to record progress, so that an interrupted cleanup resumes where it left off when run again with the same file. The file is removed once the cleanup completes.",
+        )
 
     def handle(self, *args, **options):
-        store_key = options["store_key"]
+        store = GoogleCloudStorage(store_key=options["store_key"])
+        prefixes = options["prefixes"] or [
+            *(get_ingress_prefixes(options["store_key"]) or ["_tmp/"]),
+            COMPOSITE_PARTS_PREFIX,
+        ]
+        prefixes = get_outermost_prefixes(normalize_prefix(prefix) for prefix in prefixes)
+
+        # Objects' creation times are always aware, whatever the USE_TZ setting
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=options["older_than"])
+        max_deletes = options["max_deletes"]
         delete_files = options["delete"]
+        checkpoint_path = options["checkpoint"] if delete_files else None
+        checkpoint = self._read_checkpoint(checkpoint_path)
+
+        found = deleted = failed = 0
+        for prefix in prefixes:
+            if prefix in checkpoint and checkpoint[prefix] is None:
+                continue
+
+            # Stream the listing a page at a time, deleting each page's files (in concurrent batch requests) as it goes
+            iterator = store.bucket.list_blobs(prefix=prefix, fields=LISTING_FIELDS, page_token=checkpoint.get(prefix))
+            for page in iterator.pages:
+                blobs = [blob for blob in page if blob.time_created < cutoff]
+                if max_deletes is not None:
+                    blobs = blobs[: max_deletes - found]
+                found += len(blobs)
+
+                if options["verbosity"] >= 2:
+                    for blob in blobs:
+                        self.stdout.write(f"Temporary file: {blob.name}")
+
+                if delete_files and blobs:
+                    results = delete_blobs(
+                        store.bucket,
+                        [blob.name for blob in blobs],
+                        if_generation_match=[blob.generation for blob in blobs],
+                        ignore_missing=True,
+                        executor=store.bulk_executor,
+                    )
+                    for result in results:
+                        if result.ok:
+                            deleted += 1
+                        else:
+                            failed += 1
+                            self.stderr.write(f"Failed to delete {result.name}: {result.error}")
+
+                if max_deletes is not None and found >= max_deletes:
+                    break
+
+                checkpoint[prefix] = iterator.next_page_token
+                self._write_checkpoint(checkpoint_path, checkpoint)
+
+            if max_deletes is not None and found >= max_deletes:
+                break
 
-        # Instantiate GoogleCloudStorage
-        store = GoogleCloudStorage(store_key=store_key)
-        bucket = store.bucket
-
-        # Filter blobs with name starting with '_tmp' and age over 24 hours
-        blob_list = bucket.list_blobs(prefix="_tmp")
-        tmp_files = []
-        for blob in blob_list:
-            age = datetime.now() - blob.time_created.replace(tzinfo=None)
-            if age > timedelta(hours=24):
-                tmp_files.append(blob)
-
-        # Print the list of temporary files
-        if tmp_files:
-            print(f"Temporary files to delete: {[blob.name for blob in tmp_files]}")
         else:
-            print("No temporary files to delete")
+            # Every prefix has been cleaned up, so a further run should start again from scratch
+            if checkpoint_path is not None and os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+
+        self._write_summary(found, deleted, failed, delete_files, prefixes, options["older_than"])
+
+    def _write_summary(self, found, deleted, failed, delete_files, prefixes, older_than):
+        message = f"Found {found} temporary files older than {older_than:g} hours under {', '.join(prefixes)}"
+        if delete_files:
+            message += f"; deleted {deleted}"
+            if failed:
+                message += f", failed to delete {failed}"
+        self.stdout.write(message)
+
+    @staticmethod
+    def _read_checkpoint(path):
+        if path is None or not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
 
-        # Delete the temporary files if the --delete flag was passed
-        if delete_files and tmp_files:
-            bucket.delete_blobs(tmp_files)
-            print(f"Deleted {len(tmp_files)} temporary files")
+    @staticmethod
+    def _write_checkpoint(path, checkpoint):
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f)
@@ -0,0 +1,222 @@
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import random
+import threading
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.fields.json import KeyTextTransform
+
+from django_gcp.storage.blob_utils import get_blob_properties, record_blob_properties
+from django_gcp.storage.fields import BlobField
+
+# A fields mask restricting listings to the properties recorded by get_blob_properties
+LISTING_FIELDS = "items(name,size,contentType,crc32c,generation,updated),nextPageToken"
+
+# The number of name ranges listed per worker, so that ranges listing faster than others don't leave workers idle
+RANGES_PER_WORKER = 4
+
+
+class RateLimiter:
+    """Limit calls to wait() (from any number of threads) to a maximum rate per second, or not at all if rate is None"""
+
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_listing_ranges(boundaries):
+    """Get the ranges of object names to list (concurrently) to cover the names between the first and last boundary
+
+    :param Iterable[str] boundaries: Object names, eg sampled from the paths referenced by rows
+    :return list(tuple(str, Union[str, None])): The (start, end) of each range, where start is inclusive and end is
+    exclusive (or None for the last range, which ends with the last boundary inclusive)
+    """
+    # Objects are listed in the lexicographic order of their UTF-8 encoded names, which may not be the database's order
+    boundaries = sorted(set(boundaries), key=lambda name: name.encode())
+    return list(zip(boundaries, boundaries[1:] + [None]))
+
+
+# pylint: disable=missing-class-docstring
+class Command(BaseCommand):
+    help = "Record the properties (size, content type, crc32c, generation and updated time) of blobs in the values of BlobFields. Objects are listed in pages rather than fetched one by one, so this is suitable for backfilling many rows or for resynchronising after objects are changed other than through the fields."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "fields",
+            nargs="*",
+            help="Fields to synchronise, as app_label.ModelName or app_label.ModelName.field_name. Defaults to every BlobField.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="The number of rows to look up in each query (default 500)"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="The number of ranges of each bucket to list concurrently (default 8)",
+        )
+        parser.add_argument(
+            "--max-requests-per-second",
+            type=float,
+            default=None,
+            help="The maximum rate of listing requests to make to the store (default unlimited)",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Report changes without updating any rows")
+
+    def handle(self, *args, **options):
+        limiter = RateLimiter(options["max_requests_per_second"])
+        for model, field in self._get_fields(options["fields"]):
+            checked, updated, missing = self.sync(model, field, limiter, **options)
+            action = "would update" if options["dry_run"] else "updated"
+            self.stdout.write(
+                f"{model._meta.label}.{field.name}: checked {checked} rows, {action} {updated}, "
+                f"{missing} with missing blobs"
+            )
+
+    def sync(self, model, field, limiter, batch_size, workers, dry_run, **_):
+        """Record the properties of blobs in the values of a field for every row of a model
+
+        Rows aren't held in memory: the range of referenced paths is split into ranges which are listed concurrently,
+        and the rows referencing each page of listed objects are looked up as the page arrives, then updated together
+        (with a bulk update). Each row is updated only if it still references the same path, so rows changed while
+        this runs are left as they are.
+
+        :return tuple(int, int, int): The number of rows with blobs, the number of those updated (or that would be on
+        a dry run) and the number whose blobs are missing from the store
+        """
+        paths = (
+            model._default_manager.annotate(_blob_path=KeyTextTransform("path", field.attname))
+            .filter(_blob_path__isnull=False)
+            .values_list("_blob_path", flat=True)
+        )
+        # In a single pass over the referenced paths (in no particular order, so the table isn't sorted), count them,
+        # find the first and last in the order objects are listed, and sample them uniformly to split them into ranges
+        size = workers * RANGES_PER_WORKER
+        sample = []
+        checked = 0
+        first = last = None
+        for path in paths.iterator(chunk_size=batch_size):
+            checked += 1
+            if first is None or path.encode() < first.encode():
+                first = path
+            if last is None or path.encode() > last.encode():
+                last = path
+            if len(sample) < size:
+                sample.append(path)
+            elif (index := random.randrange(checked)) < size:
+                sample[index] = path
+        if not checked:
+            return 0, 0, 0
+
+        # The ranges have about equal numbers of rows, as the sampled paths are spread like the rows' paths
+        ranges = get_listing_ranges([first, *sample])
+
+        bucket = field.storage.bucket
+        results = queue.Queue()
+        found = 0
+        updated = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._list, bucket, start, end, last, limiter, results) for start, end in ranges]
+            remaining = set(futures)
+            while remaining or not results.empty():
+                try:
+                    properties = results.get(timeout=0.1)
+                except queue.Empty:
+                    remaining = {future for future in remaining if not future.done()}
+                    continue
+
+                matched, changed = self._update(model, field, properties, dry_run, batch_size)
+                found += matched
+                updated += changed
+
+        # Raise any listing error, once the rows for other listings have been updated
+        for future in futures:
+            future.result()
+
+        return checked, updated, checked - found
+
+    @staticmethod
+    def _list(bucket, start, end, last, limiter, results):
+        """List objects in a range of names one page at a time, putting a mapping of their names to properties on a queue"""
+        pages = bucket.list_blobs(start_offset=start, end_offset=end, fields=LISTING_FIELDS).pages
+        while True:
+            limiter.wait()
+            page = next(pages, None)
+            if page is None:
+                return
+
+            listed = list(page)
+            blobs = [blob for blob in listed if blob.name.encode() <= last.encode()]
+            if blobs:
+                results.put({blob.name: get_blob_properties(blob) for blob in blobs})
+
+            # The last range runs to the end of the bucket, but no rows reference objects after the last path
+            if len(blobs) < len(listed):
+                return
+
+    @staticmethod
+    def _update(model, field, properties, dry_run, batch_size):
+        """Update the rows referencing a page of listed objects with the objects' properties
+
+        :return tuple(int, int): The number of rows referencing the objects, and the number updated
+        """
+        matched = 0
+        changed = 0
+        names = list(properties)
+        manager = model._default_manager
+        for start in range(0, len(names), batch_size):
+            rows = manager.filter(**{f"{field.attname}__path__in": names[start : start + batch_size]}).values_list(
+                "pk", field.attname
+            )
+            updates = {}
+            for pk, value in rows:
+                matched += 1
+                path = value["path"]
+                if {**value, **properties[path]} != value:
+                    updates[pk] = (path, properties[path])
+
+            if dry_run:
+                changed += len(updates)
+            elif updates:
+                # Rows are updated together, but only if they still reference the same path, not if changed since read
+                changed += len(record_blob_properties(model, field, updates, batch_size=batch_size))
+        return matched, changed
+
+    @staticmethod
+    def _get_fields(labels):
+        """Get the (model, field) of each BlobField to synchronise"""
+        fields = [
+            (model, field)
+            for model in apps.get_models()
+            if not model._meta.proxy
+            for field in model._meta.concrete_fields
+            if isinstance(field, BlobField)
+        ]
+        if not labels:
+            return fields
+
+        selected = []
+        for label in labels:
+            matching = [
+                (model, field)
+                for model, field in fields
+                if label.lower() in (model._meta.label_lower, f"{model._meta.label_lower}.{field.name}".lower())
+            ]
+            if not matching:
+                raise CommandError(f"No BlobField found matching {label}")
+            selected.extend(matching)
+        return selected
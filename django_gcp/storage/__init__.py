@@ -1,13 +1,17 @@
 # TODO: Refactor tests to import members directly then remove this module export
 from . import gcloud
-from .blob_utils import BlobFieldMixin, get_blob, get_blob_name, get_path, get_signed_url
+from .aio import AsyncGoogleCloudStorage
+from .blob_utils import BlobFieldMixin, get_blob, get_blob_name, get_path, get_signed_url, sign_blob_urls
 from .fields import BlobField
 from .gcloud import GoogleCloudFile, GoogleCloudMediaStorage, GoogleCloudStaticStorage, GoogleCloudStorage
 from .operations import upload_blob, uploaded_blob
+from .signing import CredentialsSigner, HMACKeySigner, IAMSigner, ServiceAccountKeySigner, Signer
 
 __all__ = [
+    "AsyncGoogleCloudStorage",
     "BlobField",
     "BlobFieldMixin",
+    "CredentialsSigner",
     "GoogleCloudStorage",
     "GoogleCloudFile",
     "gcloud",
@@ -17,6 +21,11 @@ __all__ = [
     "get_blob_name",
     "get_path",
     "get_signed_url",
+    "HMACKeySigner",
+    "IAMSigner",
+    "ServiceAccountKeySigner",
+    "Signer",
+    "sign_blob_urls",
     "upload_blob",
     "uploaded_blob",
 ]
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import mimetypes
+from tempfile import SpooledTemporaryFile
+from uuid import uuid4
+import weakref
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import File
+from django.core.files.utils import validate_file_name
+from google.api_core.exceptions import NotFound, from_http_status
+from google.auth.transport.requests import Request
+from google.cloud.storage import Blob
+from google.cloud.storage.blob import _quote
+
+from .cache import BLOB_METADATA_FIELDS, get_blob_metadata
+from .compress import READ_CHUNK_SIZE
+from .gcloud import CONTENT_ENCODING, CONTENT_TYPE, GoogleCloudStorage
+from .utils import clean_name, to_bytes
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+logger = logging.getLogger(__name__)
+
+# Sessions can only be used from the event loop they were created in, so are held per loop (then per connection limit)
+_sessions = weakref.WeakKeyDictionary()
+
+
+def get_session(limit):
+    """Get an aiohttp session shared by all async storages in the running event loop with the same connection limit"""
+    if aiohttp is None:
+        raise ImproperlyConfigured(
+            "AsyncGoogleCloudStorage requires aiohttp. Install it with `pip install django-gcp[aio]`."
+        )
+
+    sessions = _sessions.setdefault(asyncio.get_running_loop(), {})
+    if limit not in sessions or sessions[limit].closed:
+        sessions[limit] = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit))
+    return sessions[limit]
+
+
+async def close_sessions():
+    """Close the sessions used by async storages in the running event loop (eg on shutdown of an ASGI application)"""
+    for session in _sessions.pop(asyncio.get_running_loop(), {}).values():
+        await session.close()
+
+
+class AsyncGoogleCloudStorage(GoogleCloudStorage):  # pylint: disable=abstract-method
+    """Storage class adding asynchronous methods, for use from async views under ASGI
+
+    The `a`-prefixed methods (`aexists`, `asize`, `aopen`, `asave`, `adelete` and `aurl`) make requests directly to the
+    GCS JSON API using a connection pool shared by all async storages in the event loop, so that async views can make
+    many storage operations concurrently without a thread per operation. The synchronous methods are unchanged.
+
+    Requires aiohttp.
+    """
+
+    def __init__(self, store_key="media", **overrides):
+        super().__init__(store_key=store_key, **overrides)
+        self._credentials_lock = None
+        self._prefetch_lock = None
+
+    @property
+    def session(self):
+        """The aiohttp session used for requests made from the running event loop"""
+        return get_session(self.settings.async_connection_limit)
+
+    async def _get_auth_headers(self):
+        """Get headers authorizing a request with the storage client's credentials, refreshing them if necessary"""
+        credentials = self.client._credentials  # pylint: disable=protected-access
+        if not credentials.valid:
+            if self._credentials_lock is None:
+                self._credentials_lock = asyncio.Lock()
+            async with self._credentials_lock:
+                if not credentials.valid:
+                    # Refreshes are infrequent (tokens last an hour), so it's simplest to use google-auth's transport
+                    await asyncio.to_thread(credentials.refresh, Request())
+
+        headers = {}
+        credentials.apply(headers)
+        return headers
+
+    async def _request(self, method, path, params=None, data=None, headers=None, upload=False, file=None):
+        """Make a request to the JSON API for the bucket, returning the response body
+
+        :param str path: The path of the resource within the bucket, eg "/o/<quoted name>"
+        :param Union[file-like, None] file: A writable file to stream the body of a successful response to, rather than
+        returning it
+        :raises google.api_core.exceptions.GoogleAPICallError: If the request fails
+        """
+        api_base_url = self.client._connection.API_BASE_URL  # pylint: disable=protected-access
+        upload_prefix = "/upload" if upload else ""
+        url = f"{api_base_url}{upload_prefix}/storage/v1/b/{self.bucket_name}{path}"
+        headers = {**(await self._get_auth_headers()), **(headers or {})}
+
+        async with self.session.request(method, url, params=params, data=data, headers=headers) as response:
+            if response.status >= 400:
+                body = await response.read()
+                raise from_http_status(response.status, body.decode("utf-8", errors="replace"))
+            if file is None:
+                return await response.read()
+
+            async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                file.write(chunk)
+            return None
+
+    def _blob_from_resource(self, body):
+        """Get a blob with the properties of an object resource returned by the API"""
+        resource = json.loads(body)
+        blob = Blob(resource["name"], self.bucket)
+        blob._set_properties(resource)  # pylint: disable=protected-access
+        return blob
+
+    @staticmethod
+    def _object_path(name):
+        return f"/o/{_quote(name, safe=b'~')}"
+
+    async def _aget_metadata(self, name):
+        """Get a dict of metadata for the object with the given (normalized) name, or None if it doesn't exist
+
+        As for `_get_metadata()`, metadata is served from any prefetched listing or the metadata cache where possible.
+        """
+        if self._needs_prefetch():
+            if self._prefetch_lock is None:
+                self._prefetch_lock = asyncio.Lock()
+            async with self._prefetch_lock:
+                if self._needs_prefetch():
+                    # The listing is made in a chain of paginated requests, so is made in a thread
+                    await asyncio.to_thread(self.prefetch_metadata, ttl=self.settings.prefetch_metadata_ttl)
+
+        found, metadata = self._lookup_metadata(name)
+        if found:
+            return metadata
+
+        try:
+            body = await self._request("GET", self._object_path(name), params={"fields": BLOB_METADATA_FIELDS})
+            metadata = get_blob_metadata(self._blob_from_resource(body))
+        except NotFound:
+            metadata = None
+
+        if self.metadata_cache is not None:
+            self.metadata_cache.set(name, metadata)
+
+        return metadata
+
+    async def aexists(self, name):
+        if not name:  # root element aka the bucket
+            try:
+                await self._request("GET", "", params={"fields": "name"})
+                return True
+            except NotFound:
+                return False
+
+        name = self._normalize_name(clean_name(name))
+        return await self._aget_metadata(name) is not None
+
+    async def asize(self, name):
+        name = self._normalize_name(clean_name(name))
+        metadata = await self._aget_metadata(name)
+        if metadata is None:
+            raise NotFound(f"File does not exist: {name}")
+        return metadata["size"]
+
+    async def aopen(self, name, mode="rb"):
+        """Download a file, returning its content in a temporary file
+
+        The content is streamed to a file held in memory up to `max_memory_size` bytes, then on disk, as when files are
+        opened synchronously. Only reading is supported; to write files asynchronously, use `asave()`.
+        """
+        if "w" in mode or "a" in mode or "+" in mode:
+            raise ValueError(f"AsyncGoogleCloudStorage.aopen() doesn't support mode {mode}, use asave() instead")
+
+        name = self._normalize_name(clean_name(name))
+        file = SpooledTemporaryFile(
+            max_size=self.settings.max_memory_size,
+            suffix=".GSStorageFile",
+            dir=getattr(settings, "FILE_UPLOAD_TEMP_DIR"),
+        )
+        try:
+            # Objects stored with gzip encoding are decompressed (by GCS or the session) as they're served
+            await self._request("GET", self._object_path(name), params={"alt": "media"}, file=file)
+        except NotFound as e:
+            file.close()
+            raise FileNotFoundError(f"File does not exist: {name}") from e
+        except BaseException:
+            file.close()
+            raise
+
+        file.seek(0)
+        return File(file, name=name)
+
+    async def asave(self, name, content, max_length=None):
+        """Save a file, as `save()` does
+
+        The content is uploaded in a single request, so is read into memory. Save large files synchronously instead,
+        to use resumable or parallel uploads.
+        """
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        validate_file_name(name, allow_relative_path=True)
+        if self.settings.file_overwrite:
+            name = self.get_available_name(name, max_length=max_length)
+        else:
+            # Finding an available name requires checking for the existence of files
+            name = await asyncio.to_thread(self.get_available_name, name, max_length=max_length)
+        validate_file_name(name, allow_relative_path=True)
+
+        cleaned_name = clean_name(name)
+        name = self._normalize_name(cleaned_name)
+        content.name = cleaned_name
+
+        upload_params, blob_params, compress = self._get_upload_parameters(content, mimetypes.guess_type(name)[0])
+        if compress:
+            content, _ = self._compress_content_for_upload(content)
+            blob_params[CONTENT_ENCODING] = "gzip"
+        elif hasattr(content, "seek"):
+            content.seek(0)
+
+        # Use a blob to translate properties to their representation in the API
+        blob = Blob(name, self.bucket)
+        blob.content_type = upload_params[CONTENT_TYPE]
+        for prop, val in blob_params.items():
+            setattr(blob, prop, val)
+        resource = blob._get_writable_metadata()  # pylint: disable=protected-access
+
+        params = {"uploadType": "multipart"}
+        if upload_params["predefined_acl"] is not None:
+            params["predefinedAcl"] = upload_params["predefined_acl"]
+
+        boundary = uuid4().hex
+        data = b"".join(
+            [
+                f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n".encode(),
+                json.dumps(resource).encode(),
+                f"\r\n--{boundary}\r\nContent-Type: {blob.content_type or 'application/octet-stream'}\r\n\r\n".encode(),
+                to_bytes(content.read()),
+                f"\r\n--{boundary}--".encode(),
+            ]
+        )
+        body = await self._request(
+            "POST",
+            "/o",
+            params=params,
+            data=data,
+            headers={"Content-Type": f'multipart/related; boundary="{boundary}"'},
+            upload=True,
+        )
+
+        self._remember_metadata(name, get_blob_metadata(self._blob_from_resource(body)))
+
+        validate_file_name(cleaned_name, allow_relative_path=True)
+        return cleaned_name
+
+    async def adelete(self, name):
+        name = self._normalize_name(clean_name(name))
+        try:
+            await self._request("DELETE", self._object_path(name))
+        except NotFound:
+            pass
+
+        self._remember_metadata(name, None)
+
+    async def aurl(self, name):
+        if not self.settings.querystring_auth:
+            return self.url(name)
+
+        # Signing may require a request to the IAM API (eg on Cloud Run, without a private key), so don't block the loop
+        return await asyncio.to_thread(self.url, name)
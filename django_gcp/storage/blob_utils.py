@@ -1,6 +1,14 @@
 from datetime import timedelta
 from os.path import split
 
+from django.db import router, transaction
+from django.db.models import QuerySet
+
+from django_gcp.exceptions import MissingBlobError
+
+# Properties of a blob recorded in the value of a BlobField, so they can be used without requests to the store
+BLOB_PROPERTIES = ("size", "content_type", "crc32c", "generation", "updated")
+
 
 def get_path(instance, field_name):
     """Get the path of the blob in the object store"""
@@ -37,6 +45,82 @@ def get_blob(instance, field_name, reload=True):
         return blob
 
 
+def get_blob_properties(blob):
+    """Get the properties of a blob recorded in the value of a BlobField
+
+    :param google.cloud.storage.Blob blob: A blob whose properties have been loaded (eg by reload(), or by a copy)
+    :return dict: JSON-serialisable properties, with `updated` as an ISO 8601 string
+    """
+    return {
+        "size": blob.size,
+        "content_type": blob.content_type,
+        "crc32c": blob.crc32c,
+        "generation": blob.generation,
+        "updated": blob.updated.isoformat() if blob.updated is not None else None,
+    }
+
+
+def record_blob_properties(model, field, properties, batch_size=None):
+    """Record the properties of blobs in the values of a BlobField, for rows whose values still refer to the blobs
+
+    The rows are locked and read, then those still referring to the same paths are updated with a single bulk update,
+    so values changed since the properties were fetched (eg by a later save, or by another process) aren't reverted.
+    The properties are merged into the rows' current values.
+
+    :param django.db.models.Model model: The model with the BlobField
+    :param django.db.models.Field field: The BlobField
+    :param dict properties: Tuples of (path, properties) of the blob each row is expected to refer to, by primary key
+    :param Union[int, None] batch_size: The maximum number of rows to update in each query
+    :return dict: The resulting values of the rows that refer to the blobs, by primary key
+    """
+    values = {}
+    changed = []
+    with transaction.atomic(using=router.db_for_write(model)):
+        rows = model._default_manager.select_for_update().filter(pk__in=properties).values_list("pk", field.attname)
+        for pk, value in rows:
+            path, blob_properties = properties[pk]
+            if value is None or value.get("path") != path:
+                continue
+
+            values[pk] = {**value, **blob_properties}
+            if values[pk] != value:
+                changed.append(model(**{model._meta.pk.attname: pk, field.attname: values[pk]}))
+
+        if changed:
+            model._default_manager.bulk_update(changed, [field.attname], batch_size=batch_size)
+
+    return values
+
+
+def refresh_blob_properties(instance, field_name):
+    """Fetch the properties of the blob of a BlobField and record them in the stored value
+
+    The row is updated with a query updating only this field, so the rest of the instance isn't saved (and the
+    field's ingress logic isn't invoked). Use this to record properties in values saved before they were recorded, or
+    after an object is changed other than through the field.
+
+    :param django.db.Model instance: A saved instance of a django Model which has a BlobField
+    :param str field_name: The name of the BlobField attribute on the instance
+    :return Union[dict, None]: The updated value, or None if the field is blank (or if the stored value no longer
+    refers to the blob, in which case it's left as it is)
+    :raises django_gcp.exceptions.MissingBlobError: If the blob doesn't exist in the store
+    """
+    path = get_path(instance, field_name)
+    if path is None:
+        return None
+
+    field = instance._meta.get_field(field_name)
+    blob = field.storage.bucket.get_blob(path)
+    if blob is None:
+        raise MissingBlobError(f"Blob {path} of {instance.__class__.__name__}.{field_name} is missing from the store")
+
+    values = record_blob_properties(instance.__class__, field, {instance.pk: (path, get_blob_properties(blob))})
+    value = values.get(instance.pk)
+    if value is not None and get_path(instance, field_name) == path:
+        setattr(instance, field.attname, value)
+    return value
+
+
 def get_blob_name(instance, field_name):
     """Get the name of the blob including its extension (absent any path)
 
@@ -58,9 +142,64 @@ def get_signed_url(instance, field_name, expiration=None, **kwargs):
     expiration = expiration or timedelta(hours=24)
     blob = get_blob(instance, field_name)
     if blob is not None:
+        signer = instance._meta.get_field(field_name).storage.settings.signer
+        if signer is not None:
+            return signer.generate_signed_url(blob, expiration=expiration, **kwargs)
         return blob.generate_signed_url(expiration=expiration, **kwargs)
 
 
+def sign_blob_urls(queryset, field_name, expiration=None, **kwargs):
+    """Get signed URLs to the blobs of a BlobField for many model instances at once
+
+    Unlike get_signed_url(), blobs aren't reloaded before signing, so no requests are made to the store. Any remote
+    signing (eg with the IAM API) is done concurrently, using the store's pool of threads for bulk operations. URLs are
+    signed with the store's signer and reused from its signed URL cache, if enabled. For example, in a list endpoint:
+
+    ```py
+    urls = sign_blob_urls(page, "blob", response_disposition="inline")
+    return [{"id": instance.pk, "url": urls[instance.pk]} for instance in page]
+    ```
+
+    :param Union[django.db.models.QuerySet, Iterable[django.db.models.Model]] queryset: A queryset of (or iterable of
+    instances of) a model with a BlobField. Given a queryset, only the primary keys and field values are fetched.
+    :param str field_name: The name of the BlobField
+    :param Union[datetime.datetime, datetime.timedelta, int, None] expiration: When the URLs expire; defaults to the
+    `expiration` setting of the field's store
+    :param kwargs: Other arguments to `Blob.generate_signed_url()`, eg response_disposition or response_type
+    :return dict: Signed URLs keyed by the primary key of each instance, which are None for instances with no blob
+    :raises Exception: The first error signing a URL, once all URLs have been attempted
+    """
+    if isinstance(queryset, QuerySet):
+        storage = queryset.model._meta.get_field(field_name).storage
+        values = queryset.values_list("pk", field_name)
+    else:
+        instances = list(queryset)
+        if not instances:
+            return {}
+        storage = instances[0]._meta.get_field(field_name).storage
+        values = [(instance.pk, getattr(instance, field_name)) for instance in instances]
+
+    urls = {}
+    paths = []
+    for pk, value in values:
+        path = value.get("path", None) if value is not None else None
+        urls[pk] = None
+        if path is not None:
+            paths.append((path, pk))
+
+    def sign(path, _pk):
+        # Paths in BlobFields are full object names, rather than names relative to the store's location
+        return storage.signed_url(path, expiration=expiration, normalized=True, **kwargs)
+
+    results = storage._run_bulk(sign, paths)  # pylint: disable=protected-access
+    for (_, pk), result in zip(paths, results):
+        if not result.ok:
+            raise result.error
+        urls[pk] = result.result
+
+    return urls
+
+
 def get_signed_download_url(instance, field_name, **kwargs):
     """Gets a signed URL with the response disposition set to an attachment"""
     name = get_blob_name(instance, field_name)
@@ -96,6 +235,10 @@ class BlobFieldMixin:
     def get_bucket_name(cls, field_name):
         return cls.get_bucket(field_name).name
 
+    def refresh_blob_properties(self, field_name):
+        """Fetch the properties of the blob for the given model field name and record them in the stored value"""
+        return refresh_blob_properties(self, field_name)
+
     def get_console_url(self, field_name):
         """Get a URL to where the file resides in GCP cloud console"""
         return get_console_url(self, field_name)
@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import json
+import threading
+import time
+
+from django.core.cache import caches
+
+DEFAULT_METADATA_CACHE_SIZE = 1024
+
+# A fields mask restricting object listings to the properties used by get_blob_metadata
+BLOB_METADATA_FIELDS = (
+    "name,size,updated,timeCreated,generation,md5Hash,crc32c,contentType,contentEncoding,cacheControl"
+)
+LISTING_METADATA_FIELDS = f"items({BLOB_METADATA_FIELDS}),nextPageToken"
+
+# A fields mask restricting bucket metadata to the properties used by get_bucket_properties
+BUCKET_PROPERTIES_FIELDS = "versioning,location,locationType,storageClass,retentionPolicy"
+
+DEFAULT_BUCKET_PROPERTIES_TTL = 300
+
+DEFAULT_PREFETCH_METADATA_TTL = 300
+
+
+def get_blob_metadata(blob):
+    """Get a dict of the metadata of a blob used to answer storage queries like size and modified time
+
+    Only properties returned in a listing of objects are included, so that metadata can be obtained
+    for many blobs at once.
+    """
+    return {
+        "size": blob.size,
+        "updated": blob.updated,
+        "time_created": blob.time_created,
+        "generation": blob.generation,
+        "md5_hash": blob.md5_hash,
+        "crc32c": blob.crc32c,
+        "content_type": blob.content_type,
+        "content_encoding": blob.content_encoding,
+        "cache_control": blob.cache_control,
+    }
+
+
+def get_bucket_properties(bucket):
+    """Get a dict of the properties of a bucket which determine how objects are stored in it"""
+    return {
+        "versioning_enabled": bool(bucket.versioning_enabled),
+        "location": bucket.location,
+        "location_type": bucket.location_type,
+        "storage_class": bucket.storage_class,
+        "retention_period": bucket.retention_period,
+        "retention_policy_locked": bool(bucket.retention_policy_locked),
+    }
+
+
+class ExpiringCache:
+    """A least-recently-used cache whose entries expire after a time-to-live
+
+    Entries are held in-process and, if a django cache alias is given, also in that cache so they can be
+    shared between processes.
+
+    :param Union[int, float, datetime.timedelta] ttl: The time (in seconds, or as a timedelta) after which entries expire
+    :param int max_size: The maximum number of entries held in-process
+    :param Union[str, None] alias: The alias of a cache in django's CACHES setting, to also store entries in
+    :param str key_prefix: A prefix for keys in the django cache, to distinguish entries from different buckets
+    """
+
+    namespace = "cache"
+
+    def __init__(self, ttl, max_size=DEFAULT_METADATA_CACHE_SIZE, alias=None, key_prefix=""):
+        self.ttl = _seconds(ttl)
+        self.max_size = max_size
+        self.alias = alias
+        self.key_prefix = key_prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def _shared_cache(self):
+        return caches[self.alias] if self.alias is not None else None
+
+    def _shared_key(self, name):
+        """A key for the django cache, hashed to respect key length and character restrictions of cache backends"""
+        digest = hashlib.md5(f"{self.key_prefix}:{name}".encode()).hexdigest()
+        return f"django_gcp:{self.namespace}:{digest}"
+
+    def lookup(self, name):
+        """Look up an entry
+
+        :param str name: The key of the entry
+        :return tuple(bool, Any): Whether an entry was found, and its value
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(name)
+                    return True, value
+                del self._entries[name]
+
+        if self._shared_cache is not None:
+            entry = self._shared_cache.get(self._shared_key(name))
+            if entry is not None:
+                value, expires_at = entry
+                remaining = expires_at - time.time()
+                if remaining > 0:
+                    self._set_local(name, value, remaining)
+                    return True, value
+
+        return False, None
+
+    def set(self, name, value, ttl=None):
+        """Cache a value, optionally with a different time-to-live (in seconds, or as a timedelta) to the default"""
+        ttl = self.ttl if ttl is None else _seconds(ttl)
+        self._set_local(name, value, ttl)
+        if self._shared_cache is not None:
+            # Store the expiry time so that processes fetching the entry hold it for no longer than it remains valid
+            self._shared_cache.set(self._shared_key(name), (value, time.time() + ttl), timeout=ttl)
+
+    def delete(self, name):
+        """Remove any cached value"""
+        with self._lock:
+            self._entries.pop(name, None)
+        if self._shared_cache is not None:
+            self._shared_cache.delete(self._shared_key(name))
+
+    def clear(self):
+        """Remove all entries cached in-process (entries in any django cache are left to expire)"""
+        with self._lock:
+            self._entries.clear()
+
+    def _set_local(self, name, value, ttl):
+        with self._lock:
+            self._entries[name] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class MetadataCache(ExpiringCache):
+    """A cache of object metadata, keyed by object name
+
+    Missing objects are cached (as None) as well as existing ones.
+    """
+
+    namespace = "metadata"
+
+
+class SignedUrlCache(ExpiringCache):
+    """A cache of signed URLs, keyed by the object name and the parameters the URL was signed with"""
+
+    namespace = "signed_url"
+
+    @staticmethod
+    def get_key(name, method, expiration, **kwargs):
+        """Get the key of a URL signed for an object with the given (relative) expiration and other parameters"""
+        return json.dumps([name, method, float(_seconds(expiration)), sorted(kwargs.items())], default=str)
+
+
+def _seconds(duration):
+    return duration.total_seconds() if isinstance(duration, timedelta) else duration
@@ -1,47 +1,201 @@
 from gzip import GzipFile
 import io
+import os
 from typing import Optional
 import zlib
 
-from .utils import to_bytes
+from django.core.exceptions import ImproperlyConfigured
+
+from .utils import to_buffer
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+DEFAULT_GZIP_LEVEL = zlib.Z_BEST_COMPRESSION
+
+# The amount of content read from the wrapped file at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+# Content up to this size is compressed in memory, so that its compressed size is known before upload (which allows
+# it to be made in a single request). This matches the largest upload google-cloud-storage makes in a single request.
+MAX_BUFFERED_SIZE = 8 * 1024 * 1024
+
+
+# The suffixes of the names of precompressed variants of files, by content encoding
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "zstd": ".zst"}
+
+# Variants are compressed once, when collecting static files, so are compressed as small as possible
+BROTLI_QUALITY = 11
+ZSTD_LEVEL = 19
+
+
+def _compress_brotli(data):
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def _compress_zstd(data):
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def get_precompressor(encoding):
+    """Get the function compressing bytes in a content encoding for which precompressed variants can be made
+
+    :raises ImproperlyConfigured: If the encoding isn't supported, or the package implementing it isn't installed
+    """
+    if encoding == "br":
+        if brotli is None:
+            raise ImproperlyConfigured(
+                "Precompressing files with brotli requires brotli. Install it with `pip install django-gcp[brotli]`."
+            )
+        return _compress_brotli
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ImproperlyConfigured(
+                "Precompressing files with zstd requires zstandard. Install it with `pip install django-gcp[zstd]`."
+            )
+        return _compress_zstd
+    raise ImproperlyConfigured(
+        f"Unsupported precompression encoding '{encoding}'; use any of {', '.join(PRECOMPRESSED_SUFFIXES)}"
+    )
+
+
+def precompress(data, encodings):
+    """Compress bytes in each of the given content encodings, which is done in worker processes by collectstatic
+
+    :return dict: The compressed bytes, by encoding
+    """
+    return {encoding: get_precompressor(encoding)(data) for encoding in encodings}
+
+
+def get_accepted_encodings(accept_encoding):
+    """Get the content encodings accepted by a client, from the value of its Accept-Encoding header
+
+    :return set(str): The accepted encodings (excluding any given a quality of zero)
+    """
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding.strip():
+            accepted.add(coding.strip().lower())
+    return accepted
 
 
 class GzipCompressionWrapper(io.RawIOBase):
-    """Wrapper for compressing file contents on the fly."""
+    """Wrapper for compressing file contents on the fly.
+
+    Compressed output is buffered only until read, and the wrapper can be rewound (by compressing again from the
+    start) if the wrapped file is seekable, so it can be used as the stream of resumable uploads.
+    """
 
-    def __init__(self, raw, level=zlib.Z_BEST_COMPRESSION):
+    def __init__(self, raw, level=DEFAULT_GZIP_LEVEL):
         super().__init__()
         self.raw = raw
-        self.compress = zlib.compressobj(level=level, wbits=31)
-        self.leftover = bytearray()
+        self.level = level
+        self._start = raw.tell() if self.seekable() else None
+        self._reset()
+
+    def _reset(self):
+        self.compress = zlib.compressobj(level=self.level, wbits=31)
+        self._buffer = bytearray()
+        self._offset = 0
+        self._position = 0
 
     @staticmethod
     def readable():
         return True
 
-    def readinto(self, buf: bytearray) -> Optional[int]:
-        size = len(buf)
-        while len(self.leftover) < size:
-            chunk = to_bytes(self.raw.read(size))
-            if not chunk:
-                if self.compress:
-                    self.leftover += self.compress.flush(zlib.Z_FINISH)
-                    self.compress = None
+    def seekable(self):
+        seekable = getattr(self.raw, "seekable", None)
+        return bool(seekable and seekable())
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence != os.SEEK_SET:
+            raise io.UnsupportedOperation("Compressed content can only be seeked relative to its start")
+
+        if offset < self._position:
+            if not self.seekable():
+                raise io.UnsupportedOperation(
+                    "Compressed content can't be rewound when the wrapped file isn't seekable"
+                )
+            self.raw.seek(self._start)
+            self._reset()
+
+        # Compression is deterministic, so seek forward by compressing (and discarding) up to the position
+        while self._position < offset:
+            if not self.read(min(offset - self._position, READ_CHUNK_SIZE)):
                 break
-            self.leftover += self.compress.compress(chunk)
-        if len(self.leftover) == 0:
-            return 0
-        output = self.leftover[:size]
-        size = len(output)
-        buf[:size] = output
-        self.leftover = self.leftover[size:]
+        return self._position
+
+    def readinto(self, buf: bytearray) -> Optional[int]:
+        # Any writable buffer is accepted, and filled with bytes whatever its format
+        with memoryview(buf) as view:
+            return self._readinto(view.cast("B"))
+
+    def _readinto(self, target: memoryview) -> int:
+        size = len(target)
+        while len(self._buffer) - self._offset < size and self.compress is not None:
+            chunk = to_buffer(self.raw.read(max(size, READ_CHUNK_SIZE)))
+            if chunk:
+                self._buffer += self.compress.compress(chunk)
+            else:
+                self._buffer += self.compress.flush(zlib.Z_FINISH)
+                self.compress = None
+
+        size = min(size, len(self._buffer) - self._offset)
+        with memoryview(self._buffer) as buffer:
+            target[:size] = buffer[self._offset : self._offset + size]
+        self._offset += size
+        self._position += size
+
+        # Discard output once read, moving unread output only when it's no bigger than that read, so that the cost
+        # of moving output is amortised across reads rather than paid on every read
+        if self._offset >= len(self._buffer) - self._offset:
+            del self._buffer[: self._offset]
+            self._offset = 0
+
         return size
 
 
 class CompressStorageMixin:
     def _compress_content(self, content):
         """Gzip a given string content."""
-        return GzipCompressionWrapper(content)
+        return GzipCompressionWrapper(content, level=self.settings.gzip_level)
+
+    def _compress_content_for_upload(self, content):
+        """Gzip content to upload, compressing it in memory if it's small enough that the compressed size is useful
+
+        :return tuple(file, int|None): The compressed content, and its size if known
+        """
+        seekable = getattr(content, "seekable", None)
+        if seekable and seekable():
+            content.seek(0)
+
+        compressed = self._compress_content(content)
+        size = getattr(content, "size", None)
+        if size is None or size > MAX_BUFFERED_SIZE:
+            return compressed, None
+
+        data = compressed.read()
+        return io.BytesIO(data), len(data)
 
 
 class CompressedFileMixin:
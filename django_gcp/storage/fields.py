@@ -1,7 +1,9 @@
 import json
 import logging
 import os
+import threading
 from uuid import uuid4
+import weakref
 
 from django.conf import settings
 from django.contrib.admin.widgets import AdminTextareaWidget
@@ -10,13 +12,18 @@ from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
+from django_gcp.exceptions import MissingBlobError
+
+from .blob_utils import BLOB_PROPERTIES, get_blob_properties, record_blob_properties
 from .forms import CloudObjectFormField
 from .gcloud import GoogleCloudStorage
-from .operations import UNLIMITED_MAX_SIZE, blob_exists, copy_blob, get_signed_upload_url
+from .operations import UNLIMITED_MAX_SIZE, blob_exists, copy_blob, delete_blobs, get_signed_upload_url
 from .widgets import DEFAULT_ACCEPT_MIMETYPE, CloudObjectWidget
 
 logger = logging.getLogger(__name__)
 
+_pending_batches = threading.local()
+
 DEFAULT_OVERWRITE_MODE = "never"
 
 OVERWRITE_MODES = [
@@ -31,6 +38,172 @@ OVERWRITE_MODES = [
 
 DEFAULT_OVERRIDE_BLOBFIELD_VALUE = False
 
+DEFAULT_VALIDATE_INGRESS = True
+
+
+class IngressMove:
+    """The move of a blob from its temporary ingress path to its destination, made on commit of a transaction"""
+
+    def __init__(self, field, instance, temporary_path, new_value, allow_overwrite, attributes):
+        self.field = field
+        self.instance = instance
+        self.temporary_path = temporary_path
+        self.new_value = new_value
+        self.allow_overwrite = allow_overwrite
+        self.attributes = attributes
+
+    def record(self, properties):
+        """Record the properties of the copied blob in the new value, and on the instance if it still refers to the blob"""
+        self.new_value = {**self.new_value, **properties}
+        value = getattr(self.instance, self.field.attname)
+        if value is not None and value.get("path") == self.new_value["path"]:
+            setattr(self.instance, self.field.attname, {**value, **properties})
+
+    def copy(self):
+        bucket = self.field.storage.bucket
+        try:
+            return copy_blob(
+                bucket,
+                self.temporary_path,
+                bucket,
+                self.new_value["path"],
+                overwrite=self.allow_overwrite,
+                attributes=self.attributes,
+                merge_source_metadata=False,
+            )
+        except MissingBlobError as e:
+            # Only possible if validation of ingress is disabled or the blob was removed since it was validated
+            raise MissingBlobError(
+                f"Upload incomplete or failed (no blob at '{self.temporary_path}' in bucket '{bucket.name}'), so"
+                f" the {self.instance.__class__.__name__}.{self.field.attname} value saved refers to a missing blob"
+            ) from e
+
+
+class IngressBatch:
+    """Moves of ingressed blobs registered by BlobFields in the same transaction, made together on its commit
+
+    Saving many instances in one transaction (eg in a bulk admin action or data import) would otherwise make
+    a copy, a delete and possibly a patch request per blob, in series. Instead, moves are added to a pending
+    batch for the connection, which registers a single on_commit callback to flush it.
+
+    A batch is only added to while the savepoints open when it was started are, so a savepoint rollback can't have
+    discarded its flush. Pending batches are otherwise only weakly referenced, so are held by their flushes, and a
+    batch whose flush is discarded by rolling back the transaction is released with it.
+
+    Rolling back a savepoint also rolls back the saves of field values made in it, so on flush, only moves whose
+    destinations are still referred to by the saved values are made. The blobs are copied concurrently, their
+    temporary blobs deleted in batch requests, then any `on_change` callbacks called in the order the moves were
+    registered.
+
+    The properties of copied blobs (like size and generation) are recorded in the field values, with an update
+    query for each model, so they're available without requests to the store.
+    """
+
+    def __init__(self, using=None, savepoint_ids=()):
+        self.using = using
+        self.savepoint_ids = savepoint_ids
+        self.moves = []
+
+    @classmethod
+    def register(cls, move):
+        """Register a move to be made on commit of the current transaction (or immediately, outside a transaction)"""
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            cls().make([move])
+            return
+
+        if getattr(_pending_batches, "batches", None) is None:
+            _pending_batches.batches = weakref.WeakValueDictionary()
+
+        savepoint_ids = tuple(connection.savepoint_ids)
+        batch = _pending_batches.batches.get(connection.alias)
+        if batch is None or savepoint_ids[: len(batch.savepoint_ids)] != batch.savepoint_ids:
+            batch = cls(using=connection.alias, savepoint_ids=savepoint_ids)
+            _pending_batches.batches[connection.alias] = batch
+            transaction.on_commit(batch.flush, using=connection.alias)
+
+        batch.moves.append(move)
+
+    def flush(self):
+        """Make the moves whose field values were saved, on commit of the transaction in which they were registered"""
+        batches = getattr(_pending_batches, "batches", {})
+        if batches.get(self.using) is self:
+            del batches[self.using]
+
+        moves, self.moves = self.moves, []
+        self.make(self._get_saved(moves))
+
+    def _get_saved(self, moves):
+        """Get the moves whose destinations are referred to by the field values saved in the database"""
+        values = {}
+        for move in moves:
+            values.setdefault((move.instance.__class__, move.field), {})[move.instance.pk] = None
+
+        for (model, field), pks in values.items():
+            saved = model._default_manager.using(self.using).filter(pk__in=pks).values_list("pk", field.attname)
+            pks.update(saved)
+
+        return [
+            move
+            for move in moves
+            if (values[move.instance.__class__, move.field][move.instance.pk] or {}).get("path")
+            == move.new_value["path"]
+        ]
+
+    @staticmethod
+    def _record(moved):
+        """Record the properties of copied blobs in the values of their fields, in the database and on the instances
+
+        Rows are only updated if they still refer to the copied blobs, so values saved since the moves were registered
+        (eg by a later save in the same request, or by another process) aren't reverted.
+        """
+        updates = {}
+        for move, blob in moved:
+            properties = get_blob_properties(blob)
+            move.record(properties)
+            fields = updates.setdefault(move.instance.__class__, {}).setdefault(move.field, {})
+            fields[move.instance.pk] = (move.new_value["path"], properties)
+
+        for model, fields in updates.items():
+            for field, properties in fields.items():
+                record_blob_properties(model, field, properties)
+
+    def make(self, moves):
+        """Copy the blobs of moves to their destinations, then remove their temporary blobs"""
+        if not moves:
+            return
+
+        storage = moves[0].field.storage
+        # pylint: disable-next=protected-access
+        results = storage._run_bulk(lambda _, move: move.copy(), ((move.new_value["path"], move) for move in moves))
+
+        # Remove the temporary blobs of copied moves, in batches for each bucket
+        copied = {}
+        for move, result in zip(moves, results):
+            if result.ok:
+                copied.setdefault(move.field.storage.bucket.name, []).append((move, result))
+
+        for bucket_moves in copied.values():
+            bucket = bucket_moves[0][0].field.storage.bucket
+            delete_results = delete_blobs(
+                bucket, [move.temporary_path for move, _ in bucket_moves], executor=storage.bulk_executor
+            )
+            for (move, result), delete_result in zip(bucket_moves, delete_results):
+                result.error = delete_result.error
+                if result.ok:
+                    logger.info("Blob %s in bucket %s moved to blob %s", move.temporary_path, bucket.name, result.name)
+
+        moved = [(move, result.result) for move, result in zip(moves, results) if result.ok]
+        self._record(moved)
+
+        for move, _copied in moved:
+            if move.field.on_change is not None:
+                move.field.on_change(move.new_value, instance=move.instance)
+
+        for result in results:
+            if not result.ok:
+                raise result.error
+
 
 class BlobField(models.JSONField):
     """A FileField replacement with cloud store object-specific features
@@ -44,10 +217,10 @@ class BlobField(models.JSONField):
       defining a Storage class for each bucket
 
     BlobField is built on JSONField to allow more complex information to be stored
-    and queried. Examples might include:
-     - cached object generation or metageneration,
-     - cached object metadata, or
-     - status of direct uploads
+    and queried. Alongside the `path` of the blob, its `size`, `content_type`, `crc32c`,
+    `generation` and `updated` time are recorded when it's ingressed, so they can be used
+    (eg in listings) without requests to the store. Use `refresh_blob_properties` to record
+    them for values saved previously.
 
     BlobField does not inherit directly from FileField to avoid the burden of strict
     compatibility with legacy or irrelevant-to-cloud-storage behaviour (like django
@@ -83,6 +256,10 @@ class BlobField(models.JSONField):
     - add-update: Always allow (ie when adding or updating an object)
     - add-update-versioned: When adding or updating an object to a versioned bucket
 
+    :param update_attributes: A callable returning the attributes (eg `content_type` or `metadata`) to set on an
+    ingressed blob, called in the pre_save stage with the attributes given in the value. Attributes returned replace
+    those of the uploaded blob, rather than being merged with them, so the blob is moved in a single request.
+
     :param on_change: A callable that will be executed on change of the field value. This will be called
     on commit of the transaction (ie once any file upload is ingressed to its final location) and allows you,
     for example, to dispatch a worker task to further process the uploaded blob.
@@ -107,7 +284,6 @@ class BlobField(models.JSONField):
         self._cleaned = False
         self._on_commit_blank = None
         self._on_commit_valid = None
-        self._versioning_enabled = None
         self._temporary_path = None
         self._max_size_bytes = max_size_bytes
         self._primary_key_set_explicitly = "primary_key" in kwargs
@@ -191,6 +367,15 @@ class BlobField(models.JSONField):
             DEFAULT_OVERRIDE_BLOBFIELD_VALUE,
         )
 
+    @property
+    def validate_ingress(self):
+        """Shortcut to access the GCP_STORAGE_BLOBFIELD_VALIDATE_INGRESS setting"""
+        return getattr(
+            settings,
+            "GCP_STORAGE_BLOBFIELD_VALIDATE_INGRESS",
+            DEFAULT_VALIDATE_INGRESS,
+        )
+
     @property
     def max_size_bytes(self):
         """Shortcut to determine the max size in bytes allowable as an upload
@@ -250,8 +435,14 @@ class BlobField(models.JSONField):
             unchanged = not add and self._get_unchanged(model_instance)
 
             # Branch based on scenarios
-            if unchanged:
-                new_value = {"path": value["path"]} if value is not None else None
+            if unchanged and value is not None:
+                # Keep the blob properties recorded in the database, which can't be set by clients
+                existing_value = model_instance._state.fields_cache.get(self.attname) or {}
+                new_value = {"path": value["path"]}
+                new_value.update((key, existing_value[key]) for key in BLOB_PROPERTIES if key in existing_value)
+
+            elif unchanged:
+                new_value = None
 
             elif adding_blank or updating_valid_to_blank:
                 new_value = None
@@ -298,29 +489,23 @@ class BlobField(models.JSONField):
                     new_value["path"],
                 )
 
-                # Trigger the copy only on successful commit of the transaction. We have to
+                # Trigger the move only on successful commit of the transaction. We have to
                 # capture the dual edge cases of the file not moving correctly, and the database
                 # row not saving (eg due to validation errors in other model fields).
                 # https://stackoverflow.com/questions/33180727/trigering-post-save-signal-only-after-transaction-has-completed
-                def on_commit_valid():
-                    copy_blob(
-                        self.storage.bucket,
-                        value["_tmp_path"],
-                        self.storage.bucket,
-                        new_value["path"],
-                        move=True,
-                        overwrite=allow_overwrite,
-                        attributes=attributes,
-                    )
-                    if self.on_change is not None:
-                        self.on_change(new_value, instance=model_instance)
-
                 logger.info(
                     "Registered move of %s to %s to happen on transaction commit",
                     value["_tmp_path"],
                     new_value["path"],
                 )
-                self._on_commit_valid = on_commit_valid
+                self._on_commit_valid = IngressMove(
+                    field=self,
+                    instance=model_instance,
+                    temporary_path=value["_tmp_path"],
+                    new_value=new_value,
+                    allow_overwrite=allow_overwrite,
+                    attributes=attributes,
+                )
 
             else:
                 # Raise unknown edge cases rather than failing silently
@@ -347,7 +532,7 @@ class BlobField(models.JSONField):
             self._on_commit_blank = None
 
         if self._on_commit_valid is not None:
-            transaction.on_commit(self._on_commit_valid)
+            IngressBatch.register(self._on_commit_valid)
             self._on_commit_valid = None
 
         # Reset the spaghetti used for meeting all django's awkward flows
@@ -362,7 +547,8 @@ class BlobField(models.JSONField):
         """Validate field value contents
         Checks that the value is a dict and checks blankness.
         If the model is in an adding state, checks contents of the value and also presence
-        of the ingressing file in the cloud store (this latter check causes an API request to the store)
+        of the ingressing file in the cloud store (this latter check causes an API request to the store,
+        and is skipped if the GCP_STORAGE_BLOBFIELD_VALIDATE_INGRESS setting is False)
         """
 
         # Override the superclass completely because it doesn't do anything useful
@@ -444,8 +630,9 @@ class BlobField(models.JSONField):
             if not has_path:
                 raise ValidationError("Provide the existing blob path")
 
-        # Check for temporary blob completion
-        if has_tmp_path_and_name:
+        # Check for temporary blob completion. Without this check, a missing blob is only detected by the
+        # copy made on commit, which raises a MissingBlobError
+        if has_tmp_path_and_name and self.validate_ingress:
             tmp_path = value["_tmp_path"]
             if not blob_exists(self.storage.bucket, tmp_path):
                 raise ValidationError(
@@ -463,10 +650,11 @@ class BlobField(models.JSONField):
 
     @property
     def versioning_enabled(self):
-        """True if object versioning is enabled on the bucket configured for this field"""
-        if self._versioning_enabled is None:
-            self._versioning_enabled = bool(self.storage.bucket.versioning_enabled)
-        return self._versioning_enabled
+        """True if object versioning is enabled on the bucket configured for this field
+
+        Determined from the bucket properties cached by the storage, which are shared by all fields using the bucket.
+        """
+        return self.storage.versioning_enabled
 
     def _check_ingress_to(self):
         if isinstance(self.ingress_to, str) and self.ingress_to.startswith("/"):
@@ -545,16 +733,17 @@ class BlobField(models.JSONField):
 
     def _get_allow_overwrite(self, add):
         """Return a boolean determining if overwrite should be allowed for this operation"""
+        # Only check versioning for modes that depend on it, since it may require a request for bucket properties
+        if self.overwrite_mode.endswith("-versioned") and not self.versioning_enabled:
+            return False
+
         mode_map = {
             "never": False,
             "update": not add,
-            "update-versioned": self.versioning_enabled and not add,
             "add": add,
-            "add-versioned": self.versioning_enabled and add,
             "add-update": True,
-            "add-update-versioned": self.versioning_enabled,
         }
-        return mode_map[self.overwrite_mode]
+        return mode_map[self.overwrite_mode.removesuffix("-versioned")]
 
     def _get_blank_to_valid(self, instance):
         """Return true if overwriting a blank path with a valid one"""
@@ -609,6 +798,7 @@ class BlobField(models.JSONField):
             self._get_temporary_path(),
             content_type="application/octet-stream",
             max_size_bytes=self.max_size_bytes,
+            signer=self.storage.settings.signer,
         )
 
     def _get_temporary_path(self):
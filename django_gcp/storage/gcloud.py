@@ -1,27 +1,113 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import repeat
+import json
 import logging
 import mimetypes
+import multiprocessing
 from tempfile import SpooledTemporaryFile
+import threading
+import time
 
 from django.conf import settings
-from django.core.exceptions import SuspiciousOperation
-from django.core.files.base import File
+from django.core.exceptions import ImproperlyConfigured, SuspiciousOperation
+from django.core.files.base import ContentFile, File
 from django.core.files.storage import Storage
 from django.utils import timezone
 from django.utils.deconstruct import deconstructible
-from google.cloud.exceptions import NotFound
-from google.cloud.storage import Blob, Client
+from google.cloud.exceptions import Forbidden, NotFound
+from google.cloud.storage import Blob, Bucket, Client
 from google.cloud.storage.blob import _quote
-
-from .compress import CompressedFileMixin, CompressStorageMixin
+from google.cloud.storage.fileio import BlobReader, BlobWriter
+from requests.adapters import HTTPAdapter
+
+from django_gcp.exceptions import MissingBlobError
+
+from .cache import (
+    BUCKET_PROPERTIES_FIELDS,
+    LISTING_METADATA_FIELDS,
+    ExpiringCache,
+    MetadataCache,
+    SignedUrlCache,
+    get_blob_metadata,
+    get_bucket_properties,
+)
+from .compress import (
+    PRECOMPRESSED_SUFFIXES,
+    CompressedFileMixin,
+    CompressStorageMixin,
+    get_accepted_encodings,
+    get_precompressor,
+    precompress,
+)
+from .operations import delete_blobs, download_blob_sliced, run_bulk, upload_blob_composite
 from .settings import StorageSettings
-from .utils import clean_name, get_available_overwrite_name, safe_join, to_bytes
+from .signing import CredentialsSigner
+from .utils import (
+    clean_name,
+    get_available_overwrite_name,
+    get_content_hashes,
+    get_executor,
+    safe_join,
+    to_buffer,
+    to_bytes,
+)
 
 CONTENT_ENCODING = "content_encoding"
 CONTENT_TYPE = "content_type"
 
+# A fields mask restricting directory listings to the names of objects and prefixes
+LISTDIR_FIELDS = "items(name),prefixes,nextPageToken"
+
+# The properties of listed objects fetched by iter_blobs() by default
+ITER_BLOBS_FIELDS = ("name",)
+
+# The number of static files read then compressed together when making precompressed variants
+PRECOMPRESS_BATCH_SIZE = 64
+
 
 logger = logging.getLogger(__name__)
 
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Properties of buckets, keyed by bucket name, shared by all stores (and so all BlobFields) using a bucket
+_bucket_properties = ExpiringCache(ttl=0)
+
+
+def get_client(project=None, credentials=None, pool_size=None):
+    """Get a storage client shared by all stores in the process with the same project, credentials and pool size
+
+    Sharing a client shares its pool of kept-alive connections and its credentials (so access tokens are refreshed
+    once for all stores, rather than by each store).
+
+    :param Union[str, None] project: The project to use, or None to determine it from the environment
+    :param Union[google.auth.credentials.Credentials, None] credentials: The credentials to use, or None to use defaults
+    :param Union[int, None] pool_size: The maximum number of connections kept alive to each host, or None for the default
+    """
+    key = (project, credentials, pool_size)
+    with _clients_lock:
+        if key not in _clients:
+            client = Client(project=project, credentials=credentials)
+            if pool_size is not None:
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                client._http.mount("https://", adapter)  # pylint: disable=protected-access
+                client._http.mount("http://", adapter)  # pylint: disable=protected-access
+            _clients[key] = client
+        return _clients[key]
+
+
+def clear_clients():
+    """Discard shared storage clients, so that stores create new clients when next used"""
+    with _clients_lock:
+        _clients.clear()
+
+
+def clear_bucket_properties():
+    """Discard cached bucket properties, so that stores fetch them again when next used"""
+    _bucket_properties.clear()
+
 
 class GoogleCloudFile(CompressedFileMixin, File):
     """A django File object representing a GCP storage object"""
@@ -40,8 +126,65 @@ class GoogleCloudFile(CompressedFileMixin, File):
     def size(self):
         return self.blob.size
 
+    @property
+    def _read_only(self):
+        """True if the file is opened only for reading, so can be read without a local copy to update"""
+        return "r" in self._mode and "w" not in self._mode and "+" not in self._mode
+
+    @property
+    def _streams_reads(self):
+        """True if reads are made directly from the store as ranged requests, rather than from a downloaded copy"""
+        return self._storage.settings.streaming_read and self._read_only
+
+    @property
+    def _decompresses_reads(self):
+        """True if reads of a gzip-encoded blob are decompressed as its stored bytes are fetched, rather than from a copy
+
+        This is always done for reads, so that gzipped objects are read in a single pass without a temporary copy.
+        """
+        return self.blob.content_encoding == "gzip" and self._read_only
+
+    def _open_reader(self):
+        """Open a file-like object fetching ranges of the blob on demand, buffering `read_ahead_size` bytes at a time"""
+        gzipped = self.blob.content_encoding == "gzip"
+        download_kwargs = {}
+        if self.blob.generation is not None:
+            # Pin the generation so that every range is read from the same version of the object
+            download_kwargs["if_generation_match"] = self.blob.generation
+
+        # Ranges of gzip-encoded objects must be requested from the stored (compressed) bytes, so decompress locally
+        reader = BlobReader(
+            self.blob,
+            chunk_size=self._storage.settings.read_ahead_size,
+            raw_download=gzipped,
+            **download_kwargs,
+        )
+        if gzipped:
+            return self._decompress_file(mode="rb", file=reader)
+        return reader
+
+    @property
+    def _streams_writes(self):
+        """True if writes are fed to a resumable upload as they're made, rather than uploaded on close"""
+        return self._storage.settings.streaming_write and "w" in self._mode and "r" not in self._mode
+
+    def _open_writer(self):
+        """Open a file-like object sending each `blob_chunk_size` bytes written to a resumable upload session"""
+        blob_params = self._storage.get_object_parameters(self.name)
+        return BlobWriter(
+            self.blob,
+            chunk_size=self._storage.settings.blob_chunk_size,
+            ignore_flush=True,
+            content_type=self.mime_type,
+            predefined_acl=blob_params.get("acl", self._storage.settings.default_acl),
+        )
+
     def _get_file(self):
-        if self._file is None:
+        if self._file is None and (self._streams_reads or self._decompresses_reads):
+            self._file = self._open_reader()
+        elif self._file is None and self._streams_writes:
+            self._file = self._open_writer()
+        elif self._file is None:
             self._file = SpooledTemporaryFile(
                 max_size=self._storage.settings.max_memory_size,
                 suffix=".GSStorageFile",
@@ -49,10 +192,18 @@ class GoogleCloudFile(CompressedFileMixin, File):
             )
             if "r" in self._mode:
                 self._is_dirty = False
-                self.blob.download_to_file(self._file)
+                if self._storage.uses_parallel_transfer(self.blob.size) and self.blob.content_encoding != "gzip":
+                    download_blob_sliced(
+                        self.blob,
+                        self._file,
+                        executor=self._storage.transfer_executor,
+                        chunk_size=self._storage.settings.parallel_transfer_chunk_size,
+                        max_workers=self._storage.settings.parallel_transfer_workers,
+                    )
+                else:
+                    # Gzip-encoded objects are decompressed as they're downloaded, so the copy is of the original bytes
+                    self.blob.download_to_file(self._file)
                 self._file.seek(0)
-            if self._storage.settings.gzip and self.blob.content_encoding == "gzip":
-                self._file = self._decompress_file(mode=self._mode, file=self._file)
         return self._file
 
     def _set_file(self, value):
@@ -74,22 +225,34 @@ class GoogleCloudFile(CompressedFileMixin, File):
         """Write to the file-like object"""
         if "w" not in self._mode:
             raise AttributeError("File was not opened in write mode.")
+        # Marked dirty after writing, as the first access of the file (when opened for reading too) downloads it
+        written = super().write(to_buffer(content))
         self._is_dirty = True
-        return super().write(to_bytes(content))
+        return written
 
     def close(self):
         """Close the file-like object"""
         if self._file is not None:
-            if self._is_dirty:
+            if self._is_dirty and not self._streams_writes:
                 blob_params = self._storage.get_object_parameters(self.name)
+                content = self.file
+                if self.blob.content_encoding == "gzip":
+                    # The local copy holds the original bytes, so compress them again to keep the object's encoding
+                    content.seek(0)
+                    content = self._storage._compress_content(content)
+                    # Only changed properties are sent with an upload, so mark the encoding as changed to keep it
+                    self.blob.content_encoding = "gzip"
                 self.blob.upload_from_file(
-                    self.file,
+                    content,
                     rewind=True,
                     content_type=self.mime_type,
                     predefined_acl=blob_params.get("acl", self._storage.settings.default_acl),
                 )
+            # Closing a streaming writer sends any remaining bytes and completes the upload
             self._file.close()
             self._file = None
+            if self._is_dirty:
+                self._storage.forget_metadata(self.name)
 
 
 # Note on disabling plyint's abstract-method:
@@ -113,6 +276,14 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
         self.settings = StorageSettings(store_key, **overrides)
         self._bucket = None
         self._client = None
+        self._metadata_cache = None
+        self._signed_url_cache = None
+        self._prefetched_prefix = None
+        self._prefetched_metadata = None
+        self._prefetched_expires = None
+        self._precompressed_manifest = None
+        self.skipped_uploads = 0
+        self.skipped_upload_bytes = 0
 
     def get_accessed_time(self, *_, **__):
         """Get the last accessed time of the file
@@ -125,11 +296,192 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
 
     @property
     def client(self):
-        """The google-storage client for this store"""
+        """The google-storage client for this store, shared with other stores using the same project and credentials"""
         if self._client is None:
-            self._client = Client(project=self.settings.project_id, credentials=self.settings.credentials)
+            self._client = get_client(
+                project=self.settings.project_id,
+                credentials=self.settings.credentials,
+                pool_size=self.settings.connection_pool_size,
+            )
         return self._client
 
+    @property
+    def metadata_cache(self):
+        """The cache of object metadata for this store, or None if metadata caching is disabled"""
+        if self.settings.metadata_cache_ttl is None:
+            return None
+        if self._metadata_cache is None:
+            self._metadata_cache = MetadataCache(
+                ttl=self.settings.metadata_cache_ttl,
+                max_size=self.settings.metadata_cache_size,
+                alias=self.settings.metadata_cache_alias,
+                key_prefix=self.settings.bucket_name,
+            )
+        return self._metadata_cache
+
+    @property
+    def signed_url_cache(self):
+        """The cache of signed URLs for this store, or None if signed URL caching is disabled"""
+        if self.settings.signed_url_cache_size is None:
+            return None
+        if self._signed_url_cache is None:
+            # Entries are always cached with a time-to-live determined from the expiration of the URL
+            self._signed_url_cache = SignedUrlCache(
+                ttl=0,
+                max_size=self.settings.signed_url_cache_size,
+                alias=self.settings.signed_url_cache_alias,
+                key_prefix=self.settings.bucket_name,
+            )
+        return self._signed_url_cache
+
+    @property
+    def signer(self):
+        """The signer of this store's signed URLs, which is the `signer` setting or by default the client's credentials"""
+        return self.settings.signer or CredentialsSigner()
+
+    def forget_metadata(self, name):
+        """Remove any cached metadata for the object with the given (normalized) name
+
+        Use this when an object has been changed other than by saving or deleting it through this storage.
+        """
+        if self.metadata_cache is not None:
+            self.metadata_cache.delete(name)
+
+        # A prefetched listing is taken as complete for its prefix, so refresh rather than remove the entry
+        if self._is_prefetched(name):
+            blob = self.bucket.get_blob(name)
+            self._remember_metadata(name, get_blob_metadata(blob) if blob is not None else None)
+
+    def prefetch_metadata(self, prefix="", ttl=None):
+        """List all objects under a prefix, then answer metadata queries for them from that listing
+
+        The listing is made as a single chain of paginated requests, fetching only the properties needed,
+        and is used instead of requesting metadata for each object until it expires or clear_prefetched_metadata()
+        is called. Saves and deletes made through this storage are reflected in it.
+
+        This makes a big difference to processes (like collectstatic) that query metadata for many objects.
+
+        :param str prefix: The path (within the store's location) under which to list objects; defaults to the whole store
+        :param Union[int, float, None] ttl: The number of seconds for which the listing is used, or None to use it until
+        it's cleared
+        """
+        prefix = self._normalize_name(clean_name(prefix))
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+
+        metadata = {}
+        for blob in self.bucket.list_blobs(prefix=prefix, fields=LISTING_METADATA_FIELDS):
+            metadata[blob.name] = get_blob_metadata(blob)
+
+        self._prefetched_prefix = prefix
+        self._prefetched_metadata = metadata
+        self._prefetched_expires = None if ttl is None else time.monotonic() + ttl
+        logger.info(
+            "Prefetched metadata for %s objects under '%s' in bucket %s", len(metadata), prefix, self.bucket_name
+        )
+
+    def clear_prefetched_metadata(self):
+        """Discard prefetched metadata, so that metadata queries are made to the store again"""
+        self._prefetched_prefix = None
+        self._prefetched_metadata = None
+        self._prefetched_expires = None
+
+    @contextmanager
+    def prefetched_metadata(self, prefix=""):
+        """A context manager prefetching metadata for objects under a prefix for the duration of the context
+
+        Usage:
+
+        ```py
+        with storage.prefetched_metadata("css/"):
+            for name in names:
+                if not storage.exists(name):
+                    ...
+        ```
+        """
+        self.prefetch_metadata(prefix)
+        try:
+            yield self
+        finally:
+            self.clear_prefetched_metadata()
+
+    def _is_prefetched(self, name):
+        """True if metadata for the object with the given (normalized) name is answered by a prefetched listing"""
+        return (
+            self._prefetched_metadata is not None
+            and not self._prefetch_expired()
+            and name.startswith(self._prefetched_prefix)
+        )
+
+    def _prefetch_expired(self):
+        """True if a prefetched listing has been used for longer than its ttl"""
+        return self._prefetched_expires is not None and time.monotonic() >= self._prefetched_expires
+
+    def _needs_prefetch(self):
+        """True if the prefetch_metadata setting is enabled, and a listing hasn't been made or has expired"""
+        return self.settings.prefetch_metadata and (self._prefetched_metadata is None or self._prefetch_expired())
+
+    def _remember_metadata(self, name, metadata):
+        """Record metadata for an object saved through this storage, or None for an object deleted through it"""
+        if self.metadata_cache is not None:
+            self.metadata_cache.set(name, metadata)
+
+        if self._is_prefetched(name) and metadata is None:
+            self._prefetched_metadata.pop(name, None)
+        elif self._is_prefetched(name):
+            self._prefetched_metadata[name] = metadata
+
+    @property
+    def transfer_executor(self):
+        """The pool of threads, shared with other stores, used to transfer parts of large objects in parallel"""
+        return get_executor("transfers", self.settings.parallel_transfer_workers)
+
+    def uses_parallel_transfer(self, size):
+        """True if an object of the given size (in bytes) should be downloaded or uploaded in parallel parts"""
+        threshold = self.settings.parallel_transfer_threshold
+        return threshold is not None and size is not None and size >= threshold
+
+    @property
+    def bulk_executor(self):
+        """The pool of threads, shared with other stores, used to save or delete many objects concurrently"""
+        return get_executor("bulk", self.settings.bulk_workers)
+
+    def _run_bulk(self, func, items):
+        """Call a function for each of many (name, *args) items in the bulk executor, as `run_bulk()`
+
+        :return list[BulkResult]: A result for each item, in the order the items were given
+        """
+        # Create the client and bucket up front rather than racing to create them in each thread
+        self.bucket  # pylint: disable=pointless-statement
+        return run_bulk(self.bulk_executor, func, items, max_in_flight=2 * self.settings.bulk_workers)
+
+    def save_many(self, items, max_length=None):
+        """Save many files concurrently, returning the outcome of each rather than raising on the first failure
+
+        Each file is saved exactly as by `save()` (so names are made available, and ACL, gzip and other
+        store settings are applied) using a pool of `bulk_workers` threads which share this storage's client.
+
+        Usage:
+
+        ```py
+        results = storage.save_many((f"imports/{i}.json", ContentFile(data)) for i, data in enumerate(rows))
+        failed = [result for result in results if not result.ok]
+        ```
+
+        Note that when `file_overwrite` is False, items given the same name may be given the same available
+        name, since they're saved concurrently; give items unique names in that case.
+
+        :param iterable items: Tuples of (name, content) to save, where content is as accepted by `save()`
+        :param Union[int, None] max_length: The maximum length of saved names, as accepted by `save()`
+        :return list[BulkResult]: For each item in order, a result whose `result` is the name the file was saved
+        under, or whose `error` is the exception raised while saving it
+        """
+
+        def save(name, content):
+            return self.save(name, content, max_length=max_length)
+
+        return self._run_bulk(save, items)
+
     @property
     def bucket(self):
         """The google-storage bucket object for this store
@@ -139,12 +491,45 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
             self._bucket = self.client.bucket(self.settings.bucket_name)
         return self._bucket
 
+    @property
+    def bucket_properties(self):
+        """A dict of the bucket's versioning, location, storage class and retention properties
+
+        These are fetched with a request to the store, then cached (for all stores using the bucket in the process)
+        for `bucket_properties_ttl` seconds.
+        """
+        found, properties = _bucket_properties.lookup(self.bucket_name)
+        if not found:
+            properties = self.refresh_bucket_properties()
+        return properties
+
+    def refresh_bucket_properties(self):
+        """Fetch the bucket's properties, updating those cached for all stores using the bucket
+
+        Use this when bucket properties have been changed and the change is needed before the cached properties expire.
+
+        :raises ImproperlyConfigured: If the credentials used aren't permitted to get the bucket's metadata
+        """
+        # Only the properties used are requested, rather than the bucket's full metadata (eg its ACLs and labels)
+        bucket = Bucket(self.client, name=self.bucket_name)
+        try:
+            resource = self.client._get_resource(bucket.path, query_params={"fields": BUCKET_PROPERTIES_FIELDS})
+        except Forbidden as e:
+            raise ImproperlyConfigured(
+                f"Could not get the properties of bucket {self.bucket_name}: the credentials used need the "
+                "storage.buckets.get permission (eg from the Storage Legacy Bucket Reader role) on the bucket"
+            ) from e
+        bucket._set_properties(resource)
+        properties = get_bucket_properties(bucket)
+        _bucket_properties.set(self.bucket_name, properties, ttl=self.settings.bucket_properties_ttl)
+        return properties
+
     @property
     def versioning_enabled(self):
         """True if versioning is enabled on the bucket
         https://cloud.google.com/python/docs/reference/storage/latest/google.cloud.storage.bucket.Bucket#google_cloud_storage_bucket_Bucket_versioning_enabled
         """
-        return self.bucket.versioning_enabled
+        return self.bucket_properties["versioning_enabled"]
 
     @property
     def bucket_name(self):
@@ -182,24 +567,225 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
         content.name = cleaned_name
         file_object = GoogleCloudFile(name, "rw", self)
 
+        upload_params, blob_params, compress = self._get_upload_parameters(content, file_object.mime_type)
+
+        if self.settings.skip_unchanged and self._is_unchanged(
+            name, content, file_object.blob, compress, upload_params, blob_params
+        ):
+            return cleaned_name
+
+        if compress:
+            # The size given must be that of the compressed content, so is left unknown when compressing as it's read
+            content, size = self._compress_content_for_upload(content)
+            blob_params[CONTENT_ENCODING] = "gzip"
+        else:
+            size = getattr(content, "size", None)
+
+        parallel = self.uses_parallel_transfer(size)
+        # Composing sends all of a blob's properties rather than only those changed, so is done into a new blob, not
+        # one describing the object being replaced (whose hashes, encoding and metadata no longer apply)
+        blob = Blob(name, self.bucket) if parallel else file_object.blob
+        for prop, val in blob_params.items():
+            setattr(blob, prop, val)
+
+        if parallel:
+            upload_blob_composite(
+                blob,
+                content,
+                executor=self.transfer_executor,
+                max_workers=self.settings.parallel_transfer_workers,
+                chunk_size=self.settings.parallel_transfer_chunk_size,
+                **upload_params,
+            )
+        else:
+            blob.upload_from_file(content, rewind=True, size=size, **upload_params)
+
+        # The blob's properties are updated from the upload response, so are current
+        self._remember_metadata(name, get_blob_metadata(blob))
+
+        return cleaned_name
+
+    def _get_upload_parameters(self, content, mime_type):
+        """Get the parameters with which to upload content saved to this store
+
+        :return tuple(dict, dict, bool): Parameters of the upload request, properties to set on the blob, and whether
+        the content should be gzipped
+        """
         upload_params = {}
         blob_params = self.get_object_parameters(content)
         upload_params["predefined_acl"] = blob_params.pop("acl", self.settings.default_acl)
-        upload_params[CONTENT_TYPE] = blob_params.pop(CONTENT_TYPE, file_object.mime_type)
+        upload_params[CONTENT_TYPE] = blob_params.pop(CONTENT_TYPE, mime_type)
 
-        if (
+        compress = (
             self.settings.gzip
             and upload_params[CONTENT_TYPE] in self.settings.gzip_content_types
             and CONTENT_ENCODING not in blob_params
+        )
+        return upload_params, blob_params, compress
+
+    def _is_unchanged(self, name, content, blob, compress, upload_params, blob_params):
+        """True if the content to upload is identical to that of the stored object, compared using hashes, and it
+        would be uploaded with the same content type, content encoding and cache control as the stored object has
+
+        The stored object's metadata is taken from prefetched or cached metadata if available, otherwise from the blob.
+        Content that can't be rewound after hashing is always considered changed.
+        """
+        if self._is_prefetched(name) or self.metadata_cache is not None:
+            stored = self._get_metadata(name)
+        else:
+            stored = get_blob_metadata(blob) if blob.generation is not None else None
+
+        seekable = getattr(content, "seekable", None)
+        if stored is None or seekable is None or not seekable():
+            return False
+
+        # Otherwise changes to these (eg to the cache_control object parameter) wouldn't be applied to unchanged files
+        properties = {
+            "content_type": upload_params[CONTENT_TYPE],
+            "content_encoding": "gzip" if compress else blob_params.get(CONTENT_ENCODING),
+            "cache_control": blob_params.get("cache_control"),
+        }
+        if any(stored.get(key) != value for key, value in properties.items()):
+            return False
+
+        # Hash the bytes that would be uploaded, which for compressed content requires compressing it
+        content.seek(0)
+        md5_hash, crc32c, size = get_content_hashes(self._compress_content(content) if compress else content)
+        content.seek(0)
+
+        # Composite objects have no MD5 hash
+        if stored["md5_hash"] is not None:
+            unchanged = md5_hash == stored["md5_hash"]
+        else:
+            unchanged = crc32c == stored["crc32c"]
+
+        if unchanged:
+            self.skipped_uploads += 1
+            self.skipped_upload_bytes += size
+            logger.info(
+                "Skipped upload of %s bytes to unchanged blob %s (%s bytes skipped in total)",
+                size,
+                name,
+                self.skipped_upload_bytes,
+            )
+
+        return unchanged
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Save precompressed variants of collected static files, in each of the `precompress_encodings`
+
+        This is called by collectstatic once files are collected. Variants are made of files whose content types are
+        in `gzip_content_types`, by compressing files in a pool of `precompress_workers` processes, then saved
+        alongside them (eg `js/app.js.br`) with their content encoding set. Variants no smaller than the original are
+        skipped. A manifest of the variants saved is then saved, which `url()` uses to give URLs of variants.
+
+        :param dict paths: The collected files, as a mapping of their names to tuples of (source storage, source path)
+        :param bool dry_run: True if collectstatic is making a dry run, in which case nothing is done
+        :return generator: Tuples of (name, name of the variant, True) for each variant saved (or of (name, name,
+        error) for each variant that couldn't be saved), as collectstatic expects
+        """
+        encodings = tuple(self.settings.precompress_encodings)
+        if dry_run or not encodings:
+            return
+
+        # Check up front that every encoding can be made, rather than failing part way through
+        for encoding in encodings:
+            get_precompressor(encoding)
+
+        names = [name for name in paths if mimetypes.guess_type(name)[0] in self.settings.gzip_content_types]
+        manifest = {}
+        workers = self.settings.precompress_workers
+        pool = None
+        if workers != 1:
+            # Worker processes are spawned rather than forked, as forking a process running threads (eg those of the
+            # bulk executor or of a web server's runtime) can leave locks held in the child, deadlocking it
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            for start in range(0, len(names), PRECOMPRESS_BATCH_SIZE):
+                batch = names[start : start + PRECOMPRESS_BATCH_SIZE]
+                originals = [self._read_static_file(*paths[name]) for name in batch]
+                compressed = (pool.map if pool is not None else map)(precompress, originals, repeat(encodings))
+
+                items = []
+                for name, original, variants in zip(batch, originals, compressed):
+                    content_type = mimetypes.guess_type(name)[0]
+                    for encoding, data in variants.items():
+                        if len(data) < len(original):
+                            items.append((name, encoding, data, content_type))
+
+                results = self._run_bulk(self._save_precompressed, items)
+                for (name, encoding, _, _), result in zip(items, results):
+                    if result.ok:
+                        manifest.setdefault(name, []).append(encoding)
+                        yield name, result.result, True
+                    else:
+                        yield name, name, result.error
+        finally:
+            if pool is not None:
+                # Outstanding work is cancelled if the generator is closed before it's exhausted
+                pool.shutdown(cancel_futures=True)
+
+        self._save(self.settings.precompressed_manifest_name, ContentFile(json.dumps(manifest, sort_keys=True)))
+        self._precompressed_manifest = manifest
+
+    @staticmethod
+    def _read_static_file(storage, path):
+        with storage.open(path) as f:
+            return to_bytes(f.read())
+
+    def _save_precompressed(self, name, encoding, data, content_type):
+        """Save a precompressed variant of a file, served with the original's content type and the given encoding
+
+        :return str: The name of the variant
+        """
+        variant = f"{clean_name(name)}{PRECOMPRESSED_SUFFIXES[encoding]}"
+        normalized = self._normalize_name(variant)
+        content = ContentFile(data, name=variant)
+        blob = Blob(normalized, self.bucket, chunk_size=self.settings.blob_chunk_size)
+
+        upload_params, blob_params, _ = self._get_upload_parameters(content, content_type)
+        blob_params[CONTENT_ENCODING] = encoding
+        if self.settings.skip_unchanged and self._is_unchanged(
+            normalized, content, blob, False, upload_params, blob_params
         ):
-            content = self._compress_content(content)
-            blob_params[CONTENT_ENCODING] = "gzip"
+            return variant
 
         for prop, val in blob_params.items():
-            setattr(file_object.blob, prop, val)
+            setattr(blob, prop, val)
+        blob.upload_from_file(content, rewind=True, size=len(data), **upload_params)
+        self._remember_metadata(normalized, get_blob_metadata(blob))
+        return variant
 
-        file_object.blob.upload_from_file(content, rewind=True, size=getattr(content, "size", None), **upload_params)
-        return cleaned_name
+    @property
+    def precompressed_manifest(self):
+        """The precompressed variants of files in this store, as a mapping of file names to lists of encodings
+
+        The manifest saved by collectstatic is read once, when first needed, then kept for the life of the storage.
+        """
+        if self._precompressed_manifest is None:
+            name = self._normalize_name(clean_name(self.settings.precompressed_manifest_name))
+            blob = self.bucket.get_blob(name)
+            self._precompressed_manifest = json.loads(blob.download_as_bytes()) if blob is not None else {}
+        return self._precompressed_manifest
+
+    def get_precompressed_name(self, name, accept_encoding):
+        """Get the name of the best precompressed variant of a file that a client accepts, or the file's own name
+
+        Encodings are preferred in the order of the `precompress_encodings` setting.
+
+        :param str name: The name of the file
+        :param str accept_encoding: The value of the client's Accept-Encoding header
+        :return str: The name of the variant, or the name given if there's no variant the client accepts
+        """
+        if not self.settings.precompress_encodings:
+            return name
+
+        variants = self.precompressed_manifest.get(clean_name(name), ())
+        accepted = get_accepted_encodings(accept_encoding)
+        for encoding in self.settings.precompress_encodings:
+            if encoding in variants and encoding in accepted:
+                return f"{clean_name(name)}{PRECOMPRESSED_SUFFIXES[encoding]}"
+        return name
 
     def get_object_parameters(self, content):
         """Add object-specific parameters to the uploaded blob.
@@ -229,6 +815,29 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
         except NotFound:
             pass
 
+        self._remember_metadata(name, None)
+
+    def delete_many(self, names, ignore_missing=True):
+        """Delete many files, grouping deletes into batch requests which are sent concurrently
+
+        :param iterable names: The names of the files to delete
+        :param bool ignore_missing: If False, files that are already missing are reported as failures
+        :return list[BulkResult]: For each name in order, a result whose `result` is True if the file was deleted
+        (False if it was already missing), or whose `error` is the exception raised deleting it
+        """
+        names = list(names)
+        normalized_names = [self._normalize_name(clean_name(name)) for name in names]
+        results = delete_blobs(
+            self.bucket, normalized_names, ignore_missing=ignore_missing, executor=self.bulk_executor
+        )
+
+        for name, normalized_name, result in zip(names, normalized_names, results):
+            result.name = name
+            if result.ok or isinstance(result.error, MissingBlobError):
+                self._remember_metadata(normalized_name, None)
+
+        return results
+
     def exists(self, name):
         if not name:  # root element aka the bucket
             try:
@@ -238,7 +847,7 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
                 return False
 
         name = self._normalize_name(clean_name(name))
-        return bool(self.bucket.get_blob(name))
+        return self._get_metadata(name) is not None
 
     def listdir(self, path):
         prefix = self._normalize_name(clean_name(path))
@@ -247,45 +856,124 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
         if prefix and not prefix.endswith("/"):
             prefix += "/"
 
-        iterator = self.bucket.list_blobs(prefix=prefix, delimiter="/")
-        blobs = list(iterator)
-        prefixes = iterator.prefixes
+        # Only names are fetched, and pages are consumed as they're fetched rather than held as blobs
+        iterator = self.bucket.list_blobs(prefix=prefix, delimiter="/", fields=LISTDIR_FIELDS)
+        files = [blob.name.split("/")[-1] for blob in iterator]
+
+        # Prefixes are known once every page has been fetched
+        dirs = [folder_path.split("/")[-2] for folder_path in iterator.prefixes]
+
+        return dirs, files
 
-        files = []
-        dirs = []
+    def iter_blobs(self, prefix="", recursive=True, fields=ITER_BLOBS_FIELDS, match_glob=None):
+        """Iterate over the objects under a prefix, fetching them a page at a time as iteration proceeds
 
-        for blob in blobs:
-            parts = blob.name.split("/")
-            files.append(parts[-1])
-        for folder_path in prefixes:
-            parts = folder_path.split("/")
-            dirs.append(parts[-2])
+        Only the given properties of each object are fetched, and only one page of objects is held at once, so any
+        number of objects can be listed quickly in bounded memory.
+
+        Usage:
+
+        ```py
+        for blob in storage.iter_blobs("exports/", fields=("name", "size", "updated"), match_glob="**/*.csv"):
+            ...
+        ```
+
+        :param str prefix: The prefix (within the store's location) of the names of objects to list, which for a
+        directory should end in "/"; defaults to the whole store
+        :param bool recursive: If False, only objects directly under the prefix (not under a further "/") are listed
+        :param Union[Iterable[str], None] fields: The properties of objects to fetch, as named in the JSON API (eg
+        "size", "contentType", "updated"), or None to fetch every property. The name is always fetched.
+        :param Union[str, None] match_glob: A glob (relative to the store's location) which listed object names
+        must match, eg "**/*.json"
+        :return generator[google.cloud.storage.Blob]: The listed objects, in lexicographic order of name
+        """
+        location = self._normalize_name("")
+        prefix = self._normalize_name(clean_name(prefix))
+
+        kwargs = {}
+        if fields is not None:
+            # Listed objects can't be made into blobs without their names
+            fields = ["name", *(field for field in fields if field != "name")]
+            kwargs["fields"] = f"items({','.join(fields)}),{'' if recursive else 'prefixes,'}nextPageToken"
+        if match_glob is not None:
+            # Filtering listings by glob needs google-cloud-storage 2.10, the minimum required
+            kwargs["match_glob"] = f"{location}{match_glob}"
+
+        yield from self.bucket.list_blobs(prefix=prefix, delimiter=None if recursive else "/", **kwargs)
+
+    def walk(self, path="", match_glob=None):
+        """Iterate over the names of all files under a path, at any depth, as relative to the store as in `listdir()`
+
+        Unlike walking a tree by calling `listdir()` for each directory, the whole tree is listed by a single chain of
+        paginated requests, fetching only object names, and names are yielded as pages are fetched.
+
+        :param str path: The directory to walk; defaults to the whole store
+        :param Union[str, None] match_glob: A glob (relative to the store's location) which names must match
+        :return generator[str]: The names of the files, in lexicographic order
+        """
+        path = clean_name(path)
+        if path and not path.endswith("/"):
+            path += "/"
 
-        return list(dirs), files
+        location = self._normalize_name("")
+        for blob in self.iter_blobs(path, match_glob=match_glob):
+            yield blob.name[len(location) :]
+
+    def _get_metadata(self, name):
+        """Get a dict of metadata for the object with the given (normalized) name, or None if it doesn't exist
+
+        Metadata is served from any prefetched listing or the metadata cache where possible, and otherwise
+        fetched from the store (then cached).
+        """
+        if self._needs_prefetch():
+            self.prefetch_metadata(ttl=self.settings.prefetch_metadata_ttl)
+
+        found, metadata = self._lookup_metadata(name)
+        if found:
+            return metadata
 
-    def _get_blob(self, name):
-        # Wrap google.cloud.storage's blob to raise if the file doesn't exist
         blob = self.bucket.get_blob(name)
+        metadata = get_blob_metadata(blob) if blob is not None else None
+
+        if self.metadata_cache is not None:
+            self.metadata_cache.set(name, metadata)
+
+        return metadata
+
+    def _lookup_metadata(self, name):
+        """Look up metadata for the object with the given (normalized) name, without making any requests to the store
+
+        :return tuple(bool, Union[dict, None]): Whether metadata was found in any prefetched listing or the metadata
+        cache, and the metadata (None for a missing object)
+        """
+        if self._is_prefetched(name):
+            return True, self._prefetched_metadata.get(name)
+
+        if self.metadata_cache is not None:
+            return self.metadata_cache.lookup(name)
 
-        if blob is None:
+        return False, None
+
+    def _get_existing_metadata(self, name):
+        # Wrap metadata retrieval to raise if the file doesn't exist
+        metadata = self._get_metadata(name)
+
+        if metadata is None:
             raise NotFound(f"File does not exist: {name}")
 
-        return blob
+        return metadata
 
     def size(self, name):
         name = self._normalize_name(clean_name(name))
-        blob = self._get_blob(name)
-        return blob.size
+        return self._get_existing_metadata(name)["size"]
 
     def modified_time(self, name):
         name = self._normalize_name(clean_name(name))
-        blob = self._get_blob(name)
-        return timezone.make_naive(blob.updated)
+        return timezone.make_naive(self._get_existing_metadata(name)["updated"])
 
     def get_modified_time(self, name):
         name = self._normalize_name(clean_name(name))
-        blob = self._get_blob(name)
-        updated = blob.updated
+        updated = self._get_existing_metadata(name)["updated"]
         return updated if getattr(settings, "USE_TZ") else timezone.make_naive(updated)
 
     def get_created_time(self, name):
@@ -294,16 +982,20 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
         The datetime will be timezone-aware if USE_TZ=True.
         """
         name = self._normalize_name(clean_name(name))
-        blob = self._get_blob(name)
-        created = blob.time_created
+        created = self._get_existing_metadata(name)["time_created"]
         return created if getattr(settings, "USE_TZ") else timezone.make_naive(created)
 
-    def url(self, name):
+    def url(self, name, accept_encoding=None):
         """
         Return public url or a signed url for the Blob.
         This DOES NOT check for existance of Blob - that makes codes too slow
         for many use cases.
+
+        If `accept_encoding` (the value of a request's Accept-Encoding header) is given, the URL is of the
+        best precompressed variant of the file which the client accepts, if there is one.
         """
+        if accept_encoding is not None:
+            name = self.get_precompressed_name(name, accept_encoding)
         name = self._normalize_name(clean_name(name))
         blob = self.bucket.blob(name)
         blob_params = self.get_object_parameters(name)
@@ -318,14 +1010,59 @@ class GoogleCloudStorage(CompressStorageMixin, Storage):  # pylint: disable=abst
                 storage_base_url=self.settings.custom_endpoint,
                 quoted_name=_quote(name, safe=b"/~"),
             )
-        elif not self.settings.custom_endpoint:
-            return blob.generate_signed_url(expiration=self.settings.expiration, version="v4")
-        else:
-            return blob.generate_signed_url(
-                bucket_bound_hostname=self.settings.custom_endpoint,
-                expiration=self.settings.expiration,
-                version="v4",
-            )
+        return self.signed_url(name, normalized=True)
+
+    def urls(self, names):
+        """Get URLs for many files, as `url()` does, signing them concurrently
+
+        Signing is done locally if the store's credentials have a private key, but otherwise requires a request to the
+        IAM API for each URL, so is done using the pool of threads for bulk operations.
+
+        :param Iterable[str] names: The names of the files
+        :return list[str]: The URL of each file, in the order of the names given
+        :raises Exception: The first error signing a URL, once all URLs have been attempted
+        """
+        results = self._run_bulk(self.url, [(name,) for name in names])
+        for result in results:
+            if not result.ok:
+                raise result.error
+        return [result.result for result in results]
+
+    def signed_url(self, name, method="GET", expiration=None, normalized=False, **kwargs):
+        """Get a signed URL for a file, reusing a previously signed URL if the signed URL cache is enabled
+
+        A URL is reused until `signed_url_refresh_fraction` of its lifetime remains, then signed again. URLs with
+        an expiration at a fixed time (rather than a duration after signing) are signed every time.
+
+        :param str name: The name of the file
+        :param str method: The HTTP method the URL is used with
+        :param Union[datetime.datetime, datetime.timedelta, int, None] expiration: When the URL expires, as a datetime or a
+        duration (a timedelta or a number of seconds) after signing; defaults to the `expiration` setting
+        :param bool normalized: True if the name is already normalized (ie includes the store's location)
+        :param kwargs: Other arguments to `Blob.generate_signed_url()`, eg response_disposition or response_type
+        :return str: The signed URL
+        """
+        if not normalized:
+            name = self._normalize_name(clean_name(name))
+        expiration = self.settings.expiration if expiration is None else expiration
+        if self.settings.custom_endpoint:
+            kwargs.setdefault("bucket_bound_hostname", self.settings.custom_endpoint)
+
+        cache = self.signed_url_cache
+        reusable = cache is not None and isinstance(expiration, (timedelta, int))
+        if reusable:
+            key = SignedUrlCache.get_key(name, method, expiration, **kwargs)
+            found, url = cache.lookup(key)
+            if found:
+                return url
+
+        url = self.signer.generate_signed_url(self.bucket.blob(name), expiration=expiration, method=method, **kwargs)
+
+        if reusable:
+            lifetime = expiration.total_seconds() if isinstance(expiration, timedelta) else expiration
+            cache.set(key, url, ttl=lifetime * (1 - self.settings.signed_url_refresh_fraction))
+
+        return url
 
     def get_available_name(self, name, max_length=None):
         name = clean_name(name)
@@ -1,19 +1,111 @@
-from contextlib import contextmanager
+import base64
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
 import datetime
 import logging
 import os
+import threading
+from typing import Any, Optional
+from uuid import uuid4
 
 from django.test.utils import override_settings
 from django.utils import timezone
-from google.cloud.exceptions import NotFound, PreconditionFailed
+from google.cloud.exceptions import NotFound, PreconditionFailed, from_http_response
 from google.cloud.storage.blob import Blob
+from google.cloud.storage.exceptions import DataCorruption
+import google_crc32c
 
 from django_gcp.exceptions import AttemptedOverwriteError, MissingBlobError
 
+from .utils import to_bytes
+
 logger = logging.getLogger(__name__)
 
 UNLIMITED_MAX_SIZE = 0
 
+# The maximum number of source objects that GCS can compose into a single object
+MAX_COMPOSE_SOURCES = 32
+
+# Parts of composite uploads are placed under a temporary prefix, which the cleanup_tmp_files command cleans up
+# by default (whatever the ingress_to paths of BlobFields), so that any left behind by a failed process are removed
+COMPOSITE_PARTS_PREFIX = "_tmp/composite/"
+
+# Writable attributes of a blob which are copied from the source of a rewrite when attributes are also set
+REWRITE_COPIED_ATTRIBUTES = (
+    "cache_control",
+    "content_disposition",
+    "content_encoding",
+    "content_language",
+    "content_type",
+    "custom_time",
+    "metadata",
+)
+
+# The maximum number of requests that GCS accepts in a single batch request
+MAX_BATCH_SIZE = 100
+
+# A fields mask restricting object listings to the names needed to delete objects
+DELETE_LISTING_FIELDS = "items(name),nextPageToken"
+
+
+@dataclass
+class BulkResult:
+    """The outcome of one item of a bulk operation
+
+    Attributes:
+        name: The name the item was submitted with
+        result: The value returned for the item, if it succeeded
+        error: The exception raised for the item, if it failed
+    """
+
+    name: str
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self):
+        """True if the item succeeded"""
+        return self.error is None
+
+
+def run_bulk(executor, func, items, max_in_flight):
+    """Call a function for each of many (name, *args) items concurrently, collecting a result or error per item
+
+    At most `max_in_flight` calls are submitted to the executor at once, so that items (which may hold
+    open files or content) are consumed from the iterable only as fast as they can be processed.
+
+    :param concurrent.futures.Executor executor: The pool to run calls in
+    :param callable func: Called as func(name, *args) for each item
+    :param iterable items: Tuples of (name, *args)
+    :param int max_in_flight: The maximum number of calls submitted at once
+    :return list[BulkResult]: A result for each item, in the order the items were given
+    """
+    results = []
+    pending = {}
+    for item in items:
+        if len(pending) >= max_in_flight:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                _resolve_bulk(results[pending.pop(future)], future)
+
+        name, *args = item
+        results.append(BulkResult(name))
+        pending[executor.submit(func, name, *args)] = len(results) - 1
+
+    for future in list(pending):
+        _resolve_bulk(results[pending.pop(future)], future)
+
+    return results
+
+
+def _resolve_bulk(bulk_result, future):
+    try:
+        bulk_result.result = future.result()
+    except Exception as e:  # pylint: disable=broad-except
+        bulk_result.error = e
+
 
 def blob_exists(bucket, blob_name):
     """Quick check that a blob with a given name exists in a bucket"""
@@ -78,9 +170,22 @@ def upload_blob(
     # Attributes must be a dict by default
     attributes = attributes or {}
 
-    # Upload the file
-    blob = Blob(destination_path, bucket=field.storage.bucket)
-    if is_path_like:
+    # Upload the file, in parallel parts if it's large enough to benefit
+    storage = field.storage
+    blob = Blob(destination_path, bucket=storage.bucket)
+    size = os.path.getsize(local_file) if is_path_like else getattr(local_file, "size", None)
+    if storage.uses_parallel_transfer(size):
+        with open(local_file, "rb") if is_path_like else nullcontext(local_file) as fp:
+            upload_blob_composite(
+                blob,
+                fp,
+                executor=storage.transfer_executor,
+                max_workers=storage.settings.parallel_transfer_workers,
+                chunk_size=storage.settings.parallel_transfer_chunk_size,
+                if_generation_match=if_generation_match,
+                **attributes,
+            )
+    elif is_path_like:
         blob.upload_from_filename(local_file, if_generation_match=if_generation_match, **attributes)
     else:
         blob.upload_from_file(local_file, if_generation_match=if_generation_match, **attributes)
@@ -89,6 +194,148 @@ def upload_blob(
     return {"path": destination_path}
 
 
+def download_blob_sliced(blob, file, executor, chunk_size, max_workers):
+    """Download a blob as slices fetched in parallel using ranged requests, writing each to the file at its offset
+
+    The stored bytes of the object are downloaded, so objects stored with a content encoding are not decoded.
+    Slices are checksummed in order as they arrive, with at most twice `max_workers` fetched ahead of those
+    checksummed, and the CRC32C checksum of the whole is checked against that of the object.
+
+    :param google.cloud.storage.Blob blob: The blob to download, whose size and generation must be known (eg from bucket.get_blob)
+    :param file-like file: A seekable, writable file-like object to download to
+    :param concurrent.futures.Executor executor: The pool of workers used to fetch slices
+    :param int chunk_size: The size in bytes of each slice
+    :param int max_workers: The maximum number of slices to fetch at once
+    :raises google.cloud.storage.exceptions.DataCorruption: If the downloaded bytes don't match the object's checksum
+    """
+    lock = threading.Lock()
+
+    def download_slice(start):
+        end = min(start + chunk_size, blob.size) - 1
+        data = blob.download_as_bytes(
+            start=start,
+            end=end,
+            raw_download=True,
+            checksum=None,
+            if_generation_match=blob.generation,
+        )
+        with lock:
+            file.seek(start)
+            file.write(data)
+        return data
+
+    checksum = google_crc32c.Checksum()
+    pending = deque()
+    slices = 0
+    for start in range(0, blob.size, chunk_size):
+        if len(pending) >= 2 * max_workers:
+            checksum.update(pending.popleft().result())
+        pending.append(executor.submit(download_slice, start))
+        slices += 1
+    while pending:
+        checksum.update(pending.popleft().result())
+
+    crc32c = base64.b64encode(checksum.digest()).decode("utf-8")
+    if blob.crc32c is not None and crc32c != blob.crc32c:
+        raise DataCorruption(
+            None,
+            f"Checksum mismatch while downloading blob {blob.name}: expected crc32c {blob.crc32c} but got {crc32c}",
+        )
+
+    logger.info("Downloaded blob %s in %s parallel slices", blob.name, slices)
+
+
+def upload_blob_composite(
+    blob,
+    file,
+    executor,
+    max_workers,
+    chunk_size,
+    content_type=None,
+    predefined_acl=None,
+    if_generation_match=None,
+    **attributes,
+):
+    """Upload a file as parts in parallel, then compose those parts into the blob server-side
+
+    Parts are read from the file in sequence, with at most `max_workers` held in memory awaiting upload.
+    Properties set on the blob (eg cache_control or metadata), or given as attributes, are applied to the
+    composed object.
+
+    Composite objects do not have an MD5 hash; their integrity is checked using CRC32C.
+
+    :param google.cloud.storage.Blob blob: The destination blob
+    :param file-like file: A readable file-like object, which will be read from its beginning
+    :param concurrent.futures.Executor executor: The pool of workers used to upload parts
+    :param int max_workers: The maximum number of parts to upload at once
+    :param int chunk_size: The size in bytes of each part
+    :param Union[str, None] content_type: The content type of the composed object
+    :param Union[str, None] predefined_acl: A predefined ACL to apply to the composed object
+    :param Union[int, None] if_generation_match: A generation-match precondition for the composed object (eg 0 to prevent overwrite)
+    :param attributes: Other properties of the composed object (eg cache_control={...} or metadata={...})
+    """
+    for name in attributes:
+        if not isinstance(getattr(Blob, name, None), property):
+            raise TypeError(f"upload_blob_composite() got an unexpected keyword argument '{name}'")
+
+    bucket = blob.bucket
+    parts_prefix = f"{COMPOSITE_PARTS_PREFIX}{uuid4()}/"
+    temporary_blobs = []
+    pending = set()
+
+    try:
+        # Upload the parts
+        sources = []
+        file.seek(0)
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+
+            if len(pending) >= max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+
+            part = bucket.blob(f"{parts_prefix}{len(sources):05d}")
+            sources.append(part)
+            temporary_blobs.append(part)
+            pending.add(
+                executor.submit(part.upload_from_string, to_bytes(data), content_type="application/octet-stream")
+            )
+
+        for future in wait(pending).done:
+            future.result()
+
+        # Compose groups of parts into intermediate objects until few enough remain to compose the blob
+        level = 0
+        while len(sources) > MAX_COMPOSE_SOURCES:
+            groups = [sources[i : i + MAX_COMPOSE_SOURCES] for i in range(0, len(sources), MAX_COMPOSE_SOURCES)]
+            sources = [bucket.blob(f"{parts_prefix}composed-{level}-{index:05d}") for index in range(len(groups))]
+            temporary_blobs.extend(sources)
+            futures = [executor.submit(source.compose, group) for source, group in zip(sources, groups)]
+            for future in futures:
+                future.result()
+            level += 1
+
+        if content_type is not None:
+            blob.content_type = content_type
+        for name, value in attributes.items():
+            setattr(blob, name, value)
+
+        blob.compose(sources, if_generation_match=if_generation_match)
+
+        if predefined_acl is not None:
+            blob.acl.save_predefined(predefined_acl)
+
+        logger.info("Uploaded blob %s as a composite of %s parts", blob.name, len(temporary_blobs))
+
+    finally:
+        # Let any uploads still in progress (eg if another part failed) finish before removing the parts
+        wait(pending)
+        bucket.delete_blobs(temporary_blobs, on_error=lambda _: None)
+
+
 def copy_blob(
     source_bucket,
     source_blob_name,
@@ -97,9 +344,15 @@ def copy_blob(
     overwrite=False,
     move=False,
     attributes=None,
+    merge_source_metadata=True,
+    if_source_generation_match=None,
 ):
     """Copies or moves a blob from one bucket to another with a new name.
 
+    The copy is made with rewrite requests, which GCS may need to make in several calls for large objects
+    or those copied between locations or storage classes. Any attributes are applied to the destination
+    blob in the same requests, so it never exists with the wrong content type or metadata.
+
     :param source_bucket: The google.cloud.storage.bucket object you're copying from
     :param source_blob_name: The name of the GCS object to be copied eg "path/in/bucket/source-blob-name.txt"
     :param destination_bucket_name: The google.cloud.storage.bucket object you're copying to
@@ -107,9 +360,13 @@ def copy_blob(
     :param overwrite: If True, allows an existing destination file to be overwritten
     :param move: If True, removes the source blob after copy (ie moves it rather than duplicating it)
     :param attributes: A dict of values used to update attributes of the destination blob (eg {"content_type": "image/png"})
+    :param merge_source_metadata: If True, attributes update those of the source blob, which are fetched first. If False,
+    the destination blob has only the attributes given, so the copy is made without fetching the source blob
+    :param if_source_generation_match: If given, the generation the source blob must have to be copied
     """
 
     source_blob = source_bucket.blob(source_blob_name)
+    destination_blob = destination_bucket.blob(destination_blob_name)
 
     extra_args = {}
     if not overwrite:
@@ -119,12 +376,32 @@ def copy_blob(
         # object that does not yet exist, set the if_generation_match precondition to 0.
         # If the destination object already exists in your bucket, set instead a
         # generation-match precondition using its generation number.
-        # There is also an `if_source_generation_match` parameter, which is not used in this example.
         destination_generation_match_precondition = 0
         extra_args["if_generation_match"] = destination_generation_match_precondition
 
+    if if_source_generation_match is not None:
+        extra_args["if_source_generation_match"] = if_source_generation_match
+
     try:
-        destination_blob = source_bucket.copy_blob(source_blob, destination_bucket, destination_blob_name, **extra_args)
+        if attributes and merge_source_metadata:
+            # Metadata given in a rewrite request replaces (rather than updates) that of the source, so
+            # start from the source's metadata, pinning its generation so the content copied matches it
+            source_blob = source_bucket.get_blob(source_blob_name, if_generation_match=if_source_generation_match)
+            if source_blob is None:
+                raise NotFound(f"Blob {source_blob_name} not found")
+            extra_args["if_source_generation_match"] = source_blob.generation
+            _set_rewrite_attributes(destination_blob, source_blob, attributes)
+            logger.debug("Set attributes %s on destination blob %s", attributes, destination_blob_name)
+
+        elif attributes:
+            for key, value in attributes.items():
+                setattr(destination_blob, key, value)
+            logger.debug("Set attributes %s on destination blob %s", attributes, destination_blob_name)
+
+        token, rewritten, size = destination_blob.rewrite(source_blob, **extra_args)
+        while token is not None:
+            logger.debug("Rewrote %s of %s bytes to blob %s", rewritten, size, destination_blob_name)
+            token, rewritten, size = destination_blob.rewrite(source_blob, token=token, **extra_args)
 
         verb = "copied"
         if move:
@@ -140,14 +417,6 @@ def copy_blob(
             destination_bucket.name,
         )
 
-        if attributes is not None:
-            for key, value in attributes.items():
-                setattr(destination_blob, key, value)
-                logger.debug("Set attribute %s to %s on destination blob %s", key, value, destination_blob_name)
-
-            destination_blob.patch()
-            logger.info("Attributes of blob %s updated", destination_blob_name)
-
         return destination_blob
 
     except NotFound as e:
@@ -161,6 +430,22 @@ def copy_blob(
         ) from e
 
 
+def _set_rewrite_attributes(destination_blob, source_blob, attributes):
+    """Set the metadata of a rewrite's destination blob to that of the source, updated with the given attributes
+
+    As in a patch request, custom metadata is merged with that of the source (and keys set to None are removed).
+    """
+    for key in REWRITE_COPIED_ATTRIBUTES:
+        value = getattr(source_blob, key)
+        if value is not None:
+            setattr(destination_blob, key, value)
+
+    for key, value in attributes.items():
+        if key == "metadata" and value is not None:
+            value = {k: v for k, v in {**(source_blob.metadata or {}), **value}.items() if v is not None}
+        setattr(destination_blob, key, value)
+
+
 def delete_blob(bucket, blob_name, generation=None, ignore_missing=False):
     """Deletes a blob, with the ability to handle missing blobs
 
@@ -184,6 +469,100 @@ def delete_blob(bucket, blob_name, generation=None, ignore_missing=False):
         logger.info("Attempted to delete blob %s from bucket %s - blob missing", blob_name, bucket.name)
 
 
+def delete_blobs(bucket, blob_names, generations=None, if_generation_match=None, ignore_missing=False, executor=None):
+    """Deletes many blobs, grouping the deletes into batch requests of up to 100 objects each
+
+    Failures are reported per blob rather than raised, so that one missing or changed object doesn't
+    prevent the others from being deleted.
+
+    :param bucket: The bucket object from which the blobs will be deleted
+    :param blob_names: The names of the blobs to be deleted
+    :param generations: If given, a list with the specific generation to delete for each blob (or None)
+    :param if_generation_match: If given, a list with a generation each blob must currently have to be deleted (or None),
+    so that blobs overwritten since they were inspected are not deleted
+    :param ignore_missing: If True, missing blobs are not reported as failures (see `delete_blob`)
+    :param executor: If given, a concurrent.futures.Executor used to send batch requests concurrently
+    :return list[BulkResult]: For each blob in order, a result whose `result` is True if the blob was deleted
+    (False if it was already missing), or whose `error` is the exception for a failed delete
+    """
+    blob_names = list(blob_names)
+    for option in (generations, if_generation_match):
+        if option is not None and len(option) != len(blob_names):
+            raise ValueError("generations and if_generation_match must have one entry per blob name")
+
+    items = list(
+        zip(
+            blob_names,
+            generations or [None] * len(blob_names),
+            if_generation_match or [None] * len(blob_names),
+        )
+    )
+    batches = [items[start : start + MAX_BATCH_SIZE] for start in range(0, len(items), MAX_BATCH_SIZE)]
+    batch_map = map if executor is None else executor.map
+    batch_results = batch_map(lambda batch_items: _delete_batch(bucket, batch_items, ignore_missing), batches)
+    return [result for results in batch_results for result in results]
+
+
+def _delete_batch(bucket, items, ignore_missing):
+    """Delete up to MAX_BATCH_SIZE blobs in a single batch request, returning a result for each"""
+    results = [BulkResult(blob_name) for blob_name, _, _ in items]
+    try:
+        with bucket.client.batch(raise_exception=False) as batch:
+            for blob_name, generation, if_generation_match in items:
+                bucket.delete_blob(blob_name, generation=generation, if_generation_match=if_generation_match)
+
+    except Exception as e:  # pylint: disable=broad-except
+        for result in results:
+            result.error = e
+        return results
+
+    # The batch holds a response for each deferred request, in the order they were made. Batch doesn't expose these
+    # publicly, but has kept them in `_responses` since `raise_exception` was added (google-cloud-storage 2.10, the
+    # minimum required) so that failures can be read from them; TestDeleteBlobsBatch checks this against a real Batch
+    for result, response in zip(results, batch._responses):  # pylint: disable=protected-access
+        if 200 <= response.status_code < 300:
+            result.result = True
+        elif response.status_code == 404 and ignore_missing:
+            result.result = False
+            logger.info("Attempted to delete blob %s from bucket %s - blob missing", result.name, bucket.name)
+        elif response.status_code == 404:
+            result.error = MissingBlobError(
+                f"Could not delete blob {result.name} from bucket {bucket.name} - blob not found"
+            )
+        else:
+            result.error = from_http_response(response)
+
+    logger.info("Deleted %s blobs from bucket %s", sum(result.result is True for result in results), bucket.name)
+    return results
+
+
+def delete_prefix(bucket, prefix, executor=None):
+    """Deletes every blob whose name starts with a prefix
+
+    The listing of blobs is streamed a page at a time into batch deletes, so that memory use doesn't grow with
+    the number of blobs. Blobs which go missing while listed are ignored.
+
+    :param bucket: The bucket object from which the blobs will be deleted
+    :param prefix: The prefix of names of blobs to delete eg "path/in/bucket/"; must not be empty
+    :param executor: If given, a concurrent.futures.Executor used to send batch requests concurrently
+    :return int: The number of blobs deleted
+    :raises: The first error encountered deleting a blob, after the page containing it has been processed
+    """
+    if not prefix:
+        raise ValueError("A prefix is required, to avoid accidentally deleting the contents of the whole bucket")
+
+    deleted = 0
+    for page in bucket.list_blobs(prefix=prefix, fields=DELETE_LISTING_FIELDS).pages:
+        results = delete_blobs(bucket, [blob.name for blob in page], ignore_missing=True, executor=executor)
+        deleted += sum(result.result is True for result in results)
+        for result in results:
+            if result.error is not None:
+                raise result.error
+
+    logger.info("Deleted %s blobs under prefix %s from bucket %s", deleted, prefix, bucket.name)
+    return deleted
+
+
 def get_generations(bucket, blob_name):
     """Get blobs corresponding to all generations of an object
     TODO Work up a more useful output than simply a list of objects
@@ -194,7 +573,7 @@ def get_generations(bucket, blob_name):
     return list(bucket.client.list_blobs(bucket.name, versions=True, prefix=blob_name))
 
 
-def get_signed_upload_url(bucket, blob_name, timedelta=None, max_size_bytes=UNLIMITED_MAX_SIZE, **kwargs):
+def get_signed_upload_url(bucket, blob_name, timedelta=None, max_size_bytes=UNLIMITED_MAX_SIZE, signer=None, **kwargs):  # pylint: disable=too-many-arguments
     """Get a signed URL for uploading a blob to GCS
 
     :param google.cloud.storage.Bucket bucket: The bucket to which the blob will be uploaded
@@ -202,6 +581,8 @@ def get_signed_upload_url(bucket, blob_name, timedelta=None, max_size_bytes=UNLI
     :param Union[datetime.timedelta, None] timedelta: A datetime.timedelta object representing the
     period which the upload URL should be valid for (default is 60 minutes)
     :param Union[int, None] max_size_bytes: Maximum size allowable, added to any headers that are supplied in kwargs.
+    :param Union[django_gcp.storage.signing.Signer, None] signer: A signer to sign a V4 URL with, or None to sign with
+    the bucket's client credentials
     """
     if timedelta is None:
         timedelta = datetime.timedelta(minutes=60)
@@ -214,6 +595,9 @@ def get_signed_upload_url(bucket, blob_name, timedelta=None, max_size_bytes=UNLI
         headers["X-Goog-Content-Length-Range"] = content_length_range
         kwargs["headers"] = headers
 
+    if signer is not None:
+        return signer.generate_signed_url(blob, expiration=timezone.now() + timedelta, method="PUT", **kwargs)
+
     return blob.generate_signed_url(expiration=timezone.now() + timedelta, method="PUT", **kwargs)
 
 
@@ -4,6 +4,9 @@ from django.conf import settings as django_settings
 from django.core.exceptions import ImproperlyConfigured
 from django.core.signals import setting_changed
 
+from .cache import DEFAULT_BUCKET_PROPERTIES_TTL, DEFAULT_METADATA_CACHE_SIZE, DEFAULT_PREFETCH_METADATA_TTL
+from .compress import DEFAULT_GZIP_LEVEL
+
 DEFAULT_GZIP_CONTENT_TYPES = (
     "text/css",
     "text/javascript",
@@ -26,12 +29,36 @@ DEFAULT_GCP_STORAGE_SETTINGS = {
     "default_acl": None,
     "querystring_auth": True,
     "expiration": timedelta(seconds=86400),
+    "signer": None,
     "gzip": False,
     "gzip_content_types": DEFAULT_GZIP_CONTENT_TYPES,
+    "gzip_level": DEFAULT_GZIP_LEVEL,
+    "precompress_encodings": (),
+    "precompress_workers": None,
+    "precompressed_manifest_name": "precompressed.json",
     "file_overwrite": True,
     "object_parameters": DEFAULT_OBJECT_PARAMETERS,
     "max_memory_size": 0,
     "blob_chunk_size": None,
+    "streaming_read": False,
+    "read_ahead_size": 1024 * 1024,
+    "streaming_write": False,
+    "parallel_transfer_threshold": None,
+    "parallel_transfer_workers": 8,
+    "parallel_transfer_chunk_size": 32 * 1024 * 1024,
+    "metadata_cache_ttl": None,
+    "metadata_cache_size": DEFAULT_METADATA_CACHE_SIZE,
+    "metadata_cache_alias": None,
+    "signed_url_cache_size": None,
+    "signed_url_refresh_fraction": 0.5,
+    "signed_url_cache_alias": None,
+    "prefetch_metadata": False,
+    "prefetch_metadata_ttl": DEFAULT_PREFETCH_METADATA_TTL,
+    "bucket_properties_ttl": DEFAULT_BUCKET_PROPERTIES_TTL,
+    "skip_unchanged": False,
+    "bulk_workers": 16,
+    "async_connection_limit": 100,
+    "connection_pool_size": 32,
 }
 
 
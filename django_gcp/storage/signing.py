@@ -0,0 +1,233 @@
+import abc
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import urllib.parse
+
+from google.auth.transport.requests import Request
+from google.cloud.storage._signing import (
+    DEFAULT_ENDPOINT,
+    _url_encode,
+    get_canonical_headers,
+    get_expiration_seconds_v4,
+    get_v4_now_dtstamps,
+)
+from google.cloud.storage.blob import _quote
+from google.oauth2 import service_account
+
+logger = logging.getLogger(__name__)
+
+
+class Signer(abc.ABC):
+    """Base class for signers of V4 signed URLs to objects
+
+    Set an instance as the ``signer`` setting of a store to use it for the store's signed URLs, eg:
+
+    ```py
+    GCP_STORAGE_MEDIA = {
+        "bucket_name": "app-assets-environment-media",
+        "signer": ServiceAccountKeySigner(key_file="/secrets/signing-key.json"),
+    }
+    ```
+    """
+
+    @abc.abstractmethod
+    def generate_signed_url(self, blob, expiration, method="GET", **kwargs):
+        """Generate a V4 signed URL for a blob
+
+        :param google.cloud.storage.Blob blob: The blob to sign a URL for
+        :param Union[datetime.datetime, datetime.timedelta, int] expiration: When the URL expires, as a datetime or a
+        duration (a timedelta or a number of seconds) after signing
+        :param str method: The HTTP method the URL is used with
+        :param kwargs: Other arguments accepted by `Blob.generate_signed_url()`, eg response_disposition or headers
+        :return str: The signed URL
+        """
+
+
+class CredentialsSigner(Signer):
+    """Signs URLs with the storage client's credentials (the default)
+
+    If the credentials have a private key, signing is done locally. Otherwise (eg with the default credentials on
+    Cloud Run) google-cloud-storage requires `service_account_email` and `access_token` to be given, to sign using the
+    IAM API; use IAMSigner to do that for you.
+    """
+
+    def generate_signed_url(self, blob, expiration, method="GET", **kwargs):
+        return blob.generate_signed_url(expiration=expiration, method=method, version="v4", **kwargs)
+
+
+class IAMSigner(Signer):
+    """Signs URLs using the IAM API's signBlob method, for credentials without a private key
+
+    Each URL signed requires a request to the IAM API (typically tens of milliseconds). Use a key-based signer to sign
+    URLs locally instead.
+
+    :param Union[str, None] service_account_email: The service account to sign as, defaulting to that of the credentials
+    :param Union[google.auth.credentials.Credentials, None] credentials: Credentials able to sign as the service account,
+    defaulting to those of the storage client
+    """
+
+    def __init__(self, service_account_email=None, credentials=None):
+        self.service_account_email = service_account_email
+        self.credentials = credentials
+        self._lock = threading.Lock()
+
+    def generate_signed_url(self, blob, expiration, method="GET", **kwargs):
+        credentials = self.credentials or blob.client._credentials  # pylint: disable=protected-access
+        if not credentials.valid:
+            with self._lock:
+                if not credentials.valid:
+                    credentials.refresh(Request())
+
+        return blob.generate_signed_url(
+            expiration=expiration,
+            method=method,
+            version="v4",
+            service_account_email=self.service_account_email or credentials.service_account_email,
+            access_token=credentials.token,
+            **kwargs,
+        )
+
+
+class ServiceAccountKeySigner(Signer):
+    """Signs URLs locally with a service account key
+
+    Give either the path of a key file (eg mounted from a secret) or the parsed contents of a key. A key file is read
+    again when it's modified, so keys can be rotated (eg short-lived keys replaced by a sidecar) without a restart.
+
+    :param Union[str, None] key_file: The path of a service account key file
+    :param Union[dict, None] key_info: The contents of a service account key
+    """
+
+    def __init__(self, key_file=None, key_info=None):
+        if (key_file is None) == (key_info is None):
+            raise ValueError("Give exactly one of key_file or key_info to ServiceAccountKeySigner")
+
+        self.key_file = key_file
+        self._credentials = (
+            None if key_info is None else service_account.Credentials.from_service_account_info(key_info)
+        )
+        self._key_file_mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def credentials(self):
+        """The credentials of the service account key, read again from any key file if it has been modified"""
+        if self.key_file is not None:
+            mtime = os.stat(self.key_file).st_mtime
+            if mtime != self._key_file_mtime:
+                with self._lock:
+                    if mtime != self._key_file_mtime:
+                        logger.info("Loading URL signing key from %s", self.key_file)
+                        self._credentials = service_account.Credentials.from_service_account_file(self.key_file)
+                        self._key_file_mtime = mtime
+        return self._credentials
+
+    def generate_signed_url(self, blob, expiration, method="GET", **kwargs):
+        return blob.generate_signed_url(
+            expiration=expiration, method=method, version="v4", credentials=self.credentials, **kwargs
+        )
+
+
+class HMACKeySigner(Signer):
+    """Signs URLs locally with an HMAC key
+
+    HMAC keys are created for a service account in the Cloud Storage settings of the console (or with
+    `gcloud storage hmac create`); URLs signed with them have the permissions of that service account.
+
+    :param str access_id: The access ID of the HMAC key
+    :param str secret: The secret of the HMAC key
+    """
+
+    algorithm = "GOOG4-HMAC-SHA256"
+
+    def __init__(self, access_id, secret):
+        self.access_id = access_id
+        self.secret = secret
+
+    def generate_signed_url(  # pylint: disable=too-many-locals
+        self,
+        blob,
+        expiration,
+        method="GET",
+        api_access_endpoint=None,
+        bucket_bound_hostname=None,
+        scheme="http",
+        content_md5=None,
+        content_type=None,
+        response_type=None,
+        response_disposition=None,
+        generation=None,
+        headers=None,
+        query_parameters=None,
+    ):
+        # Follows the same canonical form as google-cloud-storage's signing with a private key, which doesn't support HMAC
+        quoted_name = _quote(blob.name, safe=b"/~")
+        if bucket_bound_hostname:
+            endpoint = (
+                bucket_bound_hostname if "://" in bucket_bound_hostname else f"{scheme}://{bucket_bound_hostname}"
+            )
+            resource = f"/{quoted_name}"
+        else:
+            endpoint = api_access_endpoint or DEFAULT_ENDPOINT
+            resource = f"/{blob.bucket.name}/{quoted_name}"
+        endpoint = endpoint.rstrip("/")
+
+        request_timestamp, datestamp = get_v4_now_dtstamps()
+        credential_scope = f"{datestamp}/auto/storage/goog4_request"
+
+        headers = dict(headers or {})
+        if content_type is not None:
+            headers["Content-Type"] = content_type
+        if content_md5 is not None:
+            headers["Content-MD5"] = content_md5
+        if "host" not in [key.lower() for key in headers]:
+            headers["Host"] = urllib.parse.urlparse(endpoint).netloc
+        method = method.upper()
+        if method == "RESUMABLE":
+            method = "POST"
+            headers["x-goog-resumable"] = "start"
+        canonical_headers, ordered_headers = get_canonical_headers(headers)
+        signed_headers = ";".join(key for key, _ in ordered_headers)
+
+        query_parameters = {key: value or "" for key, value in (query_parameters or {}).items()}
+        query_parameters["X-Goog-Algorithm"] = self.algorithm
+        query_parameters["X-Goog-Credential"] = f"{self.access_id}/{credential_scope}"
+        query_parameters["X-Goog-Date"] = request_timestamp
+        query_parameters["X-Goog-Expires"] = get_expiration_seconds_v4(expiration)
+        query_parameters["X-Goog-SignedHeaders"] = signed_headers
+        if response_type is not None:
+            query_parameters["response-content-type"] = response_type
+        if response_disposition is not None:
+            query_parameters["response-content-disposition"] = response_disposition
+        if generation is not None:
+            query_parameters["generation"] = generation
+        canonical_query_string = _url_encode(query_parameters)
+
+        canonical_request = "\n".join(
+            [
+                method,
+                resource,
+                canonical_query_string,
+                "\n".join(canonical_headers) + "\n",
+                signed_headers,
+                dict(ordered_headers).get("x-goog-content-sha256", "UNSIGNED-PAYLOAD"),
+            ]
+        )
+        string_to_sign = "\n".join(
+            [
+                self.algorithm,
+                request_timestamp,
+                credential_scope,
+                hashlib.sha256(canonical_request.encode("ascii")).hexdigest(),
+            ]
+        )
+
+        key = f"GOOG4{self.secret}".encode()
+        for scope_part in credential_scope.split("/"):
+            key = hmac.new(key, scope_part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+        return f"{endpoint}{resource}?{canonical_query_string}&X-Goog-Signature={signature}"
@@ -1,8 +1,32 @@
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
 import posixpath
+import threading
 
 from django.core.exceptions import SuspiciousFileOperation
 from django.utils.encoding import force_bytes
+import google_crc32c
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(purpose, max_workers):
+    """Get a thread pool shared by all callers with the same purpose and number of workers
+
+    Pools are created on first use then reused for the lifetime of the process, so that
+    callers don't pay the cost of starting threads on every call. Work which itself waits on
+    work submitted to a pool should use a different purpose, to avoid exhausting its workers.
+    """
+    key = (purpose, max_workers)
+    with _executors_lock:
+        if key not in _executors:
+            _executors[key] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"django-gcp-{purpose}")
+        return _executors[key]
 
 
 def to_bytes(content):
@@ -13,6 +37,43 @@ def to_bytes(content):
     return force_bytes(content)
 
 
+def to_buffer(content):
+    """Get content as a bytes-like object to write, without copying content that's already bytes-like
+
+    Objects supporting the buffer protocol (eg memoryviews, or numpy or Arrow buffers) are given as a memoryview of
+    their bytes, unless they aren't contiguous in memory (in which case they're copied). Other content is converted
+    by to_bytes().
+    """
+    if isinstance(content, (bytes, bytearray, str)):
+        return to_bytes(content)
+
+    try:
+        view = memoryview(content)
+    except TypeError:
+        return to_bytes(content)
+
+    if view.c_contiguous:
+        return view.cast("B")
+    return view.tobytes()
+
+
+def get_content_hashes(content):
+    """Read a file-like object to its end, returning hashes of the content in the form GCS reports them
+
+    :return tuple(str, str, int): The base64-encoded MD5 and CRC32C hashes of the content, and its size in bytes
+    """
+    md5 = hashlib.md5()
+    crc32c = google_crc32c.Checksum()
+    size = 0
+    while chunk := content.read(HASH_CHUNK_SIZE):
+        chunk = to_bytes(chunk)
+        md5.update(chunk)
+        crc32c.update(chunk)
+        size += len(chunk)
+
+    return base64.b64encode(md5.digest()).decode("utf-8"), base64.b64encode(crc32c.digest()).decode("utf-8"), size
+
+
 def clean_name(name):
     """
     Cleans the name so that Windows style paths work
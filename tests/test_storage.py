@@ -6,9 +6,15 @@
 # Disabled because gcloud api dynamically constructed
 # pylint: disable=no-member
 
+import array
+import base64
+from concurrent.futures import Future
 from datetime import datetime, timedelta
 import gzip
+import hashlib
 import mimetypes
+import os
+import tracemalloc
 from unittest import mock
 from zoneinfo import ZoneInfo
 
@@ -16,10 +22,14 @@ from django.core.exceptions import ImproperlyConfigured
 from django.core.files.base import ContentFile
 from django.test import TestCase, override_settings
 from django.utils import timezone
-from google.cloud.exceptions import NotFound
+from google.cloud.exceptions import Forbidden, NotFound
 from google.cloud.storage.blob import Blob
+from google.cloud.storage.exceptions import DataCorruption
+import google_crc32c
 
+from django_gcp.exceptions import MissingBlobError
 from django_gcp.storage import gcloud
+from django_gcp.storage.compress import GzipCompressionWrapper
 
 UTC = ZoneInfo("UTC")
 
@@ -39,6 +49,8 @@ class GCloudTestCase(TestCase):
     def setUp(self):
         self.client_patcher = mock.patch("django_gcp.storage.gcloud.Client")
         self.client_patcher.start()
+        gcloud.clear_clients()
+        gcloud.clear_bucket_properties()
 
     def tearDown(self):
         self.client_patcher.stop()
@@ -75,6 +87,114 @@ class GCloudStorageTests(GCloudTestCase):
         f.blob.download_to_file = lambda tmpfile: tmpfile.write(data)
         self.assertEqual(f.read(num_bytes), data[0:num_bytes])
 
+    def test_open_read_streaming(self):
+        data = b"This is some test read data."
+
+        with override_settings(
+            GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "streaming_read": True, "read_ahead_size": 8}
+        ):
+            f = self.storage.open(self.filename)
+            f.blob.size = len(data)
+            f.blob.content_encoding = None
+            f.blob.download_as_bytes.side_effect = lambda start=0, end=None, **kwargs: data[start : end + 1]
+
+            self.assertEqual(f.read(4), data[0:4])
+            self.assertEqual(f.read(4), data[4:8])
+            f.blob.download_as_bytes.assert_called_once()
+
+            f.seek(20)
+            self.assertEqual(f.read(3), data[20:23])
+            f.blob.download_to_file.assert_not_called()
+
+    def test_open_read_streaming_gzipped(self):
+        data = b"This is some test read data."
+
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "streaming_read": True}):
+            compressed = gzip.compress(data)
+            f = self.storage.open(self.filename)
+            f.blob.size = len(compressed)
+            f.blob.content_encoding = "gzip"
+            f.blob.download_as_bytes.side_effect = lambda start=0, end=None, **kwargs: compressed[start : end + 1]
+
+            self.assertEqual(f.read(), data)
+            _, kwargs = f.blob.download_as_bytes.call_args
+            self.assertTrue(kwargs["raw_download"])
+
+    def test_open_read_gzipped(self):
+        data = b"This is some test read data." * 10
+
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "read_ahead_size": 16}):
+            compressed = gzip.compress(data)
+            f = self.storage.open(self.filename)
+            f.blob.size = len(compressed)
+            f.blob.content_encoding = "gzip"
+            f.blob.download_as_bytes.side_effect = lambda start=0, end=None, **kwargs: compressed[start : end + 1]
+
+            # The stored bytes are decompressed as they're fetched, rather than from a downloaded copy
+            self.assertEqual(f.read(10), data[:10])
+            self.assertEqual(f.read(), data[10:])
+            f.blob.download_to_file.assert_not_called()
+            _, kwargs = f.blob.download_as_bytes.call_args
+            self.assertTrue(kwargs["raw_download"])
+
+    def test_open_read_write_gzipped(self):
+        """Objects opened for update are copied with their bytes decompressed, and compressed again when uploaded"""
+        data = b"This is some test read data."
+        f = self.storage.open(self.filename, "rb+")
+        f.blob.content_encoding = "gzip"
+        f.blob.download_to_file = lambda tmpfile: tmpfile.write(data)
+        self.assertEqual(f.read(), data)
+
+        blob = Blob(self.filename, self.storage.bucket)
+        blob._set_properties({"name": self.filename, "contentEncoding": "gzip", "contentType": "text/plain"})
+        blob.download_to_file = lambda tmpfile: tmpfile.write(data)
+        self.storage.bucket.get_blob.return_value = blob
+        uploads = []
+
+        def do_upload(blob, client, stream, content_type, size, *args, **kwargs):
+            uploads.append((blob._get_writable_metadata(), stream.read()))
+            return {"name": blob.name}
+
+        f = self.storage.open(self.filename, "rw")
+        f.seek(0, os.SEEK_END)
+        f.write(b" More data.")
+        with mock.patch.object(Blob, "_do_upload", autospec=True, side_effect=do_upload):
+            f.close()
+
+        # The object is uploaded compressed, and with its encoding sent as metadata so readers decompress it
+        [(metadata, uploaded)] = uploads
+        self.assertEqual(metadata["contentEncoding"], "gzip")
+        self.assertEqual(gzip.decompress(uploaded), data + b" More data.")
+
+    def test_open_read_parallel(self):
+        data = b"This is some test read data."
+
+        with override_settings(
+            GCP_STORAGE_MEDIA={
+                "bucket_name": self.bucket_name,
+                "parallel_transfer_threshold": 16,
+                "parallel_transfer_chunk_size": 8,
+            }
+        ):
+            f = self.storage.open(self.filename)
+            f.blob.size = len(data)
+            f.blob.content_encoding = None
+            f.blob.crc32c = base64.b64encode(google_crc32c.Checksum(data).digest()).decode()
+            f.blob.download_as_bytes.side_effect = lambda start, end, **kwargs: data[start : end + 1]
+
+            self.assertEqual(f.read(), data)
+            self.assertEqual(f.blob.download_as_bytes.call_count, 4)
+            f.blob.download_to_file.assert_not_called()
+
+            # The checksum of the slices, in order, is checked against that of the object
+            f = self.storage.open(self.filename)
+            f.blob.size = len(data)
+            f.blob.content_encoding = None
+            f.blob.crc32c = base64.b64encode(google_crc32c.Checksum(b"Other data").digest()).decode()
+            f.blob.download_as_bytes.side_effect = lambda start, end, **kwargs: data[start : end + 1]
+            with self.assertRaises(DataCorruption):
+                f.read()
+
     def test_open_read_nonexistent(self):
         self.storage._bucket = mock.MagicMock()
         self.storage._bucket.get_blob.return_value = None
@@ -117,6 +237,64 @@ class GCloudStorageTests(GCloudTestCase):
                 predefined_acl="projectPrivate",
             )
 
+    @mock.patch("django_gcp.storage.gcloud.BlobWriter")
+    @mock.patch("django_gcp.storage.gcloud.Blob")
+    def test_open_write_streaming(self, MockBlob, MockBlobWriter):
+        with override_settings(
+            GCP_STORAGE_MEDIA={
+                "bucket_name": self.bucket_name,
+                "default_acl": "projectPrivate",
+                "streaming_write": True,
+                "blob_chunk_size": 256 * 1024,
+            }
+        ):
+            self.storage._bucket = mock.MagicMock()
+            self.storage._bucket.get_blob.return_value = None
+
+            f = self.storage.open(self.filename, "wb")
+            f.write("first chunk")
+            f.write(b"second chunk")
+
+            MockBlobWriter.assert_called_once_with(
+                MockBlob(),
+                chunk_size=256 * 1024,
+                ignore_flush=True,
+                content_type=mimetypes.guess_type(self.filename)[0],
+                predefined_acl="projectPrivate",
+            )
+            writer = MockBlobWriter()
+            writer.write.assert_has_calls([mock.call(b"first chunk"), mock.call(b"second chunk")])
+
+            f.close()
+            writer.close.assert_called_once()
+            MockBlob().upload_from_file.assert_not_called()
+
+    @mock.patch("django_gcp.storage.gcloud.Blob")
+    def test_open_write_buffers_without_copying(self, MockBlob):
+        """
+        Test that bytes-like content is written without being copied, so writing allocates next to nothing
+        """
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "max_memory_size": 1}):
+            self.storage._bucket = mock.MagicMock()
+            self.storage._bucket.get_blob.return_value = None
+            chunk = array.array("d", bytes(1024 * 1024))
+
+            # Write past max_memory_size first, so that the file is spooled to disk before writes are traced
+            f = self.storage.open(self.filename, "wb")
+            f.write(b"00")
+            tracemalloc.start()
+            try:
+                for _ in range(16):
+                    self.assertEqual(f.write(memoryview(chunk)), 1024 * 1024)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            self.assertLess(peak, 64 * 1024)
+            f.file.seek(0)
+            self.assertEqual(len(f.file.read()), 16 * 1024 * 1024 + 2)
+            f.close()
+
     def test_save(self):
         data = "This is some test content."
         content = ContentFile(data)
@@ -144,6 +322,158 @@ class GCloudStorageTests(GCloudTestCase):
             content, rewind=True, size=len(data), content_type=mimetypes.guess_type(filename)[0], predefined_acl=None
         )
 
+    def test_save_parallel(self):
+        data = "This is some test content."
+        content = ContentFile(data)
+
+        # The object being replaced has properties describing its content, which mustn't be kept
+        existing = Blob(self.filename, self.storage.bucket)
+        existing._set_properties(
+            {
+                "name": self.filename,
+                "generation": "1",
+                "md5Hash": "old-md5",
+                "crc32c": "old-crc32c",
+                "contentEncoding": "gzip",
+                "metadata": {"old": "metadata"},
+            }
+        )
+        self.storage.bucket.get_blob.return_value = existing
+
+        with override_settings(
+            GCP_STORAGE_MEDIA={
+                "bucket_name": self.bucket_name,
+                "default_acl": "publicRead",
+                "parallel_transfer_threshold": 16,
+                "parallel_transfer_chunk_size": 8,
+                "object_parameters": {"cache_control": "no-cache"},
+            }
+        ):
+            with (
+                mock.patch.object(Blob, "compose", autospec=True) as compose,
+                mock.patch.object(Blob, "upload_from_file", autospec=True) as upload_from_file,
+                mock.patch.object(Blob, "acl", new_callable=mock.PropertyMock) as acl,
+            ):
+                self.storage.save(self.filename, content)
+
+            upload_from_file.assert_not_called()
+
+            # Each part is uploaded, composed into the blob, then removed
+            part = self.storage.bucket.blob()
+            self.assertEqual(part.upload_from_string.call_count, 4)
+            part_data = [args[0] for args, _ in part.upload_from_string.call_args_list]
+            self.assertEqual(b"".join(part_data), data.encode())
+            compose.assert_called_once_with(mock.ANY, [part] * 4, if_generation_match=None)
+            acl.return_value.save_predefined.assert_called_once_with("publicRead")
+            self.storage.bucket.delete_blobs.assert_called_once_with([part] * 4, on_error=mock.ANY)
+
+            # Only the intended properties are sent for the composed object
+            blob = compose.call_args.args[0]
+            self.assertIsNot(blob, existing)
+            self.assertEqual(blob.name, self.filename)
+            self.assertEqual(
+                blob._properties,
+                {
+                    "contentType": mimetypes.guess_type(self.filename)[0],
+                    "cacheControl": "no-cache",
+                    "metadata": {},
+                    "customTime": None,
+                },
+            )
+
+    def test_save_skip_unchanged(self):
+        data = "This is some test content."
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "skip_unchanged": True}):
+            blob = self.storage.bucket.get_blob()
+            blob.generation = 1
+            blob.md5_hash = base64.b64encode(hashlib.md5(data.encode()).digest()).decode()
+            blob.content_type = mimetypes.guess_type(self.filename)[0]
+            blob.content_encoding = None
+            blob.cache_control = None
+
+            self.storage.save(self.filename, ContentFile(data))
+            blob.upload_from_file.assert_not_called()
+            self.assertEqual(self.storage.skipped_uploads, 1)
+            self.assertEqual(self.storage.skipped_upload_bytes, len(data))
+
+            content = ContentFile("This is some changed test content.")
+            self.storage.save(self.filename, content)
+            blob.upload_from_file.assert_called_once_with(
+                content,
+                rewind=True,
+                size=len(content),
+                content_type=mimetypes.guess_type(self.filename)[0],
+                predefined_acl=None,
+            )
+            self.assertEqual(self.storage.skipped_uploads, 1)
+
+    def test_save_skip_unchanged_composite(self):
+        data = "This is some test content."
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "skip_unchanged": True}):
+            blob = self.storage.bucket.get_blob()
+            blob.generation = 1
+            blob.md5_hash = None
+            blob.crc32c = base64.b64encode(google_crc32c.Checksum(data.encode()).digest()).decode()
+            blob.content_type = mimetypes.guess_type(self.filename)[0]
+            blob.content_encoding = None
+            blob.cache_control = None
+
+            self.storage.save(self.filename, ContentFile(data))
+            blob.upload_from_file.assert_not_called()
+
+    def test_save_skip_unchanged_uploads_changed_metadata(self):
+        data = "This is some test content."
+        settings = {"bucket_name": self.bucket_name, "skip_unchanged": True}
+        blob = self.storage.bucket.get_blob()
+        blob.generation = 1
+        blob.md5_hash = base64.b64encode(hashlib.md5(data.encode()).digest()).decode()
+        blob.content_type = "application/octet-stream"
+        blob.content_encoding = None
+        blob.cache_control = None
+
+        with override_settings(GCP_STORAGE_MEDIA=settings):
+            self.storage.save(self.filename, ContentFile(data))
+            self.assertEqual(blob.upload_from_file.call_count, 1)
+
+        blob.content_type = mimetypes.guess_type(self.filename)[0]
+        with override_settings(
+            GCP_STORAGE_MEDIA={**settings, "object_parameters": {"cache_control": "public, max-age=3600"}}
+        ):
+            self.storage.save(self.filename, ContentFile(data))
+            self.assertEqual(blob.upload_from_file.call_count, 2)
+            self.assertEqual(self.storage.skipped_uploads, 0)
+
+    def test_save_many(self):
+        blob = self.storage.bucket.get_blob()
+        blob.upload_from_file.side_effect = [None, None, NotFound("Bucket gone"), None]
+        names = [f"file{i}.txt" for i in range(4)]
+
+        with mock.patch.object(gcloud, "get_executor", return_value=mock.Mock(submit=self._submit_now)):
+            results = self.storage.save_many((name, ContentFile(name)) for name in names)
+
+        self.assertEqual([result.name for result in results], names)
+        self.assertEqual([result.result for result in results], ["file0.txt", "file1.txt", None, "file3.txt"])
+        self.assertEqual([result.ok for result in results], [True, True, False, True])
+        self.assertIsInstance(results[2].error, NotFound)
+        self.assertEqual(blob.upload_from_file.call_count, 4)
+
+    def test_save_many_concurrently(self):
+        names = [f"file{i}.txt" for i in range(20)]
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "bulk_workers": 4}):
+            results = self.storage.save_many((name, ContentFile(name)) for name in names)
+
+        self.assertEqual([result.result for result in results], names)
+        self.assertEqual(self.storage.bucket.get_blob().upload_from_file.call_count, 20)
+
+    @staticmethod
+    def _submit_now(func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:  # pylint: disable=broad-except
+            future.set_exception(e)
+        return future
+
     def test_save_with_default_acl(self):
         data = "This is some test ủⓝï℅ⅆℇ content."
         filename = "ủⓝï℅ⅆℇ.txt"
@@ -166,6 +496,97 @@ class GCloudStorageTests(GCloudTestCase):
         self.storage._client.bucket.assert_called_with(self.bucket_name)
         self.storage._bucket.delete_blob.assert_called_with(self.filename)
 
+    def test_delete_many(self):
+        names = [f"file{i}.txt" for i in range(150)]
+        statuses = [204] * 150
+        statuses[3] = 404
+        statuses[120] = 412
+        batches = []
+
+        def batch(raise_exception):
+            self.assertFalse(raise_exception)
+            batches.append(mock.MagicMock())
+            batches[-1].__enter__.return_value = batches[-1]
+            batches[-1]._responses = [
+                mock.Mock(status_code=status, headers={}, json=mock.Mock(return_value={}))
+                for status in statuses[100 * (len(batches) - 1) : 100 * len(batches)]
+            ]
+            return batches[-1]
+
+        self.storage.bucket.client.batch.side_effect = batch
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "metadata_cache_ttl": 60}):
+            self.storage.metadata_cache.set(self.storage._normalize_name(names[0]), {"size": 1})
+            # Send batches in sequence, so that responses are given in the order of the statuses
+            with mock.patch.object(gcloud, "get_executor", return_value=mock.Mock(map=map)):
+                results = self.storage.delete_many(names)
+
+            self.assertEqual(self.storage.metadata_cache.lookup(names[0]), (True, None))
+
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(self.storage._bucket.delete_blob.call_count, 150)
+        self.storage._bucket.delete_blob.assert_any_call(names[149], generation=None, if_generation_match=None)
+        self.assertEqual([result.name for result in results], names)
+        self.assertTrue(results[0].result)
+        self.assertFalse(results[3].result)
+        self.assertTrue(results[3].ok)
+        self.assertFalse(results[120].ok)
+        self.assertEqual(results[120].error.code, 412)
+        self.assertEqual(sum(result.ok for result in results), 149)
+
+    def test_delete_many_not_ignoring_missing(self):
+        batch = self.storage.bucket.client.batch.return_value
+        batch.__enter__.return_value = batch
+        batch._responses = [mock.Mock(status_code=204), mock.Mock(status_code=404)]
+
+        results = self.storage.delete_many(["a.txt", "b.txt"], ignore_missing=False)
+
+        self.assertTrue(results[0].ok)
+        self.assertIsInstance(results[1].error, MissingBlobError)
+
+    def test_client_shared_between_stores(self):
+        media_storage = gcloud.GoogleCloudMediaStorage()
+        static_storage = gcloud.GoogleCloudStaticStorage()
+        self.assertIs(media_storage.client, static_storage.client)
+        gcloud.Client.assert_called_once_with(project=None, credentials=None)
+        media_storage.client._http.mount.assert_any_call("https://", mock.ANY)
+        adapter = media_storage.client._http.mount.call_args.args[1]
+        self.assertEqual(adapter._pool_maxsize, 32)
+
+        other_project_storage = gcloud.GoogleCloudStorage(store_key="media", project_id="other-project")
+        other_project_storage.client  # pylint: disable=pointless-statement
+        gcloud.Client.assert_called_with(project="other-project", credentials=None)
+        self.assertEqual(gcloud.Client.call_count, 2)
+
+    def test_bucket_properties_shared_between_stores(self):
+        get_resource = self.storage.client._get_resource
+        get_resource.return_value = {"versioning": {"enabled": True}, "storageClass": "STANDARD"}
+        other_storage = gcloud.GoogleCloudStorage(store_key="media", bucket_name=self.bucket_name)
+
+        with mock.patch("django_gcp.storage.cache.time.monotonic", return_value=1000):
+            self.assertTrue(self.storage.versioning_enabled)
+            self.assertTrue(other_storage.versioning_enabled)
+            self.assertEqual(other_storage.bucket_properties["storage_class"], "STANDARD")
+            # Only the properties used are requested
+            get_resource.assert_called_once_with(
+                f"/b/{self.bucket_name}",
+                query_params={"fields": "versioning,location,locationType,storageClass,retentionPolicy"},
+            )
+
+            get_resource.return_value = {"versioning": {"enabled": False}}
+            self.storage.refresh_bucket_properties()
+            self.assertFalse(other_storage.versioning_enabled)
+            self.assertEqual(get_resource.call_count, 2)
+
+        # Properties are fetched again once they expire
+        with mock.patch("django_gcp.storage.cache.time.monotonic", return_value=1000 + 301):
+            self.assertFalse(self.storage.versioning_enabled)
+            self.assertEqual(get_resource.call_count, 3)
+
+    def test_bucket_properties_forbidden(self):
+        self.storage.client._get_resource.side_effect = Forbidden("Permission denied")
+        with self.assertRaisesRegex(ImproperlyConfigured, "storage.buckets.get"):
+            self.storage.versioning_enabled  # pylint: disable=pointless-statement
+
     def test_exists(self):
         self.storage._bucket = mock.MagicMock()
         self.assertTrue(self.storage.exists(self.filename))
@@ -176,6 +597,100 @@ class GCloudStorageTests(GCloudTestCase):
         self.assertFalse(self.storage.exists(self.filename))
         self.storage._bucket.get_blob.assert_called_with(self.filename)
 
+    def test_metadata_cache(self):
+        naive_date = datetime(2017, 1, 2, 3, 4, 5, 678)
+        aware_date = timezone.make_aware(naive_date, UTC)
+
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "metadata_cache_ttl": 60}):
+            self.storage._bucket = mock.MagicMock()
+            blob = mock.MagicMock()
+            blob.size = 1234
+            blob.updated = aware_date
+            blob.time_created = aware_date
+            self.storage._bucket.get_blob.return_value = blob
+
+            # Several stat calls for the same name cost one request
+            self.assertTrue(self.storage.exists(self.filename))
+            self.assertEqual(self.storage.size(self.filename), 1234)
+            self.assertEqual(self.storage.get_modified_time(self.filename), aware_date)
+            self.assertEqual(self.storage.get_created_time(self.filename), aware_date)
+            self.storage._bucket.get_blob.assert_called_once_with(self.filename)
+
+            # Deleting through the storage marks the object missing without a further request
+            self.storage.delete(self.filename)
+            self.assertFalse(self.storage.exists(self.filename))
+            self.assertRaises(NotFound, self.storage.size, self.filename)
+            self.storage._bucket.get_blob.assert_called_once_with(self.filename)
+
+            # Saving through the storage caches the metadata of the uploaded blob
+            blob.size = 26
+            self.storage.save(self.filename, ContentFile("This is some test content."))
+            self.assertEqual(self.storage.size(self.filename), 26)
+            self.storage._bucket.get_blob.assert_called_with(self.filename)
+            self.assertEqual(self.storage._bucket.get_blob.call_count, 2)
+
+    def test_prefetched_metadata(self):
+        naive_date = datetime(2017, 1, 2, 3, 4, 5, 678)
+        aware_date = timezone.make_aware(naive_date, UTC)
+
+        self.storage._bucket = mock.MagicMock()
+        blobs = []
+        for name, size in [("css/site.css", 10), ("js/site.js", 20)]:
+            blob = mock.MagicMock(spec=Blob)
+            blob.name = name
+            blob.size = size
+            blob.updated = aware_date
+            blobs.append(blob)
+        self.storage._bucket.list_blobs.return_value = blobs
+
+        with self.storage.prefetched_metadata():
+            self.storage._bucket.list_blobs.assert_called_once_with(prefix="", fields=mock.ANY)
+            self.assertTrue(self.storage.exists("css/site.css"))
+            self.assertEqual(self.storage.size("js/site.js"), 20)
+            self.assertEqual(self.storage.get_modified_time("js/site.js"), aware_date)
+            self.assertFalse(self.storage.exists("css/missing.css"))
+
+            # Saves and deletes are reflected in the listing
+            self.storage.save("css/missing.css", ContentFile("This is some test content."))
+            self.assertTrue(self.storage.exists("css/missing.css"))
+            self.storage.delete("css/site.css")
+            self.assertFalse(self.storage.exists("css/site.css"))
+
+            self.storage._bucket.get_blob.assert_called_once_with("css/missing.css")
+
+        # Once cleared, metadata is requested from the store again
+        self.assertTrue(self.storage.exists("js/site.js"))
+        self.storage._bucket.get_blob.assert_called_with("js/site.js")
+
+    def test_prefetched_metadata_setting(self):
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "prefetch_metadata": True}):
+            self.storage._bucket = mock.MagicMock()
+            self.storage._bucket.list_blobs.return_value = []
+
+            self.assertFalse(self.storage.exists("css/site.css"))
+            self.assertFalse(self.storage.exists("js/site.js"))
+            self.storage._bucket.list_blobs.assert_called_once()
+            self.storage._bucket.get_blob.assert_not_called()
+
+    def test_prefetched_metadata_setting_expires(self):
+        with override_settings(
+            GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "prefetch_metadata": True, "prefetch_metadata_ttl": 60}
+        ):
+            self.storage._bucket = mock.MagicMock()
+            self.storage._bucket.list_blobs.return_value = []
+
+            with mock.patch("django_gcp.storage.gcloud.time.monotonic", return_value=1000):
+                self.assertFalse(self.storage.exists("css/site.css"))
+            with mock.patch("django_gcp.storage.gcloud.time.monotonic", return_value=1059):
+                self.assertFalse(self.storage.exists("css/site.css"))
+            self.storage._bucket.list_blobs.assert_called_once()
+
+            # Once expired, the listing is made again so that changes made elsewhere are seen
+            with mock.patch("django_gcp.storage.gcloud.time.monotonic", return_value=1060):
+                self.assertFalse(self.storage.exists("css/site.css"))
+            self.assertEqual(self.storage._bucket.list_blobs.call_count, 2)
+            self.storage._bucket.get_blob.assert_not_called()
+
     def test_exists_no_bucket(self):
         # exists('') should return False if the bucket doesn't exist
         self.storage._client = mock.MagicMock()
@@ -244,6 +759,52 @@ class GCloudStorageTests(GCloudTestCase):
         self.assertEqual(len(files), 1)
         self.assertTrue("2.txt" in files, f' "2.txt" not in files list "{files}".')
 
+    def test_listdir_fetches_names(self):
+        self.storage._bucket = mock.MagicMock()
+        self.storage._bucket.list_blobs.return_value = mock.MagicMock(prefixes={"some/path/"})
+        blob = mock.Mock()
+        blob.name = "some/1.txt"
+        self.storage._bucket.list_blobs.return_value.__iter__.return_value = iter([blob])
+
+        self.assertEqual(self.storage.listdir("some"), (["path"], ["1.txt"]))
+        self.storage._bucket.list_blobs.assert_called_once_with(
+            prefix="some/", delimiter="/", fields="items(name),prefixes,nextPageToken"
+        )
+
+    def test_iter_blobs(self):
+        self.storage._bucket = mock.MagicMock()
+        blobs = [mock.Mock(), mock.Mock()]
+        self.storage._bucket.list_blobs.return_value = iter(blobs)
+
+        iterator = self.storage.iter_blobs("exports/2026-", fields=("name", "size"), match_glob="**/*.csv")
+        self.storage._bucket.list_blobs.assert_not_called()
+        self.assertEqual(list(iterator), blobs)
+        self.storage._bucket.list_blobs.assert_called_once_with(
+            prefix="exports/2026-", delimiter=None, fields="items(name,size),nextPageToken", match_glob="**/*.csv"
+        )
+
+        self.storage._bucket.list_blobs.return_value = iter([])
+        list(self.storage.iter_blobs(recursive=False, fields=None))
+        self.storage._bucket.list_blobs.assert_called_with(prefix="", delimiter="/")
+
+        # The name is always fetched, as blobs can't be made without it
+        list(self.storage.iter_blobs(fields=("size", "updated")))
+        self.storage._bucket.list_blobs.assert_called_with(
+            prefix="", delimiter=None, fields="items(name,size,updated),nextPageToken"
+        )
+
+    def test_walk(self):
+        storage = gcloud.GoogleCloudStorage(store_key="media", bucket_name=self.bucket_name, location="files")
+        storage._bucket = mock.MagicMock()
+        blobs = [mock.Mock(), mock.Mock()]
+        blobs[0].name, blobs[1].name = "files/some/1.txt", "files/some/path/2.txt"
+        storage._bucket.list_blobs.return_value = iter(blobs)
+
+        self.assertEqual(list(storage.walk("some", match_glob="**/*.txt")), ["some/1.txt", "some/path/2.txt"])
+        storage._bucket.list_blobs.assert_called_once_with(
+            prefix="files/some/", delimiter=None, fields="items(name),nextPageToken", match_glob="files/**/*.txt"
+        )
+
     def test_size(self):
         size = 1234
 
@@ -352,7 +913,7 @@ class GCloudStorageTests(GCloudTestCase):
         url = self.storage.url(secret_filename)
         self.storage._bucket.blob.assert_called_with(secret_filename)
         self.assertEqual(url, "http://signed_url")
-        blob.generate_signed_url.assert_called_with(expiration=timedelta(seconds=86400), version="v4")
+        blob.generate_signed_url.assert_called_with(expiration=timedelta(seconds=86400), method="GET", version="v4")
 
     def test_url_not_public_file_with_custom_expires(self):
         expiration = timedelta(seconds=3600)
@@ -366,7 +927,7 @@ class GCloudStorageTests(GCloudTestCase):
             url = self.storage.url(secret_filename)
             self.storage._bucket.blob.assert_called_with(secret_filename)
             self.assertEqual(url, "http://signed_url")
-            blob.generate_signed_url.assert_called_with(expiration=expiration, version="v4")
+            blob.generate_signed_url.assert_called_with(expiration=expiration, method="GET", version="v4")
 
     def test_custom_endpoint(self):
         with override_settings(
@@ -398,9 +959,74 @@ class GCloudStorageTests(GCloudTestCase):
             blob.generate_signed_url.assert_called_with(
                 bucket_bound_hostname=self.storage.settings.custom_endpoint,
                 expiration=timedelta(seconds=86400),
+                method="GET",
                 version="v4",
             )
 
+    def test_url_signed_url_cache(self):
+        with override_settings(
+            GCP_STORAGE_MEDIA={
+                "bucket_name": self.bucket_name,
+                "expiration": timedelta(seconds=3600),
+                "signed_url_cache_size": 10,
+                "signed_url_refresh_fraction": 0.25,
+            }
+        ):
+            self.storage._bucket = mock.MagicMock()
+            blob = self.storage._bucket.blob.return_value
+            blob.generate_signed_url.side_effect = ["http://signed_url_1", "http://signed_url_2", "http://signed_url_3"]
+
+            with mock.patch("django_gcp.storage.cache.time.monotonic", return_value=1000):
+                self.assertEqual(self.storage.url(self.filename), "http://signed_url_1")
+                self.assertEqual(self.storage.url(self.filename), "http://signed_url_1")
+                self.assertEqual(
+                    self.storage.signed_url(self.filename, response_disposition="attachment"), "http://signed_url_2"
+                )
+
+            # URLs are signed again once less than the refresh fraction of their lifetime remains
+            with mock.patch("django_gcp.storage.cache.time.monotonic", return_value=1000 + 2701):
+                self.assertEqual(self.storage.url(self.filename), "http://signed_url_3")
+
+            self.assertEqual(blob.generate_signed_url.call_count, 3)
+
+    def test_url_signed_url_cache_absolute_expiration(self):
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "signed_url_cache_size": 10}):
+            self.storage._bucket = mock.MagicMock()
+            blob = self.storage._bucket.blob.return_value
+            expiration = timezone.now() + timedelta(hours=1)
+
+            self.storage.signed_url(self.filename, expiration=expiration)
+            self.storage.signed_url(self.filename, expiration=expiration)
+
+            self.assertEqual(blob.generate_signed_url.call_count, 2)
+
+    def test_url_with_signer(self):
+        signer = mock.Mock()
+        signer.generate_signed_url.return_value = "http://signed_url"
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "signer": signer}):
+            self.storage._bucket = mock.MagicMock()
+
+            self.assertEqual(self.storage.url(self.filename), "http://signed_url")
+            signer.generate_signed_url.assert_called_once_with(
+                self.storage._bucket.blob.return_value, expiration=timedelta(seconds=86400), method="GET"
+            )
+
+    def test_urls(self):
+        self.storage._bucket = mock.MagicMock()
+        self.storage._bucket.blob.side_effect = lambda name: mock.Mock(
+            generate_signed_url=mock.Mock(return_value=f"http://signed/{name}")
+        )
+        names = [f"file-{index}.txt" for index in range(10)]
+
+        self.assertEqual(self.storage.urls(names), [f"http://signed/{name}" for name in names])
+
+    def test_urls_raises_signing_errors(self):
+        self.storage._bucket = mock.MagicMock()
+        self.storage._bucket.blob.return_value.generate_signed_url.side_effect = ValueError("No private key")
+
+        with self.assertRaises(ValueError):
+            self.storage.urls(["file-1.txt", "file-2.txt"])
+
     def test_get_available_name(self):
         with override_settings(
             GCP_STORAGE_MEDIA={
@@ -480,12 +1106,13 @@ class GCloudStorageTests(GCloudTestCase):
             obj.upload_from_file.assert_called_with(
                 mock.ANY,
                 rewind=True,
-                size=None,
+                size=mock.ANY,
                 predefined_acl=None,
                 content_type="text/css",
             )
-            args, _ = obj.upload_from_file.call_args
+            args, kwargs = obj.upload_from_file.call_args
             content = args[0]
+            self.assertEqual(kwargs["size"], len(content.getvalue()))
             zfile = gzip.GzipFile(mode="rb", fileobj=content)
             self.assertEqual(zfile.read(), b"I should be gzip'd")
 
@@ -513,15 +1140,31 @@ class GCloudStorageTests(GCloudTestCase):
             obj.upload_from_file.assert_called_with(
                 mock.ANY,
                 rewind=True,
-                size=None,
+                size=mock.ANY,
                 predefined_acl=None,
                 content_type="text/css",
             )
-            args, _ = obj.upload_from_file.call_args
+            args, kwargs = obj.upload_from_file.call_args
             content = args[0]
+            self.assertEqual(kwargs["size"], len(content.getvalue()))
             zfile = gzip.GzipFile(mode="rb", fileobj=content)
             self.assertEqual(zfile.read(), b"I should be gzip'd")
 
+    def test_storage_save_gzip_streamed(self):
+        """
+        Test that content too big to compress in memory is compressed as it's uploaded, with its size left unknown.
+        """
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": self.bucket_name, "gzip": True, "gzip_level": 1}):
+            data = os.urandom(1024) * 9 * 1024
+            self.storage.save("test_storage_save.css", ContentFile(data))
+
+            obj = self.storage._bucket.get_blob()
+            args, kwargs = obj.upload_from_file.call_args
+            self.assertIsNone(kwargs["size"])
+            self.assertIsInstance(args[0], GzipCompressionWrapper)
+            self.assertEqual(args[0].level, 1)
+            self.assertEqual(gzip.decompress(args[0].read()), data)
+
     def test_compress_content_len(self):
         """
         Test that file returned by _compress_content() is readable.
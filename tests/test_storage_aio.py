@@ -0,0 +1,246 @@
+# pylint: disable=missing-docstring
+# pylint: disable=protected-access
+
+import gzip
+import json
+from unittest import mock
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+from google.api_core.exceptions import Forbidden
+
+from django_gcp.storage import aio
+from django_gcp.storage.aio import AsyncGoogleCloudStorage, close_sessions, get_session
+from django_gcp.storage.gcloud import clear_clients
+
+
+class FakeContent:
+    def __init__(self, body):
+        self.body = body
+        self.chunk_sizes = []
+
+    async def iter_chunked(self, size):
+        self.chunk_sizes.append(size)
+        for start in range(0, len(self.body), size):
+            yield self.body[start : start + size]
+
+
+class FakeResponse:
+    def __init__(self, status, body=b""):
+        self.status = status
+        self.body = body
+        self.content = FakeContent(body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def read(self):
+        return self.body
+
+
+class FakeSession:
+    """Records requests made by the storage, answering each with the next of the given responses"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        return self.responses.pop(0)
+
+
+def resource(name, **properties):
+    return json.dumps({"name": name, "bucket": "test-media", "size": "26", "generation": "1", **properties}).encode()
+
+
+class AsyncGoogleCloudStorageTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        client_patcher = mock.patch("django_gcp.storage.gcloud.Client")
+        client = client_patcher.start()
+        self.addCleanup(client_patcher.stop)
+        clear_clients()
+        client.return_value._connection.API_BASE_URL = "https://storage.googleapis.com"
+        client.return_value._credentials.valid = True
+        client.return_value._credentials.apply.side_effect = lambda headers: headers.update(
+            {"authorization": "Bearer token"}
+        )
+        self.storage = AsyncGoogleCloudStorage(store_key="media", bucket_name="test-media")
+
+    def _use_session(self, *responses):
+        session = FakeSession(*responses)
+        patcher = mock.patch("django_gcp.storage.aio.get_session", return_value=session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return session
+
+    async def test_aexists(self):
+        session = self._use_session(FakeResponse(200, resource("a file.txt")), FakeResponse(404, b"Not Found"))
+
+        self.assertTrue(await self.storage.aexists("a file.txt"))
+        self.assertFalse(await self.storage.aexists("missing.txt"))
+
+        method, url, kwargs = session.requests[0]
+        self.assertEqual(method, "GET")
+        self.assertEqual(url, "https://storage.googleapis.com/storage/v1/b/test-media/o/a%20file.txt")
+        self.assertIn("generation", kwargs["params"]["fields"])
+        self.assertEqual(kwargs["headers"], {"authorization": "Bearer token"})
+
+    async def test_aexists_uses_metadata_cache(self):
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": "test-media", "metadata_cache_ttl": 60}):
+            session = self._use_session(FakeResponse(200, resource("file.txt")))
+            self.assertTrue(await self.storage.aexists("file.txt"))
+            self.assertTrue(await self.storage.aexists("file.txt"))
+            self.assertEqual(await self.storage.asize("file.txt"), 26)
+            self.assertEqual(len(session.requests), 1)
+
+    async def test_aexists_prefetched(self):
+        blob = mock.Mock(size=26, updated=None, time_created=None, generation=1, md5_hash=None, crc32c=None)
+        blob.name = "file.txt"
+        self.storage._bucket = mock.MagicMock()
+        self.storage._bucket.list_blobs.return_value = [blob]
+        session = self._use_session()
+
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": "test-media", "prefetch_metadata": True}):
+            self.assertTrue(await self.storage.aexists("file.txt"))
+            self.assertFalse(await self.storage.aexists("missing.txt"))
+            self.assertEqual(await self.storage.asize("file.txt"), 26)
+
+        # Metadata is answered from a single listing, rather than a request per object
+        self.storage._bucket.list_blobs.assert_called_once()
+        self.assertEqual(session.requests, [])
+
+    async def test_aopen(self):
+        response = FakeResponse(200, b"This is some test content.")
+        session = self._use_session(response, FakeResponse(404))
+
+        f = await self.storage.aopen("file.txt")
+        self.assertEqual(f.read(), b"This is some test content.")
+        self.assertEqual(session.requests[0][2]["params"], {"alt": "media"})
+        # The content is streamed to the file rather than read whole
+        self.assertEqual(len(response.content.chunk_sizes), 1)
+        f.close()
+
+        with self.assertRaises(FileNotFoundError):
+            await self.storage.aopen("missing.txt")
+
+        with self.assertRaises(ValueError):
+            await self.storage.aopen("file.txt", "wb")
+
+    async def test_asave(self):
+        session = self._use_session(FakeResponse(200, resource("file.txt")))
+
+        with override_settings(
+            GCP_STORAGE_MEDIA={
+                "bucket_name": "test-media",
+                "default_acl": "publicRead",
+                "object_parameters": {"cache_control": "no-cache"},
+            }
+        ):
+            name = await self.storage.asave("file.txt", ContentFile("This is some test content."))
+
+        self.assertEqual(name, "file.txt")
+        method, url, kwargs = session.requests[0]
+        self.assertEqual(method, "POST")
+        self.assertEqual(url, "https://storage.googleapis.com/upload/storage/v1/b/test-media/o")
+        self.assertEqual(kwargs["params"], {"uploadType": "multipart", "predefinedAcl": "publicRead"})
+        boundary = kwargs["headers"]["Content-Type"].split('boundary="')[1].rstrip('"')
+        metadata_part, content_part = kwargs["data"].split(f"--{boundary}".encode())[1:3]
+        metadata = json.loads(metadata_part.split(b"\r\n\r\n")[1])
+        self.assertEqual(metadata["name"], "file.txt")
+        self.assertEqual(metadata["contentType"], "text/plain")
+        self.assertEqual(metadata["cacheControl"], "no-cache")
+        self.assertIn(b"Content-Type: text/plain\r\n\r\nThis is some test content.\r\n", content_part)
+
+    async def test_asave_gzipped(self):
+        session = self._use_session(FakeResponse(200, resource("file.css")))
+
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": "test-media", "gzip": True}):
+            await self.storage.asave("file.css", ContentFile("body { color: red; }"))
+
+        metadata = json.loads(session.requests[0][2]["data"].split(b"\r\n\r\n")[1].split(b"\r\n")[0])
+        self.assertEqual(metadata["contentEncoding"], "gzip")
+
+    async def test_adelete(self):
+        session = self._use_session(FakeResponse(204), FakeResponse(404))
+
+        await self.storage.adelete("file.txt")
+        await self.storage.adelete("missing.txt")
+
+        self.assertEqual([request[0] for request in session.requests], ["DELETE", "DELETE"])
+
+    async def test_request_errors(self):
+        self._use_session(FakeResponse(403, b"Forbidden"))
+        with self.assertRaises(Forbidden):
+            await self.storage.aexists("file.txt")
+
+    async def test_requires_aiohttp(self):
+        with mock.patch("django_gcp.storage.aio.aiohttp", None):
+            with self.assertRaises(ImproperlyConfigured):
+                get_session(100)
+
+    async def test_aurl(self):
+        with override_settings(GCP_STORAGE_MEDIA={"bucket_name": "test-media", "querystring_auth": False}):
+            self.assertEqual(await self.storage.aurl("file.txt"), self.storage.bucket.blob().public_url)
+
+
+class AiohttpSessionTests(SimpleTestCase):
+    """Requests made through a real aiohttp session, to a local server standing in for the JSON API"""
+
+    def setUp(self):
+        super().setUp()
+        client_patcher = mock.patch("django_gcp.storage.gcloud.Client")
+        self.client = client_patcher.start().return_value
+        self.addCleanup(client_patcher.stop)
+        clear_clients()
+        self.client._credentials.valid = True
+        self.client._credentials.apply.side_effect = lambda headers: headers.update({"authorization": "Bearer token"})
+        self.storage = AsyncGoogleCloudStorage(store_key="media", bucket_name="test-media")
+        self.requests = []
+
+    async def _get_object(self, request):
+        self.requests.append(request)
+        name = request.match_info["name"]
+        if name == "missing.txt":
+            return web.Response(status=404, text="Not Found")
+        if request.query.get("alt") == "media":
+            # Served gzip-encoded, as GCS serves objects stored with gzip encoding to clients accepting it
+            return web.Response(body=gzip.compress(b"This is some test content."), headers={"Content-Encoding": "gzip"})
+        return web.Response(body=resource(name), content_type="application/json")
+
+    async def _start_server(self):
+        app = web.Application()
+        app.router.add_get("/storage/v1/b/test-media/o/{name:.+}", self._get_object)
+        server = TestServer(app)
+        await server.start_server()
+        self.client._connection.API_BASE_URL = str(server.make_url("")).rstrip("/")
+        return server
+
+    async def test_requests(self):
+        server = await self._start_server()
+        try:
+            self.assertTrue(await self.storage.aexists("a file.txt"))
+            self.assertFalse(await self.storage.aexists("missing.txt"))
+            with await self.storage.aopen("a file.txt") as f:
+                self.assertEqual(f.read(), b"This is some test content.")
+            session = get_session(self.storage.settings.async_connection_limit)
+        finally:
+            await close_sessions()
+            await server.close()
+
+        self.assertEqual(
+            [request.match_info["name"] for request in self.requests], ["a file.txt", "missing.txt", "a file.txt"]
+        )
+        self.assertEqual(self.requests[0].headers["authorization"], "Bearer token")
+        self.assertIn("generation", self.requests[0].query["fields"])
+
+        # The session is shared by requests in the event loop, until closed
+        self.assertTrue(session.closed)
+        self.assertEqual(len(aio._sessions), 0)
@@ -0,0 +1,147 @@
+# pylint: disable=missing-docstring
+# pylint: disable=protected-access
+
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import TestCase
+
+from django_gcp.exceptions import MissingBlobError
+from django_gcp.storage.blob_utils import refresh_blob_properties, sign_blob_urls
+from django_gcp.storage.gcloud import clear_clients
+from tests.server.example.models import ExampleBlankBlobFieldModel
+
+
+class SignBlobUrlsTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        client_patcher = mock.patch("django_gcp.storage.gcloud.Client")
+        client_patcher.start()
+        self.addCleanup(client_patcher.stop)
+        clear_clients()
+
+        self.storage = ExampleBlankBlobFieldModel._meta.get_field("blob").storage
+        self.storage._bucket = mock.MagicMock()
+        self.storage._bucket.blob.side_effect = self._blob
+        self.addCleanup(setattr, self.storage, "_bucket", None)
+        self.signer = mock.Mock()
+        self.signer.generate_signed_url.side_effect = lambda blob, **kwargs: f"http://signed/{blob.name}"
+        patcher = mock.patch.object(
+            type(self.storage), "signer", new_callable=mock.PropertyMock, return_value=self.signer
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.instances = [ExampleBlankBlobFieldModel.objects.create(blob=None) for _ in range(3)]
+        for index, instance in enumerate(self.instances[:2]):
+            instance.blob = {"path": f"uploads/{index}.txt"}
+            ExampleBlankBlobFieldModel.objects.filter(pk=instance.pk).update(blob=instance.blob)
+
+    @staticmethod
+    def _blob(name):
+        blob = mock.Mock()
+        blob.name = name
+        return blob
+
+    def test_sign_queryset(self):
+        with self.assertNumQueries(1):
+            urls = sign_blob_urls(ExampleBlankBlobFieldModel.objects.all(), "blob", expiration=timedelta(minutes=5))
+
+        self.assertEqual(
+            urls,
+            {
+                self.instances[0].pk: "http://signed/uploads/0.txt",
+                self.instances[1].pk: "http://signed/uploads/1.txt",
+                self.instances[2].pk: None,
+            },
+        )
+        self.signer.generate_signed_url.assert_called_with(mock.ANY, expiration=timedelta(minutes=5), method="GET")
+        self.storage.bucket.get_blob.assert_not_called()
+
+    def test_sign_instances(self):
+        with self.assertNumQueries(0):
+            urls = sign_blob_urls(self.instances, "blob", response_disposition="inline")
+
+        self.assertEqual(urls[self.instances[1].pk], "http://signed/uploads/1.txt")
+        self.assertEqual(urls[self.instances[2].pk], None)
+        self.signer.generate_signed_url.assert_called_with(
+            mock.ANY, expiration=timedelta(seconds=86400), method="GET", response_disposition="inline"
+        )
+        self.assertEqual(sign_blob_urls([], "blob"), {})
+
+    def test_signing_errors_are_raised(self):
+        self.signer.generate_signed_url.side_effect = ValueError("No private key")
+
+        with self.assertRaises(ValueError):
+            sign_blob_urls(ExampleBlankBlobFieldModel.objects.all(), "blob")
+
+
+class BlobPropertiesTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = ExampleBlankBlobFieldModel._meta.get_field("blob").storage
+        self.storage._bucket = mock.MagicMock()
+        self.addCleanup(setattr, self.storage, "_bucket", None)
+
+        self.instance = ExampleBlankBlobFieldModel.objects.create(blob=None)
+        ExampleBlankBlobFieldModel.objects.filter(pk=self.instance.pk).update(blob={"path": "uploads/file.txt"})
+        self.instance.refresh_from_db()
+
+    def test_refresh_blob_properties(self):
+        self.storage.bucket.get_blob.return_value = mock.Mock(
+            size=26,
+            content_type="text/plain",
+            crc32c="AAAAAA==",
+            generation=2,
+            updated=datetime(2026, 1, 1, tzinfo=timezone.utc),
+        )
+
+        # The row is read (and locked) then updated, in a savepoint as the test runs in a transaction
+        with self.assertNumQueries(4):
+            value = refresh_blob_properties(self.instance, "blob")
+
+        expected = {
+            "path": "uploads/file.txt",
+            "size": 26,
+            "content_type": "text/plain",
+            "crc32c": "AAAAAA==",
+            "generation": 2,
+            "updated": "2026-01-01T00:00:00+00:00",
+        }
+        self.assertEqual(value, expected)
+        self.assertEqual(self.instance.blob, expected)
+        self.assertEqual(ExampleBlankBlobFieldModel.objects.get(pk=self.instance.pk).blob, expected)
+        self.storage.bucket.get_blob.assert_called_once_with("uploads/file.txt")
+
+    def test_refresh_of_changed_value(self):
+        self.storage.bucket.get_blob.return_value = mock.Mock(size=26, updated=None)
+        ExampleBlankBlobFieldModel.objects.filter(pk=self.instance.pk).update(blob={"path": "uploads/other.txt"})
+
+        # The value saved since the instance was read isn't reverted
+        self.assertIsNone(refresh_blob_properties(self.instance, "blob"))
+        self.assertEqual(
+            ExampleBlankBlobFieldModel.objects.get(pk=self.instance.pk).blob, {"path": "uploads/other.txt"}
+        )
+        self.assertEqual(self.instance.blob, {"path": "uploads/file.txt"})
+
+    def test_refresh_missing_blob(self):
+        self.storage.bucket.get_blob.return_value = None
+
+        with self.assertRaises(MissingBlobError):
+            refresh_blob_properties(self.instance, "blob")
+
+    def test_properties_are_kept_when_unchanged(self):
+        properties = {"size": 26, "generation": 2}
+        ExampleBlankBlobFieldModel.objects.filter(pk=self.instance.pk).update(
+            blob={"path": "uploads/file.txt", **properties}
+        )
+        instance = ExampleBlankBlobFieldModel.objects.get(pk=self.instance.pk)
+
+        # Properties given by a client are ignored in favour of those recorded
+        instance.blob = {"path": "uploads/file.txt", "size": 1}
+        instance.full_clean()
+        instance.save()
+
+        self.assertEqual(
+            ExampleBlankBlobFieldModel.objects.get(pk=self.instance.pk).blob, {"path": "uploads/file.txt", **properties}
+        )
@@ -0,0 +1,85 @@
+# pylint: disable=missing-docstring
+
+from datetime import timedelta
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from django_gcp.storage.cache import MetadataCache, SignedUrlCache
+
+
+class MetadataCacheTests(SimpleTestCase):
+    def test_lookup_miss(self):
+        metadata_cache = MetadataCache(ttl=60)
+        self.assertEqual(metadata_cache.lookup("file.txt"), (False, None))
+
+    def test_lookup_hit(self):
+        metadata_cache = MetadataCache(ttl=timedelta(seconds=60))
+        metadata_cache.set("file.txt", {"size": 10})
+        metadata_cache.set("missing.txt", None)
+        self.assertEqual(metadata_cache.lookup("file.txt"), (True, {"size": 10}))
+        self.assertEqual(metadata_cache.lookup("missing.txt"), (True, None))
+
+    def test_delete(self):
+        metadata_cache = MetadataCache(ttl=60)
+        metadata_cache.set("file.txt", {"size": 10})
+        metadata_cache.delete("file.txt")
+        self.assertEqual(metadata_cache.lookup("file.txt"), (False, None))
+
+    def test_entries_expire(self):
+        metadata_cache = MetadataCache(ttl=60)
+        with mock.patch("django_gcp.storage.cache.time.monotonic", return_value=1000):
+            metadata_cache.set("file.txt", {"size": 10})
+        with mock.patch("django_gcp.storage.cache.time.monotonic", return_value=1059):
+            self.assertEqual(metadata_cache.lookup("file.txt"), (True, {"size": 10}))
+        with mock.patch("django_gcp.storage.cache.time.monotonic", return_value=1061):
+            self.assertEqual(metadata_cache.lookup("file.txt"), (False, None))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        metadata_cache = MetadataCache(ttl=60, max_size=2)
+        metadata_cache.set("a.txt", {"size": 1})
+        metadata_cache.set("b.txt", {"size": 2})
+        metadata_cache.lookup("a.txt")
+        metadata_cache.set("c.txt", {"size": 3})
+        self.assertTrue(metadata_cache.lookup("a.txt")[0])
+        self.assertFalse(metadata_cache.lookup("b.txt")[0])
+        self.assertTrue(metadata_cache.lookup("c.txt")[0])
+
+    def test_shared_cache(self):
+        cache.clear()
+        writer = MetadataCache(ttl=60, alias="default", key_prefix="bucket")
+        reader = MetadataCache(ttl=60, alias="default", key_prefix="bucket")
+        other_bucket = MetadataCache(ttl=60, alias="default", key_prefix="other-bucket")
+
+        writer.set("file.txt", {"size": 10})
+        self.assertEqual(reader.lookup("file.txt"), (True, {"size": 10}))
+        self.assertEqual(other_bucket.lookup("file.txt"), (False, None))
+
+        writer.delete("file.txt")
+        reader.clear()
+        self.assertEqual(reader.lookup("file.txt"), (False, None))
+
+    def test_shared_cache_entries_expire_with_the_original_entry(self):
+        cache.clear()
+        writer = MetadataCache(ttl=60, alias="default", key_prefix="bucket")
+        reader = MetadataCache(ttl=60, alias="default", key_prefix="bucket")
+
+        with mock.patch("django_gcp.storage.cache.time.time", return_value=1000):
+            writer.set("file.txt", {"size": 10}, ttl=10)
+
+        with mock.patch("django_gcp.storage.cache.time.time", return_value=1008):
+            self.assertEqual(reader.lookup("file.txt"), (True, {"size": 10}))
+
+        # The reader holds the entry only for the 2 seconds it had remaining
+        with mock.patch("django_gcp.storage.cache.time.monotonic", return_value=time.monotonic() + 3):
+            self.assertEqual(reader.lookup("file.txt"), (False, None))
+
+
+class SignedUrlCacheTests(SimpleTestCase):
+    def test_get_key(self):
+        key = SignedUrlCache.get_key("file.txt", "GET", timedelta(seconds=60), response_type="text/plain")
+        self.assertEqual(key, SignedUrlCache.get_key("file.txt", "GET", 60, response_type="text/plain"))
+        self.assertNotEqual(key, SignedUrlCache.get_key("file.txt", "GET", 60))
+        self.assertNotEqual(key, SignedUrlCache.get_key("file.txt", "PUT", 60, response_type="text/plain"))
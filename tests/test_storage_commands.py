@@ -0,0 +1,293 @@
+# pylint: disable=missing-docstring
+# pylint: disable=protected-access
+
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from django_gcp.management.commands.cleanup_tmp_files import get_ingress_prefixes, get_outermost_prefixes
+from django_gcp.management.commands.sync_blob_properties import Command, get_listing_ranges
+from django_gcp.storage.blob_utils import get_blob_properties, record_blob_properties
+from django_gcp.storage.gcloud import clear_clients
+from django_gcp.storage.operations import BulkResult
+from tests.server.example.models import ExampleBlankBlobFieldModel
+
+
+def listed_blob(name, generation=1):
+    blob = mock.Mock(
+        size=len(name),
+        content_type="text/plain",
+        crc32c="AAAAAA==",
+        generation=generation,
+        updated=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+    blob.name = name
+    return blob
+
+
+class SyncBlobPropertiesTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = ExampleBlankBlobFieldModel._meta.get_field("blob").storage
+        self.storage._bucket = mock.MagicMock()
+        self.addCleanup(setattr, self.storage, "_bucket", None)
+
+        self.objects = [
+            listed_blob("uploads/0.txt"),
+            listed_blob("uploads/other.txt"),
+            listed_blob("uploads/1.txt"),
+            listed_blob("root.txt", generation=3),
+        ]
+        self.storage.bucket.list_blobs.side_effect = self._list_blobs
+
+        self.instances = {}
+        for path in ["uploads/0.txt", "uploads/1.txt", "root.txt", "uploads/missing.txt", None]:
+            instance = ExampleBlankBlobFieldModel.objects.create(blob=None)
+            if path is not None:
+                ExampleBlankBlobFieldModel.objects.filter(pk=instance.pk).update(blob={"path": path})
+            self.instances[path] = instance
+
+    def _list_blobs(self, start_offset, end_offset, fields):
+        """List objects in a range of names in pages of one, as GCS does (in lexicographic order of name)"""
+        listed = sorted(
+            (
+                blob
+                for blob in self.objects
+                if blob.name >= start_offset and (end_offset is None or blob.name < end_offset)
+            ),
+            key=lambda blob: blob.name,
+        )
+        return mock.Mock(pages=iter([[blob] for blob in listed]))
+
+    def _call(self, *args):
+        out = StringIO()
+        call_command("sync_blob_properties", "example.ExampleBlankBlobFieldModel", *args, stdout=out)
+        return out.getvalue()
+
+    def _value(self, path):
+        return ExampleBlankBlobFieldModel.objects.get(pk=self.instances[path].pk).blob
+
+    def test_sync(self):
+        out = self._call("--batch-size", "1", "--workers", "2")
+
+        self.assertIn("checked 4 rows, updated 3, 1 with missing blobs", out)
+        self.assertEqual(
+            self._value("uploads/1.txt"),
+            {
+                "path": "uploads/1.txt",
+                "size": 13,
+                "content_type": "text/plain",
+                "crc32c": "AAAAAA==",
+                "generation": 1,
+                "updated": "2026-01-01T00:00:00+00:00",
+            },
+        )
+        self.assertEqual(self._value("root.txt")["generation"], 3)
+        self.assertEqual(self._value("uploads/missing.txt"), {"path": "uploads/missing.txt"})
+        self.assertIsNone(self._value(None))
+
+        # The referenced paths are split into a range per row, listed concurrently
+        self.assertEqual(self.storage.bucket.list_blobs.call_count, 4)
+        self.storage.bucket.list_blobs.assert_any_call(
+            start_offset="root.txt", end_offset="uploads/0.txt", fields=mock.ANY
+        )
+        self.storage.bucket.list_blobs.assert_any_call(
+            start_offset="uploads/missing.txt", end_offset=None, fields=mock.ANY
+        )
+
+        # Rows already up to date aren't updated again
+        self.objects = [listed_blob("uploads/0.txt"), listed_blob("uploads/1.txt")]
+        self.assertIn("checked 4 rows, updated 0, 2 with missing blobs", self._call())
+
+    def test_rows_changed_during_sync_are_not_reverted(self):
+        def rename_then_record(*args, **kwargs):
+            # Change a row's path after it's been read, as a concurrent ingress would
+            ExampleBlankBlobFieldModel.objects.filter(pk=self.instances["uploads/1.txt"].pk).update(
+                blob={"path": "uploads/renamed.txt"}
+            )
+            return record_blob_properties(*args, **kwargs)
+
+        self.objects = [listed_blob("uploads/1.txt")]
+        with mock.patch(
+            "django_gcp.management.commands.sync_blob_properties.record_blob_properties", side_effect=rename_then_record
+        ):
+            out = self._call()
+
+        self.assertIn("updated 0", out)
+        self.assertEqual(self._value("uploads/1.txt"), {"path": "uploads/renamed.txt"})
+
+    def test_rows_are_updated_in_bulk(self):
+        field = ExampleBlankBlobFieldModel._meta.get_field("blob")
+        properties = {blob.name: get_blob_properties(blob) for blob in self.objects}
+
+        with CaptureQueriesContext(connection) as queries:
+            matched, changed = Command._update(ExampleBlankBlobFieldModel, field, properties, False, 500)
+
+        self.assertEqual((matched, changed), (3, 3))
+        self.assertEqual(len([query for query in queries if query["sql"].startswith("UPDATE")]), 1)
+        self.assertEqual(self._value("root.txt")["generation"], 3)
+
+    def test_dry_run(self):
+        out = self._call("--dry-run", "--max-requests-per-second", "1000")
+
+        self.assertIn("would update 3", out)
+        self.assertEqual(self._value("uploads/0.txt"), {"path": "uploads/0.txt"})
+
+    def test_no_rows(self):
+        ExampleBlankBlobFieldModel.objects.update(blob=None)
+
+        self.assertIn("checked 0 rows", self._call())
+        self.storage.bucket.list_blobs.assert_not_called()
+
+    def test_unknown_field(self):
+        with self.assertRaises(CommandError):
+            call_command("sync_blob_properties", "example.NotAModel", stdout=StringIO())
+
+    def test_get_listing_ranges(self):
+        self.assertEqual(
+            get_listing_ranges(["b", "a", "é", "b", "z"]), [("a", "b"), ("b", "z"), ("z", "é"), ("é", None)]
+        )
+
+
+class FakeListing:
+    """A listing of pages of blobs which, like an HTTPIterator, gives the token of the next page as pages are read"""
+
+    def __init__(self, pages, page_token=None):
+        self._pages = pages
+        self._start = int(page_token or 0)
+        self.next_page_token = None
+
+    @property
+    def pages(self):
+        for index in range(self._start, len(self._pages)):
+            self.next_page_token = str(index + 1) if index + 1 < len(self._pages) else None
+            yield self._pages[index]
+
+
+def tmp_blob(name, age_hours):
+    blob = mock.Mock(time_created=datetime.now(timezone.utc) - timedelta(hours=age_hours), generation=7)
+    blob.name = name
+    return blob
+
+
+class CleanupTmpFilesTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch("django_gcp.storage.gcloud.Client")
+        self.bucket = patcher.start().return_value.bucket.return_value
+        self.addCleanup(patcher.stop)
+        clear_clients()
+
+        self.pages = [
+            [tmp_blob("_tmp/0", 48), tmp_blob("_tmp/1", 1)],
+            [tmp_blob("_tmp/2", 30), tmp_blob("_tmp/3", 72)],
+        ]
+        self.bucket.list_blobs.side_effect = lambda prefix, fields, page_token: FakeListing(self.pages, page_token)
+
+        patcher = mock.patch(
+            "django_gcp.management.commands.cleanup_tmp_files.delete_blobs",
+            side_effect=lambda bucket, names, **kwargs: [BulkResult(name, result=True) for name in names],
+        )
+        self.delete_blobs = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _call(self, *args):
+        out = StringIO()
+        call_command("cleanup_tmp_files", "media", "--prefix", "_tmp/", *args, stdout=out)
+        return out.getvalue()
+
+    def _deleted(self):
+        return [name for call in self.delete_blobs.call_args_list for name in call.args[1]]
+
+    def test_list_only(self):
+        out = self._call()
+
+        self.assertEqual(out, "Found 3 temporary files older than 24 hours under _tmp/\n")
+        self.delete_blobs.assert_not_called()
+        self.bucket.list_blobs.assert_called_once_with(prefix="_tmp/", fields=mock.ANY, page_token=None)
+
+    def test_delete(self):
+        out = self._call("--delete", "--older-than", "36")
+
+        self.assertIn("Found 2 temporary files older than 36 hours under _tmp/; deleted 2", out)
+        self.assertEqual(self._deleted(), ["_tmp/0", "_tmp/3"])
+        self.assertEqual(self.delete_blobs.call_args.kwargs["if_generation_match"], [7])
+
+    def test_max_deletes_and_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "checkpoint.json")
+
+            # Stop part way through the second page, having recorded progress through the first
+            self.assertIn("deleted 2", self._call("--delete", "--max-deletes", "2", "--checkpoint", checkpoint))
+            with open(checkpoint, encoding="utf-8") as f:
+                self.assertEqual(json.load(f), {"_tmp/": "1"})
+
+            # Resume from the second page, removing the checkpoint once complete
+            self.pages[1] = self.pages[1][1:]
+            self.assertIn("deleted 1", self._call("--delete", "--checkpoint", checkpoint))
+            self.bucket.list_blobs.assert_called_with(prefix="_tmp/", fields=mock.ANY, page_token="1")
+            self.assertFalse(os.path.exists(checkpoint))
+
+        self.assertEqual(self._deleted(), ["_tmp/0", "_tmp/2", "_tmp/3"])
+
+    @override_settings(USE_TZ=False)
+    def test_without_time_zones(self):
+        self.assertIn("Found 3 temporary files", self._call())
+
+    def test_default_prefixes(self):
+        self.bucket.list_blobs.side_effect = lambda prefix, fields, page_token: FakeListing([], page_token)
+
+        out = StringIO()
+        call_command("cleanup_tmp_files", "media", stdout=out)
+
+        # The composite upload parts prefix is within the ingress_to path of the example models
+        self.assertIn("under _tmp/", out.getvalue())
+        with mock.patch(
+            "django_gcp.management.commands.cleanup_tmp_files.get_ingress_prefixes", return_value=["uploads/tmp/"]
+        ):
+            call_command("cleanup_tmp_files", "media", stdout=out)
+        self.assertIn("under _tmp/composite/, uploads/tmp/", out.getvalue())
+
+    def test_bucket_root_is_rejected(self):
+        for prefix in ["", "/"]:
+            with self.subTest(prefix=prefix), self.assertRaises(CommandError):
+                call_command("cleanup_tmp_files", "media", "--prefix", prefix, "--delete", stdout=StringIO())
+
+        with mock.patch("django_gcp.management.commands.cleanup_tmp_files.get_ingress_prefixes", return_value=[""]):
+            with self.assertRaises(CommandError):
+                call_command("cleanup_tmp_files", "media", "--delete", stdout=StringIO())
+
+        self.bucket.list_blobs.assert_not_called()
+        self.delete_blobs.assert_not_called()
+
+    def test_ingress_prefixes(self):
+        self.assertEqual(get_ingress_prefixes("media"), ["_tmp/"])
+        self.assertEqual(get_ingress_prefixes("not-a-store"), [])
+
+    def test_prefixes_are_directories(self):
+        self.bucket.list_blobs.side_effect = lambda prefix, fields, page_token: FakeListing([], page_token)
+
+        # An ingress_to path without a trailing slash doesn't include objects whose names merely start with it
+        with mock.patch(
+            "django_gcp.management.commands.cleanup_tmp_files.get_ingress_prefixes", return_value=["uploads/tmp"]
+        ):
+            call_command("cleanup_tmp_files", "media", stdout=StringIO())
+        self.assertEqual(
+            [call.kwargs["prefix"] for call in self.bucket.list_blobs.call_args_list],
+            ["_tmp/composite/", "uploads/tmp/"],
+        )
+
+        # Prefixes within another (as directories, not merely as strings) are omitted
+        self.assertEqual(get_outermost_prefixes(["tmp/", "tmp-archive/", "tmp/a/"]), ["tmp-archive/", "tmp/"])
+
+        for prefix in ["uploads//tmp", "./tmp", "uploads/../tmp"]:
+            with self.subTest(prefix=prefix), self.assertRaises(CommandError):
+                call_command("cleanup_tmp_files", "media", "--prefix", prefix, stdout=StringIO())
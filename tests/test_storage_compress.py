@@ -0,0 +1,202 @@
+# pylint: disable=missing-docstring
+# pylint: disable=protected-access
+
+import array
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+import json
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import brotli
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+import zstandard
+
+from django_gcp.storage import gcloud
+from django_gcp.storage.compress import (
+    READ_CHUNK_SIZE,
+    GzipCompressionWrapper,
+    get_accepted_encodings,
+    get_precompressor,
+    precompress,
+)
+
+
+class NonSeekableBytesIO(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+class GzipCompressionWrapperTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        # Partly compressible content, spanning several reads of the wrapped file
+        self.data = (os.urandom(1024) + b"a" * 3072) * 100
+
+    def _read_all(self, wrapper, size):
+        chunks = []
+        while chunk := wrapper.read(size):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def test_compresses_in_chunks(self):
+        for size in (1, 1000, READ_CHUNK_SIZE, 10 * READ_CHUNK_SIZE):
+            with self.subTest(size=size):
+                wrapper = GzipCompressionWrapper(io.BytesIO(self.data), level=6)
+                compressed = self._read_all(wrapper, size)
+                self.assertEqual(gzip.decompress(compressed), self.data)
+                self.assertEqual(wrapper.tell(), len(compressed))
+
+    def test_readinto_any_buffer(self):
+        data = os.urandom(2 * READ_CHUNK_SIZE)
+        wrapper = GzipCompressionWrapper(io.BytesIO(data))
+        numbers = array.array("i", bytes(READ_CHUNK_SIZE))
+        size = wrapper.readinto(numbers)
+
+        self.assertEqual(size, READ_CHUNK_SIZE)
+        self.assertEqual(gzip.decompress(numbers.tobytes() + wrapper.read()), data)
+
+    def test_buffers_only_unread_output(self):
+        wrapper = GzipCompressionWrapper(io.BytesIO(self.data * 10), level=1)
+        while wrapper.read(1000):
+            self.assertLessEqual(len(wrapper._buffer), 2 * READ_CHUNK_SIZE)
+
+    def test_level(self):
+        fast = GzipCompressionWrapper(io.BytesIO(self.data), level=1).read()
+        best = GzipCompressionWrapper(io.BytesIO(self.data)).read()
+        self.assertGreater(len(fast), len(best))
+
+    def test_seek(self):
+        raw = io.BytesIO(b"xx" + self.data)
+        raw.seek(2)
+        wrapper = GzipCompressionWrapper(raw)
+        compressed = wrapper.read()
+
+        # Rewinding compresses again from where the wrapped file started, and seeking forward skips output
+        self.assertEqual(wrapper.seek(0), 0)
+        self.assertEqual(wrapper.read(), compressed)
+        self.assertEqual(wrapper.seek(100), 100)
+        self.assertEqual(wrapper.read(10), compressed[100:110])
+        self.assertEqual(wrapper.seek(-10, os.SEEK_CUR), 100)
+        self.assertEqual(wrapper.read(), compressed[100:])
+
+    def test_non_seekable(self):
+        wrapper = GzipCompressionWrapper(NonSeekableBytesIO(self.data))
+        self.assertFalse(wrapper.seekable())
+        self.assertEqual(wrapper.seek(0), 0)
+        wrapper.read(10)
+        with self.assertRaises(io.UnsupportedOperation):
+            wrapper.seek(0)
+
+
+class PrecompressTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        for target, new in [
+            ("django_gcp.storage.gcloud.Client", mock.DEFAULT),
+            ("django_gcp.storage.gcloud.Blob", mock.DEFAULT),
+        ]:
+            patcher = mock.patch(target, new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        gcloud.clear_clients()
+
+        self.storage = self._storage()
+
+        self.files = {
+            "js/app.js": b"function f() { return 1; }" * 100,
+            "css/site.css": b"a" * 10,
+            "img/logo.png": b"png" * 100,
+        }
+        self.source = mock.Mock()
+        self.source.open.side_effect = lambda path: ContentFile(self.files[path])
+        self.paths = {name: (self.source, name) for name in self.files}
+
+    @staticmethod
+    def _storage(**overrides):
+        settings = {"bucket_name": "test-static", "precompress_encodings": ("br",), "precompress_workers": 1}
+        storage = gcloud.GoogleCloudStorage(store_key="media", **{**settings, **overrides})
+        storage._bucket = mock.MagicMock()
+        storage._bucket.get_blob.return_value = None
+        return storage
+
+    def test_post_process(self):
+        processed = list(self.storage.post_process(self.paths))
+
+        # Variants are only saved for compressible content types, and only if smaller than the original
+        self.assertEqual(processed, [("js/app.js", "js/app.js.br", True)])
+        gcloud.Blob.assert_any_call("js/app.js.br", self.storage._bucket, chunk_size=None)
+        self.assertEqual(gcloud.Blob.return_value.content_encoding, "br")
+        gcloud.Blob.return_value.upload_from_file.assert_any_call(
+            mock.ANY, rewind=True, size=mock.ANY, predefined_acl=None, content_type="text/javascript"
+        )
+        self.assertEqual(self.storage.precompressed_manifest, {"js/app.js": ["br"]})
+
+        # The saved variant decompresses to the original
+        variant = gcloud.Blob.return_value.upload_from_file.call_args_list[0].args[0]
+        variant.seek(0)
+        self.assertEqual(brotli.decompress(variant.read()), self.files["js/app.js"])
+
+        # The manifest is saved last
+        manifest = gcloud.Blob.return_value.upload_from_file.call_args.args[0]
+        manifest.seek(0)
+        self.assertEqual(json.loads(manifest.read()), {"js/app.js": ["br"]})
+
+    def test_post_process_in_pool(self):
+        pool = ThreadPoolExecutor(max_workers=2)
+        with mock.patch("django_gcp.storage.gcloud.ProcessPoolExecutor", return_value=pool) as executor_class:
+            storage = self._storage(precompress_workers=2)
+            self.assertEqual(len(list(storage.post_process(self.paths))), 1)
+
+        # Worker processes are spawned rather than forked, and shut down once done
+        self.assertEqual(executor_class.call_args.kwargs["mp_context"].get_start_method(), "spawn")
+        with self.assertRaises(RuntimeError):
+            pool.submit(print)
+
+    def test_post_process_abandoned(self):
+        pool = mock.MagicMock(wraps=ThreadPoolExecutor(max_workers=2))
+        with mock.patch("django_gcp.storage.gcloud.ProcessPoolExecutor", return_value=pool):
+            storage = self._storage(precompress_workers=2)
+            results = storage.post_process(self.paths)
+            next(results)
+            results.close()
+
+        pool.shutdown.assert_called_once_with(cancel_futures=True)
+
+    def test_post_process_dry_run(self):
+        self.assertEqual(list(self.storage.post_process(self.paths, dry_run=True)), [])
+        self.source.open.assert_not_called()
+
+    def test_precompress_round_trip(self):
+        data = self.files["js/app.js"]
+        compressed = precompress(data, ("br", "zstd"))
+
+        self.assertEqual(brotli.decompress(compressed["br"]), data)
+        self.assertEqual(zstandard.ZstdDecompressor().decompress(compressed["zstd"]), data)
+
+    def test_unavailable_encoding(self):
+        with mock.patch("django_gcp.storage.compress.brotli", None):
+            with self.assertRaises(ImproperlyConfigured):
+                list(self.storage.post_process(self.paths))
+        with self.assertRaises(ImproperlyConfigured):
+            get_precompressor("lzma")
+
+    def test_url_of_variant(self):
+        self.storage = self._storage(default_acl="publicRead")
+        self.storage._bucket.get_blob.return_value = mock.Mock()
+        self.storage._bucket.get_blob.return_value.download_as_bytes.return_value = b'{"js/app.js": ["br"]}'
+        self.storage._bucket.blob.side_effect = lambda name: SimpleNamespace(public_url=f"https://cdn/{name}")
+
+        self.assertEqual(self.storage.url("js/app.js", accept_encoding="gzip, br"), "https://cdn/js/app.js.br")
+        self.assertEqual(self.storage.url("js/app.js", accept_encoding="gzip, br;q=0"), "https://cdn/js/app.js")
+        self.assertEqual(self.storage.url("css/site.css", accept_encoding="br"), "https://cdn/css/site.css")
+        self.assertEqual(self.storage.url("js/app.js"), "https://cdn/js/app.js")
+        self.storage._bucket.get_blob.assert_called_once_with("precompressed.json")
+
+    def test_accepted_encodings(self):
+        self.assertEqual(get_accepted_encodings("gzip, deflate, BR;q=0.5, zstd;q=0, *"), {"gzip", "deflate", "br", "*"})
+        self.assertEqual(get_accepted_encodings(""), set())
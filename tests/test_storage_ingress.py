@@ -0,0 +1,270 @@
+# pylint: disable=missing-docstring
+# pylint: disable=protected-access
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from django_gcp.exceptions import AttemptedOverwriteError, MissingBlobError
+from django_gcp.storage.fields import IngressBatch, IngressMove
+from django_gcp.storage.gcloud import GoogleCloudStorage
+from django_gcp.storage.operations import BulkResult
+from tests.server.example.models import ExampleBlankBlobFieldModel
+
+
+class IngressBatchTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.on_change = mock.Mock()
+        self.field = mock.Mock(on_change=self.on_change, attname="blob")
+        self.field.name = "blob"
+        self.field.storage.settings.bulk_workers = 4
+        self.field.storage.bulk_executor = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.field.storage.bulk_executor.shutdown)
+        self.field.storage._run_bulk = partial(GoogleCloudStorage._run_bulk, self.field.storage)
+        self.field.storage.bucket.name = "test-media"
+        patcher = mock.patch("django_gcp.storage.fields.copy_blob", side_effect=self._copied_blob)
+        self.copy_blob = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            "django_gcp.storage.fields.delete_blobs",
+            side_effect=lambda bucket, names, **kwargs: [BulkResult(name, result=True) for name in names],
+        )
+        self.delete_blobs = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _copied_blob(_bucket, _tmp_path, _destination_bucket, destination_path, **_kwargs):
+        return mock.Mock(
+            size=len(destination_path),
+            content_type="text/plain",
+            crc32c="AAAAAA==",
+            generation=1,
+            updated=datetime(2026, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def _move(self, index):
+        # The value is saved (as the field does before registering the move) without the field's ingress logic
+        instance = ExampleBlankBlobFieldModel.objects.create(blob=None)
+        new_value = {"path": f"destination/{index}.txt"}
+        ExampleBlankBlobFieldModel.objects.filter(pk=instance.pk).update(blob=new_value)
+        instance.blob = new_value
+        return IngressMove(
+            field=self.field,
+            instance=instance,
+            temporary_path=f"_tmp/{index}.txt",
+            new_value=new_value,
+            allow_overwrite=False,
+            attributes=None,
+        )
+
+    def test_moves_are_made_together_on_commit(self):
+        moves = [self._move(index) for index in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for move in moves:
+                    IngressBatch.register(move)
+                self.copy_blob.assert_not_called()
+
+        self.assertEqual(self.copy_blob.call_count, 3)
+        # The attributes given replace the uploaded blob's, so the source needn't be fetched to merge with them
+        self.assertFalse(self.copy_blob.call_args.kwargs["merge_source_metadata"])
+        self.delete_blobs.assert_called_once_with(
+            self.field.storage.bucket, ["_tmp/0.txt", "_tmp/1.txt", "_tmp/2.txt"], executor=mock.ANY
+        )
+        self.assertEqual(
+            self.on_change.call_args_list,
+            [mock.call(move.new_value, instance=move.instance) for move in moves],
+        )
+
+    def test_blob_properties_are_recorded(self):
+        moves = [self._move(index) for index in range(2)]
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for move in moves:
+                    IngressBatch.register(move)
+
+        for index, move in enumerate(moves):
+            expected = {
+                "path": f"destination/{index}.txt",
+                "size": 17,
+                "content_type": "text/plain",
+                "crc32c": "AAAAAA==",
+                "generation": 1,
+                "updated": "2026-01-01T00:00:00+00:00",
+            }
+            self.assertEqual(ExampleBlankBlobFieldModel.objects.get(pk=move.instance.pk).blob, expected)
+            self.assertEqual(move.instance.blob, expected)
+
+    def test_values_saved_since_move_are_not_reverted(self):
+        moves = [self._move(index) for index in range(2)]
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for move in moves:
+                    IngressBatch.register(move)
+
+                # A later save, before the moves are made on commit, changes the value of the first instance
+                other_value = {"path": "elsewhere/0.txt"}
+                ExampleBlankBlobFieldModel.objects.filter(pk=moves[0].instance.pk).update(blob=other_value)
+                moves[0].instance.blob = other_value
+
+        self.assertEqual(ExampleBlankBlobFieldModel.objects.get(pk=moves[0].instance.pk).blob, other_value)
+        self.assertEqual(moves[0].instance.blob, other_value)
+        self.assertEqual(ExampleBlankBlobFieldModel.objects.get(pk=moves[1].instance.pk).blob["size"], 17)
+        self.assertEqual(moves[1].instance.blob["size"], 17)
+
+    def test_moves_are_flushed_by_one_callback(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                IngressBatch.register(self._move(0))
+                with transaction.atomic():
+                    IngressBatch.register(self._move(1))
+                IngressBatch.register(self._move(2))
+
+        self.assertEqual(len(self._flushes(callbacks)), 1)
+
+    def test_moves_in_rolled_back_savepoints_are_not_made(self):
+        moves = [None] * 3
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                moves[0] = self._move(0)
+                IngressBatch.register(moves[0])
+                try:
+                    with transaction.atomic():
+                        # The value saved is rolled back with the savepoint
+                        moves[1] = self._move(1)
+                        IngressBatch.register(moves[1])
+                        raise ValueError()
+                except ValueError:
+                    pass
+                moves[2] = self._move(2)
+                IngressBatch.register(moves[2])
+
+        self.assertEqual(self.copy_blob.call_count, 2)
+        self.delete_blobs.assert_called_once_with(
+            self.field.storage.bucket, ["_tmp/0.txt", "_tmp/2.txt"], executor=mock.ANY
+        )
+        self.assertEqual(self.on_change.call_count, 2)
+
+    def test_last_move_rolled_back(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                move = self._move(0)
+                IngressBatch.register(move)
+                try:
+                    with transaction.atomic():
+                        IngressBatch.register(self._move(1))
+                        raise ValueError()
+                except ValueError:
+                    pass
+
+        self.copy_blob.assert_called_once()
+        self.on_change.assert_called_once_with(move.new_value, instance=move.instance)
+
+    def test_batch_started_in_rolled_back_savepoint(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        IngressBatch.register(self._move(0))
+                        raise ValueError()
+                except ValueError:
+                    pass
+
+                # The batch was discarded with its flush, so a new one is started
+                move = self._move(1)
+                IngressBatch.register(move)
+
+        self.assertEqual(len(self._flushes(callbacks)), 1)
+        self.copy_blob.assert_called_once()
+        self.on_change.assert_called_once_with(move.new_value, instance=move.instance)
+
+    def test_failed_move_raises_after_other_moves(self):
+        moves = [self._move(index) for index in range(3)]
+        self.copy_blob.side_effect = lambda bucket, tmp_path, *args, **kwargs: (
+            self._raise(AttemptedOverwriteError("Exists"))
+            if tmp_path == "_tmp/1.txt"
+            else self._copied_blob(bucket, tmp_path, *args, **kwargs)
+        )
+
+        with self.assertRaises(AttemptedOverwriteError):
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for move in moves:
+                        IngressBatch.register(move)
+
+        self.delete_blobs.assert_called_once_with(
+            self.field.storage.bucket, ["_tmp/0.txt", "_tmp/2.txt"], executor=mock.ANY
+        )
+        self.assertEqual(self.on_change.call_count, 2)
+
+    def test_missing_blob_error(self):
+        self.copy_blob.side_effect = MissingBlobError("Not found")
+
+        with self.assertRaisesRegex(MissingBlobError, "Upload incomplete or failed \\(no blob at '_tmp/0.txt'"):
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    IngressBatch.register(self._move(0))
+
+        self.delete_blobs.assert_not_called()
+        self.on_change.assert_not_called()
+
+    @staticmethod
+    def _flushes(callbacks):
+        """Get the on_commit callbacks flushing batches (saving values, even blank ones, registers others)"""
+        return [callback for callback in callbacks if isinstance(getattr(callback, "__self__", None), IngressBatch)]
+
+    @staticmethod
+    def _raise(error):
+        raise error
+
+
+class ValidateIngressTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.field = ExampleBlankBlobFieldModel._meta.get_field("blob")
+        self.field.storage._bucket = mock.MagicMock()
+        self.addCleanup(setattr, self.field.storage, "_bucket", None)
+        self.addCleanup(setattr, self.field, "_validated", False)
+        patcher = mock.patch("django_gcp.storage.fields.blob_exists", return_value=False)
+        self.blob_exists = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.value = {"_tmp_path": "_tmp/0.txt", "name": "0.txt"}
+
+    def test_ingress_is_validated(self):
+        with self.assertRaisesRegex(ValidationError, "Upload incomplete or failed"):
+            self.field.validate(self.value, ExampleBlankBlobFieldModel())
+        self.blob_exists.assert_called_once_with(self.field.storage.bucket, "_tmp/0.txt")
+
+    @override_settings(GCP_STORAGE_BLOBFIELD_VALIDATE_INGRESS=False)
+    def test_validation_of_ingress_can_be_disabled(self):
+        self.field.validate(self.value, ExampleBlankBlobFieldModel())
+        self.blob_exists.assert_not_called()
+
+
+class AllowOverwriteTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.field = ExampleBlankBlobFieldModel._meta.get_field("blob")
+        self.addCleanup(setattr, self.field, "overwrite_mode", self.field.overwrite_mode)
+        patcher = mock.patch.object(
+            type(self.field.storage), "versioning_enabled", new_callable=mock.PropertyMock, return_value=True
+        )
+        self.versioning_enabled = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_versioning_only_checked_for_versioned_modes(self):
+        self.field.overwrite_mode = "update"
+        self.assertTrue(self.field._get_allow_overwrite(add=False))
+        self.assertFalse(self.field._get_allow_overwrite(add=True))
+        self.versioning_enabled.assert_not_called()
+
+        self.field.overwrite_mode = "update-versioned"
+        self.assertTrue(self.field._get_allow_overwrite(add=False))
+        self.versioning_enabled.return_value = False
+        self.assertFalse(self.field._get_allow_overwrite(add=False))
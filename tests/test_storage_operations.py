@@ -3,14 +3,25 @@
 from datetime import date
 import os
 import tempfile
+from unittest import mock
 from uuid import uuid4
 
-from django.test import SimpleTestCase, TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from google.auth.credentials import AnonymousCredentials
 from google.cloud import storage
+import requests
 
 from django_gcp.exceptions import AttemptedOverwriteError, MissingBlobError
 from django_gcp.storage.blob_utils import get_blob
-from django_gcp.storage.operations import copy_blob, delete_blob, get_generations, uploaded_blob
+from django_gcp.storage.operations import (
+    copy_blob,
+    delete_blob,
+    delete_blobs,
+    delete_prefix,
+    get_generations,
+    upload_blob,
+    uploaded_blob,
+)
 from tests.server.example.models import ExampleBlobFieldModel
 
 
@@ -175,6 +186,33 @@ class TestStorageOperations(StorageOperationsMixin, SimpleTestCase):
         with self.assertRaises(MissingBlobError):
             delete_blob(self.bucket, blob_name)
 
+    def test_delete_blobs(self):
+        """Test that deletion of many blobs works, reporting missing blobs and failed preconditions per blob"""
+        blob_names = [self._prefix_blob_name(f"test_delete_blobs.{i}.txt") for i in range(3)]
+        blobs = [self._create_test_blob(self.bucket, blob_name) for blob_name in blob_names]
+        missing_blob_name = self._prefix_blob_name("test_delete_blobs.missing.txt")
+
+        results = delete_blobs(
+            self.bucket,
+            blob_names + [missing_blob_name],
+            if_generation_match=[blobs[0].generation, None, blobs[2].generation + 1, None],
+        )
+
+        self.assertEqual([result.ok for result in results], [True, True, False, False])
+        self.assertIsInstance(results[3].error, MissingBlobError)
+        self.assertFalse(blobs[0].exists())
+        self.assertFalse(blobs[1].exists())
+        self.assertTrue(blobs[2].exists())
+
+    def test_delete_prefix(self):
+        """Test that all blobs under a prefix are deleted"""
+        prefix = self._prefix_blob_name("test_delete_prefix/")
+        for i in range(3):
+            self._create_test_blob(self.bucket, f"{prefix}{i}.txt")
+
+        self.assertEqual(delete_prefix(self.bucket, prefix), 3)
+        self.assertEqual(list(self.bucket.list_blobs(prefix=prefix)), [])
+
     def test_get_generations(self):
         blob_name = self._prefix_blob_name("test_get_generations.txt")
         first_version = self._create_test_blob(
@@ -194,6 +232,172 @@ class TestStorageOperations(StorageOperationsMixin, SimpleTestCase):
         self.assertIn(second_version.generation, generations)
 
 
+class TestCopyBlobRewrite(SimpleTestCase):
+    """Tests of the requests made by copy_blob, without executing them on GCS"""
+
+    def setUp(self):
+        super().setUp()
+        self.bucket = mock.MagicMock()
+        self.bucket.path = "/b/bucket"
+        self.bucket.blob.side_effect = lambda name: storage.Blob(name, self.bucket)
+
+    def test_copy_blob_continues_rewrite(self):
+        with mock.patch.object(
+            storage.Blob, "rewrite", side_effect=[("token-1", 10, 30), ("token-2", 20, 30), (None, 30, 30)]
+        ) as rewrite:
+            copy_blob(self.bucket, "source.txt", self.bucket, "destination.txt", move=True)
+
+        self.assertEqual(rewrite.call_count, 3)
+        self.assertEqual(rewrite.call_args_list[1].kwargs, {"token": "token-1", "if_generation_match": 0})
+        self.assertEqual(rewrite.call_args_list[2].kwargs, {"token": "token-2", "if_generation_match": 0})
+        self.bucket.get_blob.assert_not_called()
+        self.bucket.delete_blob.assert_called_once_with("source.txt")
+
+    def _rewrite_responses(self, *responses):
+        """Respond to rewrite requests (made through the mock bucket's client) as GCS would once done"""
+        self.bucket.client._post_resource.side_effect = [
+            {"totalBytesRewritten": 10, "objectSize": 10, "done": True, "resource": resource} for resource in responses
+        ]
+        return self.bucket.client._post_resource
+
+    def test_copy_blob_sets_attributes_in_rewrite(self):
+        source_blob = storage.Blob("source.txt", self.bucket, generation=3)
+        source_blob.content_type = "text/plain"
+        source_blob.cache_control = "no-cache"
+        source_blob.metadata = {"original": "yes", "replaced": "no", "removed": "no"}
+        self.bucket.get_blob.return_value = source_blob
+        post_resource = self._rewrite_responses({"name": "destination.txt", "contentType": "image/png"})
+
+        with mock.patch.object(storage.Blob, "patch") as patch:
+            copy_blob(
+                self.bucket,
+                "source.txt",
+                self.bucket,
+                "destination.txt",
+                overwrite=True,
+                attributes={"content_type": "image/png", "metadata": {"replaced": "yes", "removed": None}},
+            )
+
+        # The attributes are sent in the body of the (single) rewrite request, rather than patched on afterwards
+        patch.assert_not_called()
+        post_resource.assert_called_once()
+        path, body = post_resource.call_args.args
+        self.assertEqual(path, "/b/bucket/o/source.txt/rewriteTo/b/bucket/o/destination.txt")
+        self.assertEqual(post_resource.call_args.kwargs["query_params"]["ifSourceGenerationMatch"], 3)
+        self.assertEqual(body["contentType"], "image/png")
+        self.assertEqual(body["cacheControl"], "no-cache")
+        self.assertEqual(body["metadata"], {"original": "yes", "replaced": "yes"})
+
+    def test_copy_blob_sets_only_given_attributes_in_rewrite(self):
+        post_resource = self._rewrite_responses({"name": "destination.txt", "contentType": "image/png"})
+
+        copy_blob(
+            self.bucket,
+            "source.txt",
+            self.bucket,
+            "destination.txt",
+            attributes={"content_type": "image/png", "metadata": {"a": "b"}},
+            merge_source_metadata=False,
+            if_source_generation_match=3,
+        )
+
+        # The source isn't fetched, so the copy is a single request made with the generation already known
+        self.bucket.get_blob.assert_not_called()
+        post_resource.assert_called_once()
+        _, body = post_resource.call_args.args
+        self.assertEqual(body, {"contentType": "image/png", "metadata": {"a": "b"}})
+        self.assertEqual(post_resource.call_args.kwargs["query_params"]["ifSourceGenerationMatch"], 3)
+
+    def test_copy_blob_without_attributes_makes_plain_rewrite(self):
+        """Ingress with default attributes (which the fields give as an empty dict) is a rewrite and a delete only"""
+        post_resource = self._rewrite_responses({"name": "destination.txt"})
+
+        copy_blob(self.bucket, "source.txt", self.bucket, "destination.txt", move=True, attributes={})
+
+        self.bucket.get_blob.assert_not_called()
+        post_resource.assert_called_once()
+        path, body = post_resource.call_args.args
+        self.assertEqual(path, "/b/bucket/o/source.txt/rewriteTo/b/bucket/o/destination.txt")
+        self.assertEqual(body, {})
+        self.assertNotIn("ifSourceGenerationMatch", post_resource.call_args.kwargs["query_params"])
+        self.bucket.delete_blob.assert_called_once_with("source.txt")
+
+    def test_copy_blob_with_attributes_handles_missing(self):
+        self.bucket.get_blob.return_value = None
+        with self.assertRaises(MissingBlobError):
+            copy_blob(
+                self.bucket, "source.txt", self.bucket, "destination.txt", attributes={"content_type": "text/plain"}
+            )
+
+
+class TestUploadBlobComposite(SimpleTestCase):
+    """Tests of uploads made in parallel parts, without executing them on GCS"""
+
+    @override_settings(
+        GCP_STORAGE_MEDIA={
+            "bucket_name": "example-media-assets",
+            "parallel_transfer_threshold": 16,
+            "parallel_transfer_chunk_size": 8,
+        }
+    )
+    def test_upload_blob_sets_attributes_on_composed_object(self):
+        storage_ = ExampleBlobFieldModel._meta.get_field("blob").storage
+        storage_._bucket = mock.MagicMock()
+        self.addCleanup(setattr, storage_, "_bucket", None)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            local_path = os.path.join(tmpdir, "test_file.txt")
+            with open(local_path, "wb") as fp:
+                fp.write(b"This is some test content.")
+
+            with mock.patch.object(storage.Blob, "compose", autospec=True) as compose:
+                upload_blob(
+                    ExampleBlobFieldModel(),
+                    "blob",
+                    local_path,
+                    destination_path="uploaded.txt",
+                    attributes={"content_type": "text/plain", "cache_control": "no-cache", "metadata": {"a": "b"}},
+                )
+
+        compose.assert_called_once()
+        blob = compose.call_args.args[0]
+        self.assertEqual(blob.name, "uploaded.txt")
+        self.assertEqual(blob.content_type, "text/plain")
+        self.assertEqual(blob.cache_control, "no-cache")
+        self.assertEqual(blob.metadata, {"a": "b"})
+        self.assertEqual(compose.call_args.kwargs, {"if_generation_match": 0})
+
+
+class TestDeleteBlobsBatch(SimpleTestCase):
+    """Tests of the batch requests made by delete_blobs, without executing them on GCS"""
+
+    def test_delete_blobs_reads_batch_responses(self):
+        client = storage.Client(project="test", credentials=AnonymousCredentials())
+        bucket = client.bucket("bucket")
+
+        # Respond to the batch request as GCS would, through the real Batch, so the responses it keeps are checked
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["content-type"] = "multipart/mixed; boundary=batch"
+        response._content = (
+            "".join(
+                f"--batch\r\nContent-Type: application/http\r\nContent-ID: <response-{index}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n{{}}\r\n"
+                for index, status in enumerate(["204 No Content", "404 Not Found", "412 Precondition Failed"])
+            ).encode()
+            + b"--batch--\r\n"
+        )
+
+        with mock.patch.object(client._base_connection, "_make_request", return_value=response) as make_request:
+            results = delete_blobs(bucket, ["a.txt", "b.txt", "c.txt"], ignore_missing=True)
+
+        # All the deletes are sent in a single batch request (newer clients may also fetch the bucket in the background)
+        batch_url = f"{client._connection.API_BASE_URL}/batch/storage/v1"
+        self.assertEqual([call.args[:2] for call in make_request.call_args_list if call.args], [("POST", batch_url)])
+        self.assertEqual([result.result for result in results], [True, False, None])
+        self.assertEqual(results[2].error.code, 412)
+
+
 class TestStorageOperationsWithDatabase(StorageOperationsMixin, TestCase):
     def test_uploaded_blob(self):
         """Ensure that test_uploaded_blob will upload a blob and leave it there"""
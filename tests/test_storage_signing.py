@@ -0,0 +1,131 @@
+# pylint: disable=missing-docstring
+# pylint: disable=protected-access
+
+from datetime import timedelta
+import hashlib
+import hmac
+import os
+import tempfile
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import SimpleTestCase
+from google.auth.credentials import Signing
+from google.cloud.storage import Blob, Bucket
+
+from django_gcp.storage.signing import HMACKeySigner, IAMSigner, ServiceAccountKeySigner, Signer
+
+NOW_DTSTAMPS = ("20260101T000000Z", "20260101")
+
+
+def hmac_signing_key(secret, datestamp):
+    key = f"GOOG4{secret}".encode()
+    for scope_part in (datestamp, "auto", "storage", "goog4_request"):
+        key = hmac.new(key, scope_part.encode(), hashlib.sha256).digest()
+    return key
+
+
+class FakeSigningCredentials:
+    """Credentials signing as google-cloud-storage expects, but with an HMAC key, to compare canonical forms"""
+
+    signer_email = "GOOG1EXAMPLE"
+
+    def sign_bytes(self, message):
+        return hmac.new(hmac_signing_key("secret", NOW_DTSTAMPS[1]), message, hashlib.sha256).digest()
+
+
+Signing.register(FakeSigningCredentials)
+
+
+class SignerTests(SimpleTestCase):
+    def test_signers_must_generate_signed_urls(self):
+        class IncompleteSigner(Signer):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteSigner()
+
+
+class HMACKeySignerTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = mock.Mock(api_endpoint="https://storage.googleapis.com", universe_domain="googleapis.com")
+        self.blob = Blob("a folder/a file~.txt", Bucket(self.client, "test-media"))
+        self.signer = HMACKeySigner("GOOG1EXAMPLE", "secret")
+        for module in ("google.cloud.storage._signing", "django_gcp.storage.signing"):
+            patcher = mock.patch(f"{module}.get_v4_now_dtstamps", return_value=NOW_DTSTAMPS)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_canonical_form_matches_google_cloud_storage(self):
+        self.signer.algorithm = "GOOG4-RSA-SHA256"
+        for kwargs in [
+            {},
+            {"method": "PUT", "content_type": "text/plain", "headers": {"X-Goog-Content-Length-Range": "0,10"}},
+            {"response_disposition": "attachment; filename=a file.txt", "generation": 2},
+            {"bucket_bound_hostname": "https://cdn.example.com"},
+        ]:
+            with self.subTest(**kwargs):
+                expected = self.blob.generate_signed_url(
+                    expiration=timedelta(minutes=5),
+                    version="v4",
+                    credentials=FakeSigningCredentials(),
+                    client=self.client,
+                    **kwargs,
+                )
+                self.assertEqual(self.signer.generate_signed_url(self.blob, timedelta(minutes=5), **kwargs), expected)
+
+    def test_signed_with_hmac(self):
+        url = self.signer.generate_signed_url(self.blob, 300)
+
+        query = parse_qs(urlsplit(url).query)
+        self.assertTrue(url.startswith("https://storage.googleapis.com/test-media/a%20folder/a%20file~.txt?"))
+        self.assertEqual(query["X-Goog-Algorithm"], ["GOOG4-HMAC-SHA256"])
+        self.assertEqual(query["X-Goog-Credential"], ["GOOG1EXAMPLE/20260101/auto/storage/goog4_request"])
+        self.assertEqual(query["X-Goog-Expires"], ["300"])
+        self.assertEqual(len(query["X-Goog-Signature"][0]), 64)
+
+
+class ServiceAccountKeySignerTests(SimpleTestCase):
+    def test_requires_one_key(self):
+        with self.assertRaises(ValueError):
+            ServiceAccountKeySigner()
+        with self.assertRaises(ValueError):
+            ServiceAccountKeySigner(key_file="key.json", key_info={})
+
+    @mock.patch("django_gcp.storage.signing.service_account.Credentials.from_service_account_file")
+    def test_key_file_is_read_again_when_modified(self, from_service_account_file):
+        with tempfile.NamedTemporaryFile() as key_file:
+            signer = ServiceAccountKeySigner(key_file=key_file.name)
+            blob = mock.Mock()
+
+            signer.generate_signed_url(blob, 60)
+            signer.generate_signed_url(blob, 60)
+            self.assertEqual(from_service_account_file.call_count, 1)
+            blob.generate_signed_url.assert_called_with(
+                expiration=60, method="GET", version="v4", credentials=from_service_account_file.return_value
+            )
+
+            os.utime(key_file.name, (0, 0))
+            signer.generate_signed_url(blob, 60)
+            self.assertEqual(from_service_account_file.call_count, 2)
+
+
+class IAMSignerTests(SimpleTestCase):
+    def test_signs_with_access_token(self):
+        blob = mock.Mock()
+        credentials = blob.client._credentials
+        credentials.valid = False
+        credentials.service_account_email = "app@project.iam.gserviceaccount.com"
+        credentials.token = "token"
+
+        IAMSigner().generate_signed_url(blob, 60, method="PUT")
+
+        credentials.refresh.assert_called_once()
+        blob.generate_signed_url.assert_called_once_with(
+            expiration=60,
+            method="PUT",
+            version="v4",
+            service_account_email="app@project.iam.gserviceaccount.com",
+            access_token="token",
+        )
@@ -1,5 +1,6 @@
 # pylint: disable=missing-docstring
 
+import array
 import datetime
 
 from django.core.exceptions import SuspiciousFileOperation
@@ -126,3 +127,24 @@ class TestGetAvailableOverwriteName(TestCase):
         name = "parent/child.txt"
         with self.assertRaises(SuspiciousFileOperation):
             utils.get_available_overwrite_name(name, len(name) - 5)
+
+
+class ToBufferTests(TestCase):
+    def test_bytes_like_content_is_not_copied(self):
+        data = bytearray(b"abcd")
+        self.assertIs(utils.to_buffer(data), data)
+
+        view = utils.to_buffer(memoryview(data))
+        data[0] = ord("z")
+        self.assertEqual(bytes(view), b"zbcd")
+
+        numbers = array.array("i", [1, 2])
+        view = utils.to_buffer(numbers)
+        self.assertEqual((view.format, view.nbytes, len(view)), ("B", 8, 8))
+        numbers[0] = 0
+        self.assertEqual(bytes(view[:4]), bytes(4))
+
+    def test_other_content(self):
+        self.assertEqual(utils.to_buffer("abc"), b"abc")
+        self.assertEqual(utils.to_buffer(12), b"12")
+        self.assertEqual(utils.to_buffer(memoryview(b"abcd")[::2]), b"ac")